@@ -10,8 +10,18 @@ load_dotenv()
 # Import models and blueprints
 from models.shipment import db, Shipment
 from models.status_log import StatusLog
+from models.chat_session import ChatSession
+from models.chat_message import ChatMessage
+from models.receipt_blob import ReceiptBlob
+from models.import_job import ImportJob
+from models.change_event import ChangeEvent
+from utils.schema_registry import schema_registry
+from utils.schema_upgrade import add_missing_columns, backfill_date_registered
+from utils.sql_statements import statements
+from utils.tracking_cache import tracking_cache
 from routes.shipments import shipment_bp
 from routes.status import status_bp
+from routes.changes import changes_bp
 from content.routes import content_bp
 from routes.users import user_bp  # ✅ Make sure this file exists
 from routes.chat import chat_bp  # ✅ Chat routes
@@ -122,6 +132,11 @@ with app.app_context():
         # #endregion
         db.create_all()
         print("✅ Database tables initialized")
+        # Mapped columns (shipments, chat_messages) that databases predating their migration lack
+        add_missing_columns()
+        backfill_date_registered()
+        # Column lists used by the raw-SQL write paths, loaded once per worker
+        schema_registry.load()
         # #region agent log
         _debug_log("A", "app.py:74", "Database tables created successfully")
         # #endregion
@@ -140,13 +155,14 @@ app.register_blueprint(content_bp, url_prefix='/api/content')
 app.register_blueprint(user_bp, url_prefix='/api/user')
 app.register_blueprint(chat_bp, url_prefix='/api/chat')  # ✅ Chat routes
 app.register_blueprint(contact_bp, url_prefix='/api/contact')  # ✅ Contact routes
+app.register_blueprint(changes_bp, url_prefix='/api/changes')  # ✅ Change feed
 
 # ✅ Register admin routes (admin endpoints need to be at /api/admin/users)
 @app.route('/api/admin/users', methods=['GET', 'POST', 'OPTIONS'])
 def admin_users_handler():
     """Route handler for admin users endpoints"""
     from flask import session
-    from routes.users import load_users
+    from utils.user_store import load_users, get_user
     from werkzeug.security import generate_password_hash
     import uuid
     from datetime import datetime
@@ -159,14 +175,14 @@ def admin_users_handler():
         return jsonify({'success': False, 'error': 'Unauthorized'}), 401
     
     # Check if user is admin
-    users = load_users()
-    user = users.get(user_id, {})
+    user = get_user(user_id) or {}
     role = user.get('role', '').lower()
     if role not in ['admin', 'super admin', 'manager']:
         return jsonify({'success': False, 'error': 'Unauthorized'}), 401
     
     if request.method == 'GET':
         try:
+            users = load_users()
             users_list = []
             for user_id_key, user_data in users.items():
                 # Skip password field
@@ -220,10 +236,10 @@ def admin_users_handler():
             if not email or not password or not name:
                 return jsonify({'success': False, 'error': 'Email, password, and name are required'}), 400
             
-            # Check if user already exists
-            for existing_user_id, existing_user in users.items():
-                if existing_user.get('email') == email:
-                    return jsonify({'success': False, 'error': 'User with this email already exists'}), 409
+            # Check if user already exists (email index lookup)
+            from utils.user_store import user_store, DuplicateEmailError
+            if user_store.email_taken(email):
+                return jsonify({'success': False, 'error': 'User with this email already exists'}), 409
             
             # Create new admin user
             new_user_id = str(uuid.uuid4())
@@ -237,9 +253,10 @@ def admin_users_handler():
                 'status': 'Active'
             }
             
-            users[new_user_id] = new_user
-            from routes.users import save_users
-            save_users(users)
+            try:
+                user_store.add(new_user)
+            except DuplicateEmailError:
+                return jsonify({'success': False, 'error': 'User with this email already exists'}), 409
             
             # Return user data without password
             user_response = {k: v for k, v in new_user.items() if k != 'password'}
@@ -254,7 +271,7 @@ def admin_users_handler():
 def admin_user_handler(user_id_to_manage):
     """Route handler for individual admin user operations"""
     from flask import session
-    from routes.users import load_users, save_users
+    from utils.user_store import user_store, get_user, DuplicateEmailError
     from werkzeug.security import generate_password_hash
     
     if request.method == 'OPTIONS':
@@ -265,34 +282,44 @@ def admin_user_handler(user_id_to_manage):
         return jsonify({'success': False, 'error': 'Unauthorized'}), 401
     
     # Check if user is admin
-    users = load_users()
-    user = users.get(user_id, {})
+    user = get_user(user_id) or {}
     role = user.get('role', '').lower()
     if role not in ['admin', 'super admin', 'manager']:
         return jsonify({'success': False, 'error': 'Unauthorized'}), 401
     
     if request.method == 'PUT':
         try:
-            user_to_update = users.get(user_id_to_manage)
-            if not user_to_update:
+            if not get_user(user_id_to_manage):
                 return jsonify({'success': False, 'error': 'User not found'}), 404
             
             data = request.get_json()
             
-            # Update fields if provided
-            if 'name' in data:
-                user_to_update['name'] = data['name']
-            if 'email' in data:
-                user_to_update['email'] = data['email']
-            if 'role' in data:
-                user_to_update['role'] = data['role'].lower()
-            if 'status' in data:
-                user_to_update['status'] = data['status']
-            if 'password' in data and data['password']:
-                user_to_update['password'] = generate_password_hash(data['password'])
+            # Apply the changes under the store's write lock so concurrent edits aren't lost
+            def apply_update(users):
+                user_to_update = users.get(user_id_to_manage)
+                if not user_to_update:
+                    return None
+                # Update fields if provided
+                if 'name' in data:
+                    user_to_update['name'] = data['name']
+                if 'email' in data:
+                    if user_store.email_taken(data['email'], exclude_user_id=user_id_to_manage):
+                        raise DuplicateEmailError(data['email'])
+                    user_to_update['email'] = data['email']
+                if 'role' in data:
+                    user_to_update['role'] = data['role'].lower()
+                if 'status' in data:
+                    user_to_update['status'] = data['status']
+                if 'password' in data and data['password']:
+                    user_to_update['password'] = generate_password_hash(data['password'])
+                return user_to_update
             
-            users[user_id_to_manage] = user_to_update
-            save_users(users)
+            try:
+                user_to_update = user_store.update(apply_update)
+            except DuplicateEmailError:
+                return jsonify({'success': False, 'error': 'User with this email already exists'}), 409
+            if not user_to_update:
+                return jsonify({'success': False, 'error': 'User not found'}), 404
             
             # Return user data without password
             user_response = {k: v for k, v in user_to_update.items() if k != 'password'}
@@ -309,12 +336,13 @@ def admin_user_handler(user_id_to_manage):
             if user_id_to_manage == user_id:
                 return jsonify({'success': False, 'error': 'Cannot delete your own account'}), 400
             
-            if user_id_to_manage not in users:
+            if not get_user(user_id_to_manage):
                 return jsonify({'success': False, 'error': 'User not found'}), 404
             
             # Delete user
-            del users[user_id_to_manage]
-            save_users(users)
+            deleted = user_store.update(lambda users: users.pop(user_id_to_manage, None))
+            if deleted is None:
+                return jsonify({'success': False, 'error': 'User not found'}), 404
             
             return jsonify({
                 'success': True,
@@ -328,7 +356,7 @@ def admin_user_handler(user_id_to_manage):
 def get_frontend_customers():
     """Get all frontend users (exclude admin, super admin, manager, support roles)"""
     from flask import session
-    from routes.users import load_users
+    from utils.user_store import load_users, get_user
     
     if request.method == 'OPTIONS':
         return jsonify({'ok': True}), 200
@@ -338,13 +366,13 @@ def get_frontend_customers():
         return jsonify({'success': False, 'error': 'Unauthorized'}), 401
     
     # Check if user is admin
-    users = load_users()
-    user = users.get(user_id, {})
+    user = get_user(user_id) or {}
     role = user.get('role', '').lower()
     if role not in ['admin', 'super admin', 'manager', 'support']:
         return jsonify({'success': False, 'error': 'Unauthorized'}), 401
     
     try:
+        users = load_users()
         customers_list = []
         
         for user_id_key, user_data in users.items():
@@ -382,12 +410,12 @@ def get_frontend_customers():
 def test_admin_users():
     """Test endpoint to check if admin users route is accessible"""
     from flask import session
-    from routes.users import load_users
+    from utils.user_store import user_store
     return jsonify({
         'success': True,
         'message': 'Admin users endpoint is accessible',
         'session_user_id': session.get('user_id'),
-        'total_users': len(load_users())
+        'total_users': user_store.count()
     })
 
 # ✅ Health check route
@@ -411,7 +439,9 @@ def diagnose():
         'status_logs_count': 0,
         'sample_tracking_numbers': [],
         'recent_shipments': [],
-        'database_connection': 'unknown'
+        'database_connection': 'unknown',
+        'statement_cache': statements.stats(),
+        'tracking_cache': tracking_cache.stats()
     }
     
     try:
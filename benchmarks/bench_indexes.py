@@ -0,0 +1,149 @@
+"""
+Benchmark: hot shipment / status log queries before and after
+migrations/add_shipment_indexes.py
+Builds a scratch database (SQLite temp file by default, or BENCH_DATABASE_URL),
+loads synthetic shipments and status logs, times each query without the
+indexes, creates them and times again.
+Usage: python benchmarks/bench_indexes.py [shipments] [status_logs]
+       (defaults: 100000 shipments, 1000000 status logs)
+"""
+import sys
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+from migrations.add_shipment_indexes import INDEXES, create_index_sql
+
+STATUSES = ['Registered', 'In Transit', 'At Facility', 'Out for Delivery', 'Delivered', 'On Hold']
+CREATORS = [f'manager{i}@example.com' for i in range(50)]
+LOOKUPS = 200
+BATCH = 10000
+
+# Only the columns the queries touch
+SCHEMA = [
+    """CREATE TABLE shipments (
+        id VARCHAR(36) PRIMARY KEY,
+        tracking_number VARCHAR(64) UNIQUE NOT NULL,
+        status VARCHAR(50) NOT NULL,
+        date_registered TIMESTAMP,
+        created_by_email VARCHAR(100)
+    )""",
+    """CREATE TABLE status_logs (
+        id VARCHAR(36) PRIMARY KEY,
+        shipment_id VARCHAR(36) NOT NULL REFERENCES shipments (id),
+        status VARCHAR(50) NOT NULL,
+        timestamp TIMESTAMP,
+        location VARCHAR(100)
+    )""",
+]
+
+QUERIES = [
+    ('status history (shipment_id, ORDER BY timestamp)',
+     'SELECT status, timestamp, location FROM status_logs WHERE shipment_id = :shipment_id ORDER BY timestamp ASC',
+     lambda ids: {'shipment_id': random.choice(ids)}),
+    ('list page (ORDER BY date_registered, id)',
+     'SELECT id, tracking_number FROM shipments ORDER BY date_registered DESC, id DESC LIMIT 50',
+     lambda ids: {}),
+    ('status filter page',
+     'SELECT id, tracking_number FROM shipments WHERE status = :status ORDER BY date_registered DESC, id DESC LIMIT 50',
+     lambda ids: {'status': random.choice(STATUSES)}),
+    ('creator filter page',
+     'SELECT id, tracking_number FROM shipments WHERE created_by_email = :email ORDER BY date_registered DESC, id DESC LIMIT 50',
+     lambda ids: {'email': random.choice(CREATORS)}),
+]
+
+def load(engine, shipment_count, log_count):
+    start = time.perf_counter()
+    base = datetime(2024, 1, 1)
+    ids = []
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+        rows = []
+        for i in range(shipment_count):
+            shipment_id = str(uuid.uuid4())
+            ids.append(shipment_id)
+            rows.append({'id': shipment_id, 'tracking_number': f'BENCH{i:08d}',
+                         'status': random.choice(STATUSES),
+                         'date_registered': base + timedelta(minutes=random.randrange(1_000_000)),
+                         'created_by_email': random.choice(CREATORS)})
+            if len(rows) == BATCH:
+                conn.execute(text('INSERT INTO shipments (id, tracking_number, status, date_registered, created_by_email) '
+                                  'VALUES (:id, :tracking_number, :status, :date_registered, :created_by_email)'), rows)
+                rows = []
+        if rows:
+            conn.execute(text('INSERT INTO shipments (id, tracking_number, status, date_registered, created_by_email) '
+                              'VALUES (:id, :tracking_number, :status, :date_registered, :created_by_email)'), rows)
+        rows = []
+        for _ in range(log_count):
+            rows.append({'id': str(uuid.uuid4()), 'shipment_id': random.choice(ids),
+                         'status': random.choice(STATUSES),
+                         'timestamp': base + timedelta(minutes=random.randrange(1_000_000)),
+                         'location': 'Bench City'})
+            if len(rows) == BATCH:
+                conn.execute(text('INSERT INTO status_logs (id, shipment_id, status, timestamp, location) '
+                                  'VALUES (:id, :shipment_id, :status, :timestamp, :location)'), rows)
+                rows = []
+        if rows:
+            conn.execute(text('INSERT INTO status_logs (id, shipment_id, status, timestamp, location) '
+                              'VALUES (:id, :shipment_id, :status, :timestamp, :location)'), rows)
+    print(f"   Loaded {shipment_count} shipments and {log_count} status logs in {time.perf_counter() - start:.1f}s")
+    return ids
+
+def time_queries(engine, ids):
+    results = {}
+    with engine.connect() as conn:
+        for label, sql, make_params in QUERIES:
+            statement = text(sql)
+            conn.execute(statement, make_params(ids)).all()  # warm up
+            start = time.perf_counter()
+            for _ in range(LOOKUPS):
+                conn.execute(statement, make_params(ids)).all()
+            results[label] = (time.perf_counter() - start) / LOOKUPS
+    return results
+
+def run(shipment_count=100000, log_count=1000000):
+    print("=" * 60)
+    print("⏱️  Index benchmark")
+    print("=" * 60)
+    url = os.environ.get('BENCH_DATABASE_URL')
+    scratch = None
+    if not url:
+        scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        scratch.close()
+        url = f'sqlite:///{scratch.name}'
+    engine = create_engine(url)
+    try:
+        random.seed(42)
+        ids = load(engine, shipment_count, log_count)
+        before = time_queries(engine, ids)
+
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            for name, table, columns in INDEXES:
+                conn.execute(text(create_index_sql(name, table, columns)))
+            conn.execute(text('ANALYZE'))
+        print(f"   Built {len(INDEXES)} indexes in {time.perf_counter() - start:.1f}s\n")
+        after = time_queries(engine, ids)
+
+        print(f"   {'query':<50} {'before':>10} {'after':>10} {'speedup':>9}")
+        for label, _, _ in QUERIES:
+            print(f"   {label:<50} {before[label] * 1e3:8.2f}ms {after[label] * 1e3:8.2f}ms "
+                  f"{before[label] / after[label]:8.0f}x")
+    finally:
+        if scratch is None:
+            with engine.begin() as conn:
+                conn.execute(text('DROP TABLE status_logs'))
+                conn.execute(text('DROP TABLE shipments'))
+        engine.dispose()
+        if scratch is not None:
+            os.remove(scratch.name)
+
+if __name__ == '__main__':
+    run(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,110 @@
+"""
+Benchmark: restoring a data export row by row (the old restore_data.py /
+import_to_render.py loop) versus utils/data_restore.py (staging + set-based merge)
+Writes a synthetic export to a temp directory and restores it into a scratch
+database (SQLite temp file unless BENCH_DATABASE_URL is set) both ways.
+Usage: python benchmarks/bench_restore.py [shipments] [status_logs]
+       (defaults: 5000 shipments, 25000 status logs)
+"""
+import sys
+import os
+import json
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_scratch = tempfile.mkdtemp(prefix='bench_restore_')
+os.environ['DATABASE_URL'] = os.environ.get('BENCH_DATABASE_URL') or f"sqlite:///{os.path.join(_scratch, 'bench.db')}"
+
+from app import app, db
+from models.shipment import Shipment
+from models.status_log import StatusLog
+from utils.data_restore import restore_export, print_report
+
+STATUSES = ['In Transit', 'At Facility', 'Out for Delivery', 'Delivered', 'On Hold']
+
+def write_export(shipment_count, log_count):
+    base = datetime(2024, 1, 1)
+    shipments = [{
+        'tracking_number': f'BENCH{i:08d}', 'sender_name': 'Sender', 'sender_email': 'sender@example.com',
+        'sender_phone': '555-0100', 'sender_address': '1 Main St', 'receiver_name': 'Receiver',
+        'receiver_phone': '555-0101', 'receiver_address': '2 High St', 'package_type': 'box',
+        'weight': 1.5, 'shipment_cost': 10.0, 'status': 'Registered',
+        'date_registered': (base + timedelta(minutes=i)).isoformat()
+    } for i in range(shipment_count)]
+    logs = [{
+        'tracking_number': f'BENCH{random.randrange(shipment_count):08d}', 'status': random.choice(STATUSES),
+        'timestamp': (base + timedelta(seconds=i)).isoformat(), 'location': 'Depot', 'coordinates': None, 'note': None
+    } for i in range(log_count)]
+    shipments_file = os.path.join(_scratch, 'shipments.json')
+    logs_file = os.path.join(_scratch, 'status_logs.json')
+    with open(shipments_file, 'w', encoding='utf-8') as f:
+        json.dump(shipments, f)
+    with open(logs_file, 'w', encoding='utf-8') as f:
+        json.dump(logs, f)
+    return shipments_file, logs_file
+
+def restore_row_by_row(shipments_file, logs_file):
+    """The lookup-per-row pattern the restore scripts used before"""
+    with open(shipments_file, 'r', encoding='utf-8') as f:
+        shipments_data = json.load(f)
+    shipment_id_map = {}
+    for data in shipments_data:
+        existing = Shipment.query.filter_by(tracking_number=data['tracking_number']).first()
+        if existing:
+            shipment_id_map[data['tracking_number']] = existing
+            continue
+        data = dict(data, date_registered=datetime.fromisoformat(data['date_registered']))
+        shipment = Shipment(**data)
+        db.session.add(shipment)
+        db.session.flush()
+        shipment_id_map[data['tracking_number']] = shipment
+    db.session.commit()
+    with open(logs_file, 'r', encoding='utf-8') as f:
+        logs_data = json.load(f)
+    for data in logs_data:
+        shipment = shipment_id_map.get(data['tracking_number']) or \
+            Shipment.query.filter_by(tracking_number=data['tracking_number']).first()
+        if not shipment:
+            continue
+        timestamp = datetime.fromisoformat(data['timestamp'])
+        if StatusLog.query.filter_by(shipment_id=shipment.id, status=data['status'], timestamp=timestamp).first():
+            continue
+        db.session.add(StatusLog(shipment_id=shipment.id, status=data['status'], timestamp=timestamp,
+                                 location=data.get('location'), coordinates=data.get('coordinates'),
+                                 note=data.get('note')))
+    db.session.commit()
+
+def clear():
+    StatusLog.query.delete()
+    Shipment.query.delete()
+    db.session.commit()
+
+def run(shipment_count=5000, log_count=25000):
+    print("=" * 60)
+    print(f"⏱️  Restore benchmark ({shipment_count} shipments, {log_count} status logs)")
+    print("=" * 60)
+    shipments_file, logs_file = write_export(shipment_count, log_count)
+    with app.app_context():
+        db.create_all()
+        clear()
+
+        start = time.perf_counter()
+        restore_row_by_row(shipments_file, logs_file)
+        row_by_row = time.perf_counter() - start
+        print(f"   Row by row:  {row_by_row:8.2f}s ({StatusLog.query.count()} status logs)")
+        clear()
+
+        report = restore_export(shipments_file, logs_file)
+        print(f"   Set-based:   {report['total']:8.2f}s ({StatusLog.query.count()} status logs)")
+        print_report(report)
+
+        start = time.perf_counter()
+        restore_export(shipments_file, logs_file)
+        print(f"   Set-based re-run (everything skipped): {time.perf_counter() - start:.2f}s")
+        print(f"\n   🚀 {row_by_row / report['total']:.0f}x faster")
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:3]])
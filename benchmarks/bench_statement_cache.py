@@ -0,0 +1,60 @@
+"""
+Micro-benchmark: per-request SQL construction with and without the statement cache
+Runs the shipment lookup / insert / update statement shapes N times each way
+against the configured database (SQLite by default) and prints per-call cost.
+Usage: python benchmarks/bench_statement_cache.py [iterations]
+"""
+import sys
+import os
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app import app, db
+from utils.sql_statements import StatementCache
+
+LOOKUP_SQL = 'SELECT * FROM shipments WHERE tracking_number = :identifier'
+INSERT_SQL = ('INSERT INTO shipments ("id", "tracking_number", "sender_name", "sender_email", "sender_phone", '
+              '"sender_address", "receiver_name", "receiver_phone", "receiver_address", "package_type", '
+              '"weight", "shipment_cost", "status") VALUES (:id, :tracking_number, :sender_name, :sender_email, '
+              ':sender_phone, :sender_address, :receiver_name, :receiver_phone, :receiver_address, '
+              ':package_type, :weight, :shipment_cost, :status)')
+UPDATE_SQL = 'UPDATE shipments SET "sender_name" = :sender_name, "weight" = :weight WHERE id = :id'
+
+def _timed(label, iterations, fn):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"   {label:<42} {elapsed / iterations * 1e6:8.1f} µs/call")
+    return elapsed
+
+def run(iterations=5000):
+    print("=" * 60)
+    print(f"⏱️  Statement cache benchmark ({iterations} iterations per shape)")
+    print("=" * 60)
+    with app.app_context():
+        dialect = db.engine.dialect
+        cache = StatementCache()
+
+        print("\nBuild + compile only (what each request used to repeat):")
+        for name, sql in (('lookup', LOOKUP_SQL), ('insert', INSERT_SQL), ('update', UPDATE_SQL)):
+            fresh = _timed(f'{name}: text() + compile every call', iterations,
+                           lambda: text(sql).compile(dialect=dialect))
+            cached = _timed(f'{name}: cached TextClause', iterations,
+                            lambda: cache.text(sql))
+            print(f"   -> {fresh / cached:.0f}x less construction work\n")
+
+        print("End to end (lookup executed against the database):")
+        params = {'identifier': 'BENCH-NOT-FOUND'}
+        fresh = _timed('db.session.execute(text(sql))', iterations,
+                       lambda: db.session.execute(text(LOOKUP_SQL), params).first())
+        cached = _timed('statements.execute(sql)', iterations,
+                        lambda: cache.execute(LOOKUP_SQL, params).first())
+        db.session.rollback()
+        print(f"   -> {(1 - cached / fresh) * 100:.1f}% less time per lookup")
+        print(f"\nCache stats: {cache.stats()}")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
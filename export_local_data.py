@@ -1,107 +1,129 @@
 """
-Export local SQLite data to JSON files for manual import
-Usage: python export_local_data.py
+Export local SQLite data to NDJSON files for manual import
+Streams both tables with server-side cursors (yield_per) and writes one JSON
+object per line, so memory stays flat however large the database is. Status
+logs get their tracking number from a join, not a lookup per log.
+--since exports only shipments changed at or after that time (updated_at
+moves whenever a shipment or one of its status logs changes) together with
+their status logs. Apply an incremental export with
+restore_data.py --update-existing (import_to_render.py: "update") so edits to
+shipments already in the target are written, not skipped. Deletions are not
+exported: a shipment deleted locally stays in the target.
+Usage: python export_local_data.py [--gzip] [--since 2025-01-31T00:00:00]
 """
 import sys
 import os
+import argparse
+import gzip
 import json
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from sqlalchemy import select
+
 from app import app, db
 from models.shipment import Shipment
 from models.status_log import StatusLog
 
-def export_to_json():
-    """Export all data to JSON files"""
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH = 1000
+
+SHIPMENT_FIELDS = ['tracking_number', 'sender_name', 'sender_email', 'sender_phone', 'sender_address',
+                   'receiver_name', 'receiver_phone', 'receiver_address', 'package_type', 'weight',
+                   'shipment_cost', 'date_registered', 'estimated_delivery_date', 'status',
+                   'current_location', 'pdf_url', 'qr_url', 'created_by', 'created_by_email']
+STATUS_LOG_FIELDS = ['status', 'timestamp', 'location', 'coordinates', 'note']
+
+def _record(row):
+    return {key: value.isoformat() if isinstance(value, datetime) else value
+            for key, value in row._mapping.items()}
+
+def shipment_rows(since=None):
+    query = select(*[getattr(Shipment, field) for field in SHIPMENT_FIELDS])
+    if since:
+        query = query.where(Shipment.updated_at >= since)
+    query = query.order_by(Shipment.date_registered, Shipment.id)
+    return db.session.execute(query.execution_options(yield_per=EXPORT_BATCH))
+
+def status_log_rows(since=None):
+    # Outer join keeps orphaned logs in the export (with a null tracking number), as before
+    query = select(Shipment.tracking_number, *[getattr(StatusLog, field) for field in STATUS_LOG_FIELDS]) \
+        .select_from(StatusLog).outerjoin(Shipment, Shipment.id == StatusLog.shipment_id)
+    if since:
+        query = query.where(Shipment.updated_at >= since)
+    query = query.order_by(StatusLog.shipment_id, StatusLog.timestamp)
+    return db.session.execute(query.execution_options(yield_per=EXPORT_BATCH))
+
+def write_ndjson(path, rows, compress=False):
+    """Write rows to ``path`` one JSON object per line; returns the row count"""
+    count = 0
+    partial = path + '.partial'
+    opener = gzip.open if compress else open
+    with opener(partial, 'wt', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(_record(row), ensure_ascii=False))
+            f.write('\n')
+            count += 1
+    # Only replace a previous export once this one is complete
+    os.replace(partial, path)
+    return count
+
+def export_to_ndjson(compress=False, since=None):
+    """Export shipments and status logs to data_export/"""
     print("=" * 60)
-    print("📦 Exporting Local SQLite Data to JSON")
+    print("📦 Exporting Local SQLite Data to NDJSON")
     print("=" * 60)
-    
+
     local_db_path = os.path.join(os.path.dirname(__file__), 'instance', 'app.db')
     if not os.path.exists(local_db_path):
         print(f"❌ Local database not found at: {local_db_path}")
         return False
-    
+
     print(f"   Local database found: {local_db_path}")
-    
+    if since:
+        print(f"   Incremental export: shipments changed since {since.isoformat()}")
+
+    export_dir = os.path.join(os.path.dirname(__file__), 'data_export')
+    os.makedirs(export_dir, exist_ok=True)
+    extension = '.ndjson.gz' if compress else '.ndjson'
+    shipments_file = os.path.join(export_dir, 'shipments' + extension)
+    logs_file = os.path.join(export_dir, 'status_logs' + extension)
+
     with app.app_context():
-        # Export shipments
-        shipments = Shipment.query.all()
-        print(f"   Found {len(shipments)} shipments")
-        
-        shipments_data = []
-        for shipment in shipments:
-            shipments_data.append({
-                'tracking_number': shipment.tracking_number,
-                'sender_name': shipment.sender_name,
-                'sender_email': shipment.sender_email,
-                'sender_phone': shipment.sender_phone,
-                'sender_address': shipment.sender_address,
-                'receiver_name': shipment.receiver_name,
-                'receiver_phone': shipment.receiver_phone,
-                'receiver_address': shipment.receiver_address,
-                'package_type': shipment.package_type,
-                'weight': shipment.weight,
-                'shipment_cost': shipment.shipment_cost,
-                'date_registered': shipment.date_registered.isoformat() if shipment.date_registered else None,
-                'estimated_delivery_date': shipment.estimated_delivery_date.isoformat() if shipment.estimated_delivery_date else None,
-                'status': shipment.status,
-                'current_location': shipment.current_location,
-                'pdf_url': shipment.pdf_url,
-                'qr_url': shipment.qr_url,
-                'created_by': shipment.created_by,
-                'created_by_email': shipment.created_by_email,
-            })
-        
-        # Export status logs
-        status_logs = StatusLog.query.all()
-        print(f"   Found {len(status_logs)} status logs")
-        
-        status_logs_data = []
-        for log in status_logs:
-            # Find shipment tracking number
-            shipment = Shipment.query.get(log.shipment_id)
-            status_logs_data.append({
-                'tracking_number': shipment.tracking_number if shipment else None,
-                'status': log.status,
-                'timestamp': log.timestamp.isoformat() if log.timestamp else None,
-                'location': log.location,
-                'coordinates': log.coordinates,
-                'note': log.note,
-            })
-        
-        # Save to JSON files
-        export_dir = os.path.join(os.path.dirname(__file__), 'data_export')
-        os.makedirs(export_dir, exist_ok=True)
-        
-        shipments_file = os.path.join(export_dir, 'shipments.json')
-        logs_file = os.path.join(export_dir, 'status_logs.json')
-        
-        with open(shipments_file, 'w', encoding='utf-8') as f:
-            json.dump(shipments_data, f, indent=2, ensure_ascii=False)
-        
-        with open(logs_file, 'w', encoding='utf-8') as f:
-            json.dump(status_logs_data, f, indent=2, ensure_ascii=False)
-        
-        print(f"\n✅ Data exported successfully!")
-        print(f"   📄 Shipments: {shipments_file}")
-        print(f"   📄 Status Logs: {logs_file}")
-        print(f"\n   You can now:")
-        print(f"   1. Upload these files to Render")
-        print(f"   2. Run the import script on Render to import the data")
-        
-        return True
+        # Taken before reading, so changes made during the export land in the next one
+        watermark = datetime.utcnow()
+
+        shipment_count = write_ndjson(shipments_file, shipment_rows(since), compress)
+        print(f"   Exported {shipment_count} shipments")
+
+        log_count = write_ndjson(logs_file, status_log_rows(since), compress)
+        print(f"   Exported {log_count} status logs")
+
+    print(f"\n✅ Data exported successfully!")
+    print(f"   📄 Shipments: {shipments_file}")
+    print(f"   📄 Status Logs: {logs_file}")
+    print(f"   🔖 Next incremental export: python export_local_data.py --since {watermark.isoformat()}")
+    print(f"\n   You can now:")
+    print(f"   1. Upload these files to Render")
+    print(f"   2. Run the import script on Render to import the data")
+    if since:
+        print(f"      (python restore_data.py --update-existing, so changed shipments are updated;")
+        print(f"       deleted shipments are not part of the export and stay in the target)")
+
+    return True
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export shipments and status logs to NDJSON')
+    parser.add_argument('--gzip', action='store_true', help='write .ndjson.gz files')
+    parser.add_argument('--since', type=datetime.fromisoformat,
+                        help='only shipments changed at or after this UTC time (ISO format)')
+    args = parser.parse_args()
     try:
-        export_to_json()
+        if not export_to_ndjson(compress=args.gzip, since=args.since):
+            sys.exit(1)
     except Exception as e:
         print(f"\n❌ Error: {e}")
         import traceback
         traceback.print_exc()
         sys.exit(1)
-
-
-
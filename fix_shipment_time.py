@@ -10,6 +10,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from app import app
 from models.shipment import db, Shipment
 from models.status_log import StatusLog
+from utils.status_summary import reconcile_status_summary
 
 def fix_timestamp(tracking_number, status, new_datetime_str):
     """Update the timestamp for the most recent status log with the given status"""
@@ -49,6 +50,7 @@ def fix_timestamp(tracking_number, status, new_datetime_str):
         log.timestamp = timestamp
         
         try:
+            reconcile_status_summary([shipment.id])  # keep last_status_at / status_log_count in sync
             db.session.commit()
             print(f"\n✅ Successfully updated timestamp!")
             return True
@@ -0,0 +1,45 @@
+"""
+Import a shipment manifest (CSV or NDJSON) from the command line
+Streams the file through the same importer as POST /api/shipments/imports and
+records an import job, so progress also shows at GET /api/shipments/imports/<job_id>.
+Usage: python import_manifest.py manifest.csv [--format csv|ndjson] [--created-by EMAIL]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from utils.manifest_import import detect_format, create_job, run_import
+
+def main():
+    parser = argparse.ArgumentParser(description='Import a shipment manifest')
+    parser.add_argument('path', help='CSV or NDJSON manifest')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], help='defaults to the file extension')
+    parser.add_argument('--created-by', help='creator email stamped on the imported shipments')
+    args = parser.parse_args()
+
+    fmt = detect_format(args.path, requested=args.format)
+    if not fmt:
+        print("❌ Can't tell the manifest format - pass --format csv or --format ndjson")
+        return False
+    if not os.path.exists(args.path):
+        print(f"❌ File not found: {args.path}")
+        return False
+
+    with app.app_context():
+        job = create_job(os.path.basename(args.path), fmt, created_by_email=args.created_by)
+        print(f"📦 Importing {args.path} ({fmt}) as job {job.id}")
+        job = run_import(job.id, args.path)
+        print(f"   Status: {job.status}")
+        print(f"   Rows: {job.rows_processed} processed, {job.rows_imported} imported, {job.rows_failed} failed")
+        for error in job.to_dict()['errors'][:20]:
+            print(f"   Line {error['line']}: {error['error']}")
+        if job.rows_failed > 20:
+            print(f"   ... see GET /api/shipments/imports/{job.id} for the rest")
+        return job.status == 'completed'
+
+if __name__ == '__main__':
+    if not main():
+        sys.exit(1)
@@ -0,0 +1,87 @@
+"""
+Add per-session summary columns to chat_sessions and backfill them
+Adds message_count, last_message_at, last_sender, last_message_preview and
+unread_by_agent, then fills them from chat_messages with one UPDATE so the
+agent session list no longer has to aggregate messages.
+Usage: python migrations/add_chat_session_summary.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from sqlalchemy import text, inspect
+from models.chat_session import LAST_MESSAGE_PREVIEW_LENGTH
+
+NEW_COLUMNS = {
+    'message_count': 'INTEGER NOT NULL DEFAULT 0',
+    'last_message_at': 'TIMESTAMP NULL',
+    'last_sender': 'VARCHAR(20) NULL',
+    'last_message_preview': f'VARCHAR({LAST_MESSAGE_PREVIEW_LENGTH}) NULL',
+    'unread_by_agent': 'INTEGER NOT NULL DEFAULT 0',
+}
+
+# Correlated subqueries work the same on PostgreSQL and SQLite
+BACKFILL_SQL = f"""
+    UPDATE chat_sessions SET
+        message_count = (
+            SELECT COUNT(*) FROM chat_messages m WHERE m.session_id = chat_sessions.id
+        ),
+        last_message_at = (
+            SELECT MAX(m.timestamp) FROM chat_messages m WHERE m.session_id = chat_sessions.id
+        ),
+        last_sender = (
+            SELECT m.sender FROM chat_messages m WHERE m.session_id = chat_sessions.id
+            ORDER BY m.timestamp DESC LIMIT 1
+        ),
+        last_message_preview = (
+            SELECT SUBSTR(m.text, 1, {LAST_MESSAGE_PREVIEW_LENGTH}) FROM chat_messages m
+            WHERE m.session_id = chat_sessions.id
+            ORDER BY m.timestamp DESC LIMIT 1
+        ),
+        unread_by_agent = (
+            SELECT COUNT(*) FROM chat_messages m
+            WHERE m.session_id = chat_sessions.id AND m.sender = 'user'
+              AND NOT EXISTS (
+                  SELECT 1 FROM chat_messages a
+                  WHERE a.session_id = chat_sessions.id AND a.sender = 'agent'
+                    AND a.timestamp >= m.timestamp
+              )
+        )
+"""
+
+def migrate():
+    """Add the summary columns (if missing) and recompute them for every session"""
+    print("=" * 60)
+    print("🔄 Adding chat session summary columns")
+    print("=" * 60)
+
+    with app.app_context():
+        try:
+            inspector = inspect(db.engine)
+            if 'chat_sessions' not in inspector.get_table_names():
+                print("Chat tables do not exist. They will be created with all columns on first use.")
+                return True
+
+            existing = {col['name'] for col in inspector.get_columns('chat_sessions')}
+            missing = [name for name in NEW_COLUMNS if name not in existing]
+            for name in missing:
+                print(f"   Adding '{name}' column to chat_sessions...")
+                db.session.execute(text(f"ALTER TABLE chat_sessions ADD COLUMN {name} {NEW_COLUMNS[name]}"))
+            if not missing:
+                print("✅ Summary columns already exist - recomputing values")
+
+            result = db.session.execute(text(BACKFILL_SQL))
+            db.session.commit()
+            print(f"✅ Backfilled summaries for {result.rowcount} sessions")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == '__main__':
+    migrate()
@@ -10,6 +10,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models.shipment import db, Shipment
 from app import app
+from utils.schema_registry import mark_schema_changed
 
 def migrate():
     """Add created_by and created_by_email columns to shipments table"""
@@ -56,6 +57,7 @@ def migrate():
                         if 'created_by_email' in missing_columns:
                             db.session.execute(db.text("ALTER TABLE shipments ADD COLUMN created_by_email VARCHAR(100)"))
                         db.session.commit()
+                        mark_schema_changed()
                         print(f"✅ Successfully added columns: {', '.join(missing_columns)}")
                     except Exception as e:
                         # If ALTER TABLE fails (SQLite), we'll need to recreate the table
@@ -137,6 +139,7 @@ def migrate():
                         db.session.execute(db.text("CREATE UNIQUE INDEX IF NOT EXISTS ix_shipments_tracking_number ON shipments(tracking_number)"))
                         
                         db.session.commit()
+                        mark_schema_changed()
                         print("✅ Successfully migrated shipments table with new columns")
                 else:
                     print("Columns already exist. Skipping migration.")
@@ -10,6 +10,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models.shipment import db, Shipment
 from app import app
+from utils.schema_registry import mark_schema_changed
 
 def migrate():
     """Add current_location column to shipments table"""
@@ -41,6 +42,7 @@ def migrate():
                         # Try ALTER TABLE (works for PostgreSQL, MySQL)
                         db.session.execute(db.text("ALTER TABLE shipments ADD COLUMN current_location VARCHAR(200)"))
                         db.session.commit()
+                        mark_schema_changed()
                         print("✅ Successfully added current_location column")
                     except Exception as e:
                         # If ALTER TABLE fails (SQLite), we'll need to recreate the table
@@ -96,6 +98,7 @@ def migrate():
                         db.session.execute(db.text("CREATE UNIQUE INDEX IF NOT EXISTS ix_shipments_tracking_number ON shipments(tracking_number)"))
                         
                         db.session.commit()
+                        mark_schema_changed()
                         print("✅ Successfully migrated shipments table with current_location column")
                 else:
                     print("Column already exists. Skipping migration.")
@@ -0,0 +1,79 @@
+"""
+Add the indexes behind status history, shipment listing and the list filters
+    status_logs (shipment_id, timestamp)        - GET .../status history
+    shipments (date_registered, id)             - GET /all paging and exports
+    shipments (status, date_registered)         - ?status= filter
+    shipments (created_by_email, date_registered) - ?created_by= / manager scoping
+Works on SQLite and PostgreSQL; on PostgreSQL the indexes are built
+CONCURRENTLY so shipments keep accepting writes while they build.
+Usage: python migrations/add_shipment_indexes.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from sqlalchemy import text, inspect
+
+# (name, table, columns) - keep in sync with __table_args__ in models/
+INDEXES = [
+    ('ix_status_logs_shipment_id_timestamp', 'status_logs', ('shipment_id', 'timestamp')),
+    ('ix_shipments_date_registered', 'shipments', ('date_registered', 'id')),
+    ('ix_shipments_status_date_registered', 'shipments', ('status', 'date_registered')),
+    ('ix_shipments_created_by_email_date_registered', 'shipments', ('created_by_email', 'date_registered')),
+]
+
+def create_index_sql(name, table, columns, concurrently=False):
+    return (f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name} "
+            f"ON {table} ({', '.join(columns)})")
+
+def migrate():
+    """Create any missing indexes and refresh planner statistics"""
+    print("=" * 60)
+    print("🔄 Adding shipment and status log indexes")
+    print("=" * 60)
+
+    with app.app_context():
+        try:
+            inspector = inspect(db.engine)
+            tables = set(inspector.get_table_names())
+            is_postgres = db.engine.dialect.name == 'postgresql'
+
+            # CREATE INDEX CONCURRENTLY can't run inside a transaction
+            conn = db.engine.connect()
+            if is_postgres:
+                conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+            with conn:
+                touched = set()
+                for name, table, columns in INDEXES:
+                    if table not in tables:
+                        print(f"   Skipping {name}: table '{table}' does not exist")
+                        continue
+                    existing_columns = {col['name'] for col in inspector.get_columns(table)}
+                    missing = [col for col in columns if col not in existing_columns]
+                    if missing:
+                        print(f"   Skipping {name}: missing column(s) {', '.join(missing)} - run the older migrations first")
+                        continue
+                    if name in {ix['name'] for ix in inspector.get_indexes(table)}:
+                        print(f"✅ {name} already exists")
+                        continue
+                    print(f"   Creating {name} on {table} ({', '.join(columns)})...")
+                    conn.execute(text(create_index_sql(name, table, columns, concurrently=is_postgres)))
+                    touched.add(table)
+
+                for table in sorted(touched):
+                    conn.execute(text(f"ANALYZE {table}"))
+                if not is_postgres:
+                    conn.commit()
+
+            print(f"✅ Indexes up to date ({len(touched)} table(s) changed)")
+            return True
+
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == '__main__':
+    migrate()
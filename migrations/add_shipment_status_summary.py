@@ -0,0 +1,60 @@
+"""
+Add shipments.last_status_at and shipments.status_log_count and backfill them
+The backfill is the same set-based pass as reconcile_status_summary.py.
+The app also does this on startup (utils/schema_upgrade.py); the script
+remains for running it ahead of a deploy.
+Usage: python migrations/add_shipment_status_summary.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from sqlalchemy import text, inspect
+from utils.schema_registry import schema_registry, mark_schema_changed
+from utils.status_summary import reconcile_status_summary
+
+NEW_COLUMNS = {
+    'last_status_at': 'TIMESTAMP NULL',
+    'status_log_count': 'INTEGER NOT NULL DEFAULT 0',
+}
+
+def migrate():
+    """Add the summary columns (if missing) and recompute them for every shipment"""
+    print("=" * 60)
+    print("🔄 Adding shipment status summary columns")
+    print("=" * 60)
+
+    with app.app_context():
+        try:
+            inspector = inspect(db.engine)
+            if 'shipments' not in inspector.get_table_names():
+                print("Shipments table does not exist. It will be created with all columns on first use.")
+                return True
+
+            existing = {col['name'] for col in inspector.get_columns('shipments')}
+            missing = [name for name in NEW_COLUMNS if name not in existing]
+            for name in missing:
+                print(f"   Adding '{name}' column to shipments...")
+                db.session.execute(text(f"ALTER TABLE shipments ADD COLUMN {name} {NEW_COLUMNS[name]}"))
+            if missing:
+                db.session.commit()
+                mark_schema_changed()
+                schema_registry.invalidate()
+            else:
+                print("✅ Summary columns already exist - recomputing values")
+
+            changed = reconcile_status_summary()
+            db.session.commit()
+            print(f"✅ Backfilled status summaries for {changed} shipments")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,52 @@
+"""
+Add shipments.updated_at (the conditional-GET marker) and backfill it
+Existing shipments get the time of their latest status log, or their
+registration date if they have none.
+The app also does this on startup (utils/schema_upgrade.py); the script
+remains for running it ahead of a deploy.
+Usage: python migrations/add_shipment_updated_at.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from sqlalchemy import text, inspect
+from utils.schema_registry import mark_schema_changed
+from utils.schema_upgrade import backfill_updated_at
+
+def migrate():
+    """Add the updated_at column (if missing) and fill it for rows that have none"""
+    print("=" * 60)
+    print("🔄 Adding shipments.updated_at")
+    print("=" * 60)
+
+    with app.app_context():
+        try:
+            inspector = inspect(db.engine)
+            if 'shipments' not in inspector.get_table_names():
+                print("Shipments table does not exist. It will be created with the new column on first use.")
+                return True
+
+            existing = {col['name'] for col in inspector.get_columns('shipments')}
+            if 'updated_at' not in existing:
+                print("   Adding 'updated_at' column to shipments...")
+                db.session.execute(text("ALTER TABLE shipments ADD COLUMN updated_at TIMESTAMP NULL"))
+            else:
+                print("✅ updated_at already exists - backfilling empty values")
+
+            backfilled = backfill_updated_at()
+            db.session.commit()
+            mark_schema_changed()
+            print(f"✅ Backfilled updated_at for {backfilled} shipments")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == '__main__':
+    migrate()
@@ -7,6 +7,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import app, db
+from utils.schema_registry import mark_schema_changed
 from sqlalchemy import text
 
 def migrate():
@@ -35,6 +36,7 @@ def migrate():
                 ADD COLUMN deleted_at TIMESTAMP NULL
             """))
             db.session.commit()
+            mark_schema_changed()
             print("✅ Added 'deleted_at' column to shipments table")
             print("\n💡 Note: To use soft delete, update your delete endpoint")
             print("   to set deleted_at instead of deleting the record.")
@@ -0,0 +1,111 @@
+"""
+One-shot import of chat history from the old JSON files into SQL
+Reads data/chat_sessions.json and data/chat_messages.json and inserts them
+into the chat_sessions / chat_messages tables. Rows that already exist are
+skipped, so the script can be re-run safely.
+Usage: python migrations/import_chat_json.py
+"""
+import sys
+import os
+import json
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+
+from app import app, db
+from models.chat_session import ChatSession
+from models.chat_message import ChatMessage
+
+CHAT_SESSIONS_FILE = os.path.join('data', 'chat_sessions.json')
+CHAT_MESSAGES_FILE = os.path.join('data', 'chat_messages.json')
+
+def _load_json(path):
+    if not os.path.exists(path):
+        print(f"   {path} not found - skipping")
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def _parse_timestamp(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except (ValueError, AttributeError):
+        return None
+
+def migrate():
+    """Copy chat sessions and messages from JSON into the database"""
+    print("=" * 60)
+    print("🔄 Importing chat history from JSON files")
+    print("=" * 60)
+    
+    with app.app_context():
+        try:
+            db.create_all()
+            
+            sessions = _load_json(CHAT_SESSIONS_FILE)
+            messages = _load_json(CHAT_MESSAGES_FILE)
+            print(f"   Found {len(sessions)} sessions and {sum(len(m) for m in messages.values())} messages")
+            
+            # One query each for the ids already present instead of a lookup per row
+            existing_sessions = {row[0] for row in db.session.query(ChatSession.id).all()}
+            existing_messages = {row[0] for row in db.session.query(ChatMessage.id).all()}
+            last_seq = dict(db.session.query(ChatMessage.session_id, func.max(ChatMessage.seq))
+                            .group_by(ChatMessage.session_id).all())
+            
+            session_rows = []
+            for session_id, data in sessions.items():
+                if session_id in existing_sessions:
+                    continue
+                created_at = _parse_timestamp(data.get('createdAt')) or datetime.utcnow()
+                session_rows.append({
+                    'id': session_id,
+                    'email': data.get('email') or '',
+                    'name': data.get('name'),
+                    'status': data.get('status') or 'active',
+                    'created_at': created_at,
+                    'updated_at': _parse_timestamp(data.get('updatedAt')) or created_at,
+                    'assigned_agent': data.get('assignedAgent')
+                })
+            
+            message_rows = []
+            for session_id, session_messages in messages.items():
+                # Messages for sessions that no longer exist would violate the foreign key
+                if session_id not in sessions and session_id not in existing_sessions:
+                    continue
+                # Continue each session's seq after the messages it already has
+                next_seq = last_seq.get(session_id) or 0
+                for message in session_messages:
+                    if not message.get('id') or message['id'] in existing_messages:
+                        continue
+                    next_seq += 1
+                    message_rows.append({
+                        'id': message['id'],
+                        'session_id': session_id,
+                        'text': message.get('text') or '',
+                        'sender': message.get('sender') or 'user',
+                        'timestamp': _parse_timestamp(message.get('timestamp')) or datetime.utcnow(),
+                        'seq': next_seq
+                    })
+            
+            if session_rows:
+                db.session.bulk_insert_mappings(ChatSession, session_rows)
+            if message_rows:
+                db.session.bulk_insert_mappings(ChatMessage, message_rows)
+            db.session.commit()
+            
+            print(f"✅ Imported {len(session_rows)} sessions and {len(message_rows)} messages")
+            print("\n💡 Note: the JSON files are left in place; remove them once the import is verified.")
+            return True
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,34 @@
+import json
+from datetime import datetime
+
+# The db instance will be initialized in app.py
+from .shipment import db
+
+class ChangeEvent(db.Model):
+    """One entry of the shipment change feed (utils/change_feed.py)"""
+    __tablename__ = 'change_events'
+    # AUTOINCREMENT on SQLite so sequence numbers are never reused, even after pruning
+    __table_args__ = {'sqlite_autoincrement': True}
+    seq = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    entity = db.Column(db.String(20), nullable=False)  # shipment | status_log
+    action = db.Column(db.String(20), nullable=False)  # created | updated | deleted
+    shipment_id = db.Column(db.String(36), nullable=False)
+    tracking_number = db.Column(db.String(64), nullable=True)
+    data = db.Column(db.Text, nullable=True)  # JSON: changed fields / new status log
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @staticmethod
+    def row_to_dict(row):
+        """A change_events row (from raw SQL) as the API returns it"""
+        created_at = row['created_at']
+        if isinstance(created_at, datetime):
+            created_at = created_at.isoformat()
+        return {
+            'seq': row['seq'],
+            'entity': row['entity'],
+            'action': row['action'],
+            'shipment_id': row['shipment_id'],
+            'tracking_number': row['tracking_number'],
+            'data': json.loads(row['data']) if row['data'] else None,
+            'created_at': created_at
+        }
@@ -0,0 +1,31 @@
+import uuid
+from datetime import datetime
+
+# The db instance will be initialized in app.py
+from .shipment import db
+
+class ChatMessage(db.Model):
+    __tablename__ = 'chat_messages'
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))  # Unique ID
+    session_id = db.Column(db.String(36), db.ForeignKey('chat_sessions.id', ondelete='CASCADE'), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    sender = db.Column(db.String(20), nullable=False)  # user, assistant, agent
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # Per-session position (1, 2, ...) assigned at insert; the ?since= cursor is keyed on it
+    seq = db.Column(db.Integer, nullable=True)
+
+    # Messages are always read per session in order. The unique (session_id, seq)
+    # index makes two concurrent appends that picked the same seq fail instead of
+    # both committing, so seq order is commit order within a session.
+    __table_args__ = (
+        db.Index('ix_chat_messages_session_timestamp', 'session_id', 'timestamp'),
+        db.Index('ix_chat_messages_session_seq', 'session_id', 'seq', unique=True),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'text': self.text,
+            'sender': self.sender,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None
+        }
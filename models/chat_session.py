@@ -0,0 +1,47 @@
+import uuid
+from datetime import datetime
+
+# The db instance will be initialized in app.py
+from .shipment import db
+
+# Characters of the newest message kept on the session row for the agent list
+LAST_MESSAGE_PREVIEW_LENGTH = 200
+
+class ChatSession(db.Model):
+    __tablename__ = 'chat_sessions'
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))  # Unique ID
+    email = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(100), nullable=True)
+    status = db.Column(db.String(30), nullable=False, default='active')  # active, waiting_agent, agent_active, agent_assigned, ended
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    assigned_agent = db.Column(db.String(100), nullable=True)
+
+    # Summary kept up to date on every append so the session list never reads message bodies
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+    last_message_at = db.Column(db.DateTime, nullable=True)
+    last_sender = db.Column(db.String(20), nullable=True)
+    last_message_preview = db.Column(db.String(LAST_MESSAGE_PREVIEW_LENGTH), nullable=True)
+    unread_by_agent = db.Column(db.Integer, nullable=False, default=0)  # customer messages since the last agent reply
+
+    # Agent session list filters by status and sorts by most recent activity
+    __table_args__ = (
+        db.Index('ix_chat_sessions_status_updated_at', 'status', 'updated_at'),
+    )
+
+    def to_dict(self):
+        """Serialize with the camelCase keys the chat widget expects"""
+        return {
+            'id': self.id,
+            'email': self.email,
+            'name': self.name,
+            'status': self.status,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'updatedAt': self.updated_at.isoformat() if self.updated_at else None,
+            'assignedAgent': self.assigned_agent,
+            'messageCount': self.message_count or 0,
+            'lastMessage': self.last_message_preview or '',
+            'lastMessageTime': self.last_message_at.isoformat() if self.last_message_at else '',
+            'lastSender': self.last_sender,
+            'unreadByAgent': self.unread_by_agent or 0
+        }
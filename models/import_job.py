@@ -0,0 +1,41 @@
+import json
+import uuid
+from datetime import datetime
+
+# The db instance will be initialized in app.py
+from .shipment import db
+
+class ImportJob(db.Model):
+    """Progress of one manifest import (utils/manifest_import.py)"""
+    __tablename__ = 'import_jobs'
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    source = db.Column(db.String(255), nullable=True)  # Uploaded filename or CLI path
+    format = db.Column(db.String(10), nullable=False)  # csv | ndjson
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued | running | completed | failed
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    rows_imported = db.Column(db.Integer, nullable=False, default=0)
+    rows_failed = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Text, nullable=True)  # JSON list of {line, tracking_number, error}, capped
+    message = db.Column(db.Text, nullable=True)  # Why the job failed, if it did
+    created_by = db.Column(db.String(100), nullable=True)  # User ID that started the import
+    created_by_email = db.Column(db.String(100), nullable=True)  # Also stamped on the imported shipments
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'source': self.source,
+            'format': self.format,
+            'status': self.status,
+            'rows_processed': self.rows_processed,
+            'rows_imported': self.rows_imported,
+            'rows_failed': self.rows_failed,
+            'errors': json.loads(self.errors) if self.errors else [],
+            'message': self.message,
+            'created_by_email': self.created_by_email,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
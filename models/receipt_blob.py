@@ -0,0 +1,14 @@
+from datetime import datetime
+
+# The db instance will be initialized in app.py
+from .shipment import db
+
+class ReceiptBlob(db.Model):
+    """Rendered PDF receipt or QR code stored in the database (RECEIPT_STORAGE=db)"""
+    __tablename__ = 'receipt_blobs'
+    key = db.Column(db.String(120), primary_key=True)  # <tracking>-<hash prefix>.pdf or <tracking>_qr-<hash>.png
+    tracking_number = db.Column(db.String(64), nullable=False, index=True)
+    content = db.Column(db.LargeBinary, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    checksum = db.Column(db.String(64), nullable=False)  # sha256 of content
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
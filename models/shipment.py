@@ -8,6 +8,12 @@ db = SQLAlchemy()
 
 class Shipment(db.Model):
     __tablename__ = 'shipments'
+    __table_args__ = (
+        # Listing sorts by (date_registered, id); the filters keep that order - see migrations/add_shipment_indexes.py
+        db.Index('ix_shipments_date_registered', 'date_registered', 'id'),
+        db.Index('ix_shipments_status_date_registered', 'status', 'date_registered'),
+        db.Index('ix_shipments_created_by_email_date_registered', 'created_by_email', 'date_registered'),
+    )
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))  # Unique ID
     tracking_number = db.Column(db.String(64), unique=True, nullable=False)
     sender_name = db.Column(db.String(100), nullable=False)
@@ -24,10 +30,13 @@ class Shipment(db.Model):
     estimated_delivery_date = db.Column(db.DateTime, nullable=True)
     status = db.Column(db.String(50), nullable=False, default='Registered')
     current_location = db.Column(db.String(200), nullable=True)  # Latest location from status updates
+    last_status_at = db.Column(db.DateTime, nullable=True)  # Newest status log timestamp (see utils/status_summary.py)
+    status_log_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Number of status logs
     pdf_url = db.Column(db.String(200), nullable=True)
     qr_url = db.Column(db.String(200), nullable=True)
     created_by = db.Column(db.String(100), nullable=True)  # User ID who created the shipment
     created_by_email = db.Column(db.String(100), nullable=True)  # Email of creator for easier filtering
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Bumped on any change to the shipment or its status logs (ETag marker)
 
     # Relationship to status logs
     status_logs = db.relationship('StatusLog', backref='shipment', lazy=True) 
\ No newline at end of file
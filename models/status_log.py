@@ -7,10 +7,35 @@ from .shipment import db
 
 class StatusLog(db.Model):
     __tablename__ = 'status_logs'
+    __table_args__ = (
+        # Status history is always fetched per shipment in timestamp order
+        db.Index('ix_status_logs_shipment_id_timestamp', 'shipment_id', 'timestamp'),
+    )
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))  # Unique ID
     shipment_id = db.Column(db.String(36), db.ForeignKey('shipments.id'), nullable=False)
     status = db.Column(db.String(50), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     location = db.Column(db.String(100), nullable=True)
     coordinates = db.Column(db.String(100), nullable=True)  # Optional: e.g., 'lat,lng'
-    note = db.Column(db.Text, nullable=True) 
\ No newline at end of file
+    note = db.Column(db.Text, nullable=True) 
+
+@db.event.listens_for(db.session, 'before_flush')
+def _touch_shipments(session, flush_context, instances):
+    """Bump shipments.updated_at whenever one of its status logs changes.
+
+    Covers the routes and the one-off maintenance scripts alike, so the
+    conditional-GET validators (utils/http_cache.py) never go stale.
+    """
+    from .shipment import Shipment
+    shipment_ids = {
+        obj.shipment_id for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if isinstance(obj, StatusLog) and obj.shipment_id
+    }
+    if not shipment_ids:
+        return
+    now = datetime.utcnow()
+    with session.no_autoflush:
+        for shipment_id in shipment_ids:
+            shipment = session.get(Shipment, shipment_id)
+            if shipment is not None:
+                shipment.updated_at = now
@@ -0,0 +1,32 @@
+"""
+Recompute shipments.last_status_at and shipments.status_log_count from status_logs
+Run after bulk imports, restores or manual edits to status_logs. Only rows
+whose values changed are written, so it is safe to run at any time.
+Usage: python reconcile_status_summary.py
+"""
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from models.shipment import db
+from utils.status_summary import reconcile_status_summary
+
+def reconcile():
+    with app.app_context():
+        start = time.perf_counter()
+        try:
+            changed = reconcile_status_summary()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Reconciliation failed: {e}")
+            return False
+        print(f"✅ Reconciled status summaries: {changed} shipments updated in {time.perf_counter() - start:.2f}s")
+        return True
+
+if __name__ == '__main__':
+    if not reconcile():
+        sys.exit(1)
@@ -10,6 +10,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from app import app
 from models.shipment import db, Shipment
 from models.status_log import StatusLog
+from utils.status_summary import reconcile_status_summary
 
 def parse_date_string(date_str):
     """Parse date string in various formats"""
@@ -126,6 +127,7 @@ def replace_status_entry(tracking_number, old_date_str, new_status, new_location
         # Save to database
         try:
             db.session.add(new_log)
+            reconcile_status_summary([shipment.id])  # keep last_status_at / status_log_count in sync
             db.session.commit()
             
             print(f"\n✅ Successfully replaced status entry!")
@@ -0,0 +1,42 @@
+from flask import Blueprint, request, jsonify
+from utils.auth_utils import require_admin
+from utils.change_feed import changes_after, DEFAULT_CHANGES_LIMIT, MAX_CHANGES_LIMIT
+
+changes_bp = Blueprint('changes_bp', __name__)
+
+@changes_bp.route('', methods=['GET'])
+def get_changes():
+    """Shipment and status log changes after a sequence number, oldest first.
+
+    Query params:
+        after: last seq the client has seen (default 0 - from the beginning)
+        limit: page size (default 100, max 1000)
+    Keep calling with after=<next_after> while has_more is true.
+    """
+    is_admin_user, _ = require_admin()
+    if not is_admin_user:
+        return jsonify({'success': False, 'error': 'Admin access required'}), 403
+
+    try:
+        after = int(request.args.get('after', 0))
+        limit = int(request.args.get('limit', DEFAULT_CHANGES_LIMIT))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'after and limit must be integers'}), 400
+    if after < 0:
+        return jsonify({'success': False, 'error': 'after must be 0 or greater'}), 400
+    limit = max(1, min(limit, MAX_CHANGES_LIMIT))
+
+    try:
+        # One extra row tells whether another page follows
+        changes = changes_after(after, limit + 1)
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        return jsonify({
+            'success': True,
+            'changes': changes,
+            'next_after': changes[-1]['seq'] if changes else after,
+            'has_more': has_more
+        })
+    except Exception as e:
+        print(f"❌ Error reading change feed: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -1,48 +1,47 @@
-from flask import Blueprint, request, jsonify, session
-from datetime import datetime
-import uuid
+from flask import Blueprint, request, jsonify, session, Response, stream_with_context
+from utils.user_store import get_user
+from utils.chat_store import chat_store
+from utils.chat_notifier import chat_notifier
+from utils.chat_events import chat_events
 import json
 import os
+import queue
+import threading
+import time
 
 chat_bp = Blueprint('chat_bp', __name__)
 
-# File paths for data storage
-CHAT_SESSIONS_FILE = os.path.join('data', 'chat_sessions.json')
-CHAT_MESSAGES_FILE = os.path.join('data', 'chat_messages.json')
+# Upper bound for ?wait= on GET /sessions/<id>/messages
+MAX_LONG_POLL_SECONDS = 30
 
-# Ensure data directory exists
-if not os.path.exists('data'):
-    os.makedirs('data')
+# SSE stream: comment line every HEARTBEAT seconds, close after MAX seconds (clients reconnect)
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_MAX_SECONDS = 300
 
-# Helper: Load chat sessions from file
-def load_chat_sessions():
-    if not os.path.exists(CHAT_SESSIONS_FILE):
-        return {}
-    try:
-        with open(CHAT_SESSIONS_FILE, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return {}
+# Long polls and SSE streams allowed to hold a worker thread at once (per
+# process). Keep it well below gunicorn's --threads (Procfile: 32) so tracking,
+# PDF and admin requests always have threads left; past the cap, long polls
+# answer immediately and streams ask the client to reconnect later.
+MAX_CHAT_WAITERS = int(os.environ.get('CHAT_MAX_WAITERS', '16'))
+WAITERS_FULL_RETRY_SECONDS = 10
+_waiter_slots = threading.BoundedSemaphore(MAX_CHAT_WAITERS)
 
-# Helper: Save chat sessions to file
-def save_chat_sessions(sessions):
-    with open(CHAT_SESSIONS_FILE, 'w') as f:
-        json.dump(sessions, f, indent=2)
+# Upper bound for ?limit= on the agent session list
+MAX_SESSION_PAGE_SIZE = 200
 
-# Helper: Load chat messages from file
-def load_chat_messages():
-    if not os.path.exists(CHAT_MESSAGES_FILE):
-        return {}
-    try:
-        with open(CHAT_MESSAGES_FILE, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return {}
+# Helper: Wake long-poll waiters (events may have been relayed from another worker)
+def _on_chat_event(event):
+    if event['type'] == 'message':
+        chat_notifier.notify(event['session_id'])
+    elif event['type'] == 'session_deleted':
+        chat_notifier.forget(event['session_id'])
 
-# Helper: Save chat messages to file
-def save_chat_messages(messages):
-    with open(CHAT_MESSAGES_FILE, 'w') as f:
-        json.dump(messages, f, indent=2)
+chat_events.add_listener(_on_chat_event)
+
+# Helper: Publish one 'message' event per new message
+def publish_messages(session_id, messages):
+    for message in messages:
+        chat_events.publish('message', session_id, message=message)
 
 # Helper: Get user ID from session (for admin endpoints)
 def get_user_id():
@@ -53,17 +52,9 @@ def is_admin():
     user_id = get_user_id()
     if not user_id:
         return False
-    try:
-        users_file = os.path.join('data', 'users.json')
-        if os.path.exists(users_file):
-            with open(users_file, 'r') as f:
-                users = json.load(f)
-                user = users.get(user_id, {})
-                role = user.get('role', '').lower()
-                return role in ['admin', 'super admin', 'manager']
-    except:
-        pass
-    return False
+    user = get_user(user_id) or {}
+    role = user.get('role', '').lower()
+    return role in ['admin', 'super admin', 'manager']
 
 # 1. Create Chat Session
 @chat_bp.route('/sessions', methods=['POST', 'OPTIONS'])
@@ -79,27 +70,8 @@ def create_chat_session():
         if not email:
             return jsonify({'success': False, 'error': 'Email is required'}), 400
         
-        sessions = load_chat_sessions()
-        session_id = str(uuid.uuid4())
-        
-        session_data = {
-            'id': session_id,
-            'email': email,
-            'name': name,
-            'status': 'active',
-            'createdAt': datetime.utcnow().isoformat(),
-            'updatedAt': datetime.utcnow().isoformat(),
-            'assignedAgent': None
-        }
-        
-        sessions[session_id] = session_data
-        save_chat_sessions(sessions)
-        
-        # Initialize empty messages for this session
-        messages = load_chat_messages()
-        if session_id not in messages:
-            messages[session_id] = []
-            save_chat_messages(messages)
+        session_data = chat_store.create_session(email, name)
+        chat_events.publish('session_created', session_data['id'], session=session_data)
         
         return jsonify({
             'success': True,
@@ -115,8 +87,7 @@ def get_chat_session(session_id):
         return jsonify({'ok': True}), 200
     
     try:
-        sessions = load_chat_sessions()
-        session_data = sessions.get(session_id)
+        session_data = chat_store.get_session(session_id)
         
         if not session_data:
             return jsonify({'success': False, 'error': 'Session not found'}), 404
@@ -141,78 +112,49 @@ def get_all_chat_sessions():
             return jsonify({'success': False, 'error': 'Unauthorized'}), 401
         
         # Check user role
-        users_file = os.path.join('data', 'users.json')
-        if not os.path.exists(users_file):
+        user = get_user(user_id)
+        if not user:
             return jsonify({'success': False, 'error': 'Unauthorized'}), 401
         
-        with open(users_file, 'r') as f:
-            users = json.load(f)
-            user = users.get(user_id, {})
-            role = user.get('role', '').lower()
-            # Support, Manager, and Super Admin can access chat
-            if role not in ['support', 'manager', 'admin', 'super admin', 'superadmin']:
-                return jsonify({'success': False, 'error': 'Unauthorized'}), 401
-        
-        sessions = load_chat_sessions()
-        messages = load_chat_messages()
+        role = user.get('role', '').lower()
+        # Support, Manager, and Super Admin can access chat
+        if role not in ['support', 'manager', 'admin', 'super admin', 'superadmin']:
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 401
         
         # Get filter parameters
         status_filter = request.args.get('status')
         email_filter = request.args.get('email')
         
         # Get current user email to filter sessions (only show sessions for logged-in user's email)
-        user_id = get_user_id()
-        current_user_email = None
-        if user_id:
-            try:
-                users_file = os.path.join('data', 'users.json')
-                if os.path.exists(users_file):
-                    with open(users_file, 'r') as f:
-                        users = json.load(f)
-                        user = users.get(user_id, {})
-                        current_user_email = user.get('email', '').lower()
-            except:
-                pass
-        
-        sessions_list = []
-        for session_id, session_data in sessions.items():
-            # Apply filters
-            if status_filter and status_filter != 'all' and session_data.get('status') != status_filter:
-                continue
-            if email_filter and email_filter.lower() not in session_data.get('email', '').lower():
-                continue
-            
-            # For non-admin users, only show their own sessions
-            # For admin users, show all sessions
-            session_email = session_data.get('email', '').lower()
-            if current_user_email and role not in ['admin', 'super admin', 'superadmin', 'manager', 'support']:
-                if session_email != current_user_email:
-                    continue
-            
-            # Get message count and last message
-            session_messages = messages.get(session_id, [])
-            last_message = session_messages[-1] if session_messages else None
-            
-            session_info = {
-                'id': session_data.get('id'),
-                'email': session_data.get('email'),
-                'name': session_data.get('name'),
-                'status': session_data.get('status', 'active'),
-                'assignedAgent': session_data.get('assignedAgent'),
-                'createdAt': session_data.get('createdAt'),
-                'updatedAt': session_data.get('updatedAt'),
-                'messageCount': len(session_messages),
-                'lastMessage': last_message.get('text', '') if last_message else '',
-                'lastMessageTime': last_message.get('timestamp', '') if last_message else ''
-            }
-            sessions_list.append(session_info)
-        
-        # Sort by updatedAt (most recent first)
-        sessions_list.sort(key=lambda x: x.get('updatedAt', ''), reverse=True)
+        current_user_email = user.get('email', '').lower() or None
+        
+        # Optional paging; without a limit every matching session is returned
+        limit = request.args.get('limit', type=int)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        if limit is not None:
+            limit = max(1, min(limit, MAX_SESSION_PAGE_SIZE))
+        
+        # Sessions come back sorted by updatedAt (most recent first), summary fields included
+        sessions_list = chat_store.list_sessions(
+            status=status_filter if status_filter and status_filter != 'all' else None,
+            email_contains=email_filter,
+            limit=limit + 1 if limit is not None else None,
+            offset=offset
+        )
+        has_more = limit is not None and len(sessions_list) > limit
+        if has_more:
+            sessions_list = sessions_list[:limit]
+        
+        # For non-admin users, only show their own sessions
+        # For admin users, show all sessions
+        if current_user_email and role not in ['admin', 'super admin', 'superadmin', 'manager', 'support']:
+            sessions_list = [s for s in sessions_list if (s.get('email') or '').lower() == current_user_email]
         
         return jsonify({
             'success': True,
-            'sessions': sessions_list
+            'sessions': sessions_list,
+            'has_more': has_more,
+            'next_offset': offset + len(sessions_list) if has_more else None
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -228,25 +170,32 @@ def update_chat_session(session_id):
         if not is_admin():
             return jsonify({'success': False, 'error': 'Unauthorized'}), 401
         
-        sessions = load_chat_sessions()
-        session_data = sessions.get(session_id)
-        
-        if not session_data:
-            return jsonify({'success': False, 'error': 'Session not found'}), 404
-        
-        data = request.get_json()
+        data = request.get_json() or {}
+        changes = {}
         
         # Update status if provided
         if 'status' in data:
-            session_data['status'] = data['status']
+            changes['status'] = data['status']
         
         # Update assigned agent if provided
         if 'assignedAgent' in data:
-            session_data['assignedAgent'] = data['assignedAgent']
+            changes['assigned_agent'] = data['assignedAgent']
+        
+        # Agent opened the session - clear its unread counter
+        if data.get('markRead'):
+            changes['mark_read'] = True
         
-        session_data['updatedAt'] = datetime.utcnow().isoformat()
-        sessions[session_id] = session_data
-        save_chat_sessions(sessions)
+        session_data = chat_store.update_session(session_id, **changes)
+        if not session_data:
+            return jsonify({'success': False, 'error': 'Session not found'}), 404
+        
+        if changes.get('status') == 'ended':
+            event_type = 'session_ended'
+        elif changes.get('assigned_agent'):
+            event_type = 'agent_assigned'
+        else:
+            event_type = 'session_updated'
+        chat_events.publish(event_type, session_id, session=session_data)
         
         return jsonify({
             'success': True,
@@ -262,16 +211,55 @@ def get_chat_messages(session_id):
         return jsonify({'ok': True}), 200
     
     try:
-        messages = load_chat_messages()
-        session_messages = messages.get(session_id, [])
-        
-        # Sort messages by timestamp
-        session_messages.sort(key=lambda x: x.get('timestamp', ''))
-        
-        return jsonify({
+        # Optional incremental polling:
+        #   since=<message id or ISO timestamp> - only messages after that point
+        #   wait=<seconds> - if nothing new yet, block until a message arrives (max 30s)
+        since = request.args.get('since')
+        try:
+            wait_seconds = min(max(float(request.args.get('wait') or 0), 0), MAX_LONG_POLL_SECONDS)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'wait must be a number of seconds'}), 400
+        
+        # Take the version before reading so a message sent in between still wakes us
+        version = chat_notifier.version(session_id)
+        try:
+            # Messages come back in timestamp order
+            session_messages = chat_store.get_messages(session_id, since=since)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        # Only wait if a waiter slot is free; otherwise answer now and ask for a backoff
+        waiting = not session_messages and wait_seconds > 0 and _waiter_slots.acquire(blocking=False)
+        busy = not session_messages and wait_seconds > 0 and not waiting
+        try:
+            deadline = time.monotonic() + wait_seconds
+            while waiting and not session_messages:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                chat_store.release_connection()
+                woken = chat_notifier.wait(session_id, version, remaining)
+                version = chat_notifier.version(session_id)
+                # Re-read even on timeout - another worker may have appended meanwhile
+                session_messages = chat_store.get_messages(session_id, since=since)
+                if not woken:
+                    break
+        finally:
+            if waiting:
+                _waiter_slots.release()
+        
+        body = {
             'success': True,
-            'messages': session_messages
-        })
+            'messages': session_messages,
+            # Pass back as ?since= on the next poll
+            'cursor': session_messages[-1]['id'] if session_messages else since
+        }
+        if busy:
+            body['retry_after'] = WAITERS_FULL_RETRY_SECONDS
+            response = jsonify(body)
+            response.headers['Retry-After'] = str(WAITERS_FULL_RETRY_SECONDS)
+            return response
+        return jsonify(body)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -288,24 +276,14 @@ def send_chat_message(session_id):
         if not message_text:
             return jsonify({'success': False, 'error': 'Message is required'}), 400
         
-        sessions = load_chat_sessions()
-        session_data = sessions.get(session_id)
+        session_data = chat_store.get_session(session_id)
         
         if not session_data:
             return jsonify({'success': False, 'error': 'Session not found'}), 404
         
-        messages = load_chat_messages()
-        if session_id not in messages:
-            messages[session_id] = []
-        
         # Add user message
-        user_message = {
-            'id': str(uuid.uuid4()),
-            'text': message_text,
-            'sender': 'user',
-            'timestamp': datetime.utcnow().isoformat()
-        }
-        messages[session_id].append(user_message)
+        new_messages = [{'text': message_text, 'sender': 'user'}]
+        session_changes = {}
         
         # Check if agent is active - if so, don't generate AI response
         # CRITICAL: Preserve the current session status - don't change it unless explicitly needed
@@ -318,31 +296,23 @@ def send_chat_message(session_id):
         if session_status not in ['agent_active', 'agent_assigned', 'waiting_agent']:
             # If chat was ended, reset to active status to allow AI responses
             if session_status == 'ended':
-                session_data['status'] = 'active'
-                sessions[session_id] = session_data
-                save_chat_sessions(sessions)  # Save immediately to persist the change
+                session_changes['status'] = 'active'
             # Generate AI response (simple rule-based for now)
             ai_response_text = generate_ai_response(message_text)
             
             # Add AI response
-            ai_message = {
-                'id': str(uuid.uuid4()),
-                'text': ai_response_text,
-                'sender': 'assistant',
-                'timestamp': datetime.utcnow().isoformat()
-            }
-            messages[session_id].append(ai_message)
+            new_messages.append({'text': ai_response_text, 'sender': 'assistant'})
         # IMPORTANT: If agent is active, preserve the status - don't change it to 'active'
         # The status should remain 'agent_active' or 'agent_assigned' when agent is handling the chat
         
-        save_chat_messages(messages)
-        
-        # Update session timestamp but PRESERVE the status (don't reset it)
-        # Only update updatedAt, keep the status as-is
-        session_data['updatedAt'] = datetime.utcnow().isoformat()
-        # Ensure status is preserved - reload session to make sure we have latest status
-        sessions[session_id] = session_data
-        save_chat_sessions(sessions)
+        # Insert the messages and touch updatedAt in one transaction (status is preserved
+        # unless the ended -> active reset above applies)
+        inserted, session_data = chat_store.append_messages(session_id, new_messages, **session_changes)
+        if not session_data:
+            return jsonify({'success': False, 'error': 'Session not found'}), 404
+        publish_messages(session_id, inserted)
+        if session_changes:
+            chat_events.publish('session_updated', session_id, session=session_data)
         
         return jsonify({
             'success': True,
@@ -359,31 +329,14 @@ def request_live_agent(session_id):
         return jsonify({'ok': True}), 200
     
     try:
-        sessions = load_chat_sessions()
-        session_data = sessions.get(session_id)
+        # Update status to waiting_agent and add system message (no emojis)
+        system_message = {'text': 'Customer service will join the chat soon.', 'sender': 'assistant'}
+        inserted, session_data = chat_store.append_messages(session_id, [system_message], status='waiting_agent')
         
         if not session_data:
             return jsonify({'success': False, 'error': 'Session not found'}), 404
-        
-        # Update status to waiting_agent
-        session_data['status'] = 'waiting_agent'
-        session_data['updatedAt'] = datetime.utcnow().isoformat()
-        sessions[session_id] = session_data
-        save_chat_sessions(sessions)
-        
-        # Add system message (no emojis)
-        messages = load_chat_messages()
-        if session_id not in messages:
-            messages[session_id] = []
-        
-        system_message = {
-            'id': str(uuid.uuid4()),
-            'text': 'Customer service will join the chat soon.',
-            'sender': 'assistant',
-            'timestamp': datetime.utcnow().isoformat()
-        }
-        messages[session_id].append(system_message)
-        save_chat_messages(messages)
+        chat_events.publish('agent_requested', session_id, session=session_data)
+        publish_messages(session_id, inserted)
         
         return jsonify({
             'success': True,
@@ -409,65 +362,40 @@ def send_agent_message(session_id):
         if not message_text:
             return jsonify({'success': False, 'error': 'Message is required'}), 400
         
-        sessions = load_chat_sessions()
-        session_data = sessions.get(session_id)
-        
-        if not session_data:
+        previous_session = chat_store.get_session(session_id)
+        if not previous_session:
             return jsonify({'success': False, 'error': 'Session not found'}), 404
         
-        # Update session to agent_active
-        session_data['status'] = 'agent_active'
-        session_data['updatedAt'] = datetime.utcnow().isoformat()
-        
         # Get agent name from request or use default
         agent_name = data.get('agent_name')
         if not agent_name:
             # Try to get from user data
             user_id = get_user_id()
-            if user_id:
-                try:
-                    users_file = os.path.join('data', 'users.json')
-                    if os.path.exists(users_file):
-                        with open(users_file, 'r') as f:
-                            users = json.load(f)
-                            user = users.get(user_id, {})
-                            agent_name = user.get('name', 'Admin')
-                except:
-                    agent_name = 'Admin'
-            else:
-                agent_name = 'Admin'
-        
-        session_data['assignedAgent'] = agent_name
-        sessions[session_id] = session_data
-        save_chat_sessions(sessions)
-        
-        # Check if this is the first agent message (agent just joined)
-        messages = load_chat_messages()
-        if session_id not in messages:
-            messages[session_id] = []
+            user = get_user(user_id) if user_id else None
+            agent_name = user.get('name', 'Admin') if user else 'Admin'
+        
+        new_messages = []
         
         # Check if agent just joined (no previous agent messages)
-        has_agent_messages = any(msg.get('sender') == 'agent' for msg in messages[session_id])
+        has_agent_messages = chat_store.has_agent_messages(session_id)
         
         # If agent just joined, add "joined the chat" message first
         if not has_agent_messages and message_text != f"{agent_name} joined the chat.":
-            join_message = {
-                'id': str(uuid.uuid4()),
-                'text': f"{agent_name} joined the chat.",
-                'sender': 'agent',
-                'timestamp': datetime.utcnow().isoformat()
-            }
-            messages[session_id].append(join_message)
+            new_messages.append({'text': f"{agent_name} joined the chat.", 'sender': 'agent'})
         
         # Add agent message
-        agent_message = {
-            'id': str(uuid.uuid4()),
-            'text': message_text,
-            'sender': 'agent',
-            'timestamp': datetime.utcnow().isoformat()
-        }
-        messages[session_id].append(agent_message)
-        save_chat_messages(messages)
+        new_messages.append({'text': message_text, 'sender': 'agent'})
+        
+        # Update session to agent_active with this agent assigned, in the same transaction
+        inserted, session_data = chat_store.append_messages(
+            session_id, new_messages, status='agent_active', assigned_agent=agent_name
+        )
+        if not session_data:
+            return jsonify({'success': False, 'error': 'Session not found'}), 404
+        if (previous_session.get('status'), previous_session.get('assignedAgent')) != ('agent_active', agent_name):
+            chat_events.publish('agent_assigned', session_id, session=session_data)
+        publish_messages(session_id, inserted)
+        agent_message = inserted[-1]
         
         return jsonify({
             'success': True,
@@ -488,17 +416,12 @@ def end_chat_session(session_id):
         if not is_admin():
             return jsonify({'success': False, 'error': 'Unauthorized'}), 401
         
-        sessions = load_chat_sessions()
-        session_data = sessions.get(session_id)
+        # Update status to ended
+        session_data = chat_store.update_session(session_id, status='ended')
         
         if not session_data:
             return jsonify({'success': False, 'error': 'Session not found'}), 404
-        
-        # Update status to ended
-        session_data['status'] = 'ended'
-        session_data['updatedAt'] = datetime.utcnow().isoformat()
-        sessions[session_id] = session_data
-        save_chat_sessions(sessions)
+        chat_events.publish('session_ended', session_id, session=session_data)
         
         return jsonify({
             'success': True,
@@ -541,32 +464,19 @@ def delete_chat_session(session_id):
             return jsonify({'success': False, 'error': 'Unauthorized'}), 401
         
         # Check user role - allow support, manager, admin, and super admin
-        users_file = os.path.join('data', 'users.json')
-        if not os.path.exists(users_file):
+        user = get_user(user_id)
+        if not user:
             return jsonify({'success': False, 'error': 'Unauthorized'}), 401
         
-        with open(users_file, 'r') as f:
-            users = json.load(f)
-            user = users.get(user_id, {})
-            role = user.get('role', '').lower()
-            # Support, Manager, and Super Admin can delete conversations
-            if role not in ['support', 'manager', 'admin', 'super admin', 'superadmin']:
-                return jsonify({'success': False, 'error': 'Unauthorized'}), 401
-        
-        sessions = load_chat_sessions()
-        messages = load_chat_messages()
+        role = user.get('role', '').lower()
+        # Support, Manager, and Super Admin can delete conversations
+        if role not in ['support', 'manager', 'admin', 'super admin', 'superadmin']:
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 401
         
-        if session_id not in sessions:
+        # Delete session and all messages for this session
+        if not chat_store.delete_session(session_id):
             return jsonify({'success': False, 'error': 'Session not found'}), 404
-        
-        # Delete session
-        del sessions[session_id]
-        save_chat_sessions(sessions)
-        
-        # Delete all messages for this session
-        if session_id in messages:
-            del messages[session_id]
-            save_chat_messages(messages)
+        chat_events.publish('session_deleted', session_id)
         
         return jsonify({
             'success': True,
@@ -575,6 +485,56 @@ def delete_chat_session(session_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# 11. Live Event Stream (Server-Sent Events, agents only)
+@chat_bp.route('/stream', methods=['GET'])
+def chat_event_stream():
+    """Push session changes and new messages to agent dashboards.
+
+    Optional ?session_id= limits the stream to one conversation. The stream
+    closes after STREAM_MAX_SECONDS; EventSource reconnects automatically.
+    """
+    user_id = get_user_id()
+    user = get_user(user_id) if user_id else None
+    role = (user or {}).get('role', '').lower()
+    # Support, Manager, and Super Admin can follow live chat
+    if role not in ['support', 'manager', 'admin', 'super admin', 'superadmin']:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+    
+    if not _waiter_slots.acquire(blocking=False):
+        # Every waiter slot is taken: close at once, EventSource reconnects after the retry delay
+        response = Response(f'retry: {WAITERS_FULL_RETRY_SECONDS * 1000}\n\n', mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    session_filter = request.args.get('session_id')
+    subscription = chat_events.subscribe()
+    
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            deadline = time.monotonic() + STREAM_MAX_SECONDS
+            while time.monotonic() < deadline:
+                try:
+                    event = subscription.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                if session_filter and event['session_id'] != session_filter:
+                    continue
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            chat_events.unsubscribe(subscription)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let proxies buffer the stream
+    # Runs even if the client goes away before the generator starts
+    def close_stream():
+        chat_events.unsubscribe(subscription)
+        _waiter_slots.release()
+    response.call_on_close(close_stream)
+    return response
+
 # Helper: Generate AI response (simple rule-based)
 def generate_ai_response(user_input):
     """Simple rule-based AI response generator (no emojis, includes URLs)"""
@@ -1,9 +1,26 @@
-from flask import Blueprint, request, jsonify, session, current_app
+from flask import Blueprint, request, jsonify, session, current_app, make_response, Response, stream_with_context
 from models.shipment import db, Shipment
 from models.status_log import StatusLog
-from utils.pdf_generator import generate_pdf_receipt
-from utils.auth_utils import require_admin
-from datetime import datetime
+from models.import_job import ImportJob
+from utils.pdf_generator import RECEIPT_FIELDS, receipt_fields, receipt_hash
+from utils.receipt_renderer import receipt_renderer, ReceiptQueueFull
+from utils.receipt_storage import receipt_storage
+from utils.receipt_export import stream_zip, stream_combined
+from utils.qr_cache import qr_cache
+from utils.schema_registry import schema_registry
+from utils.sql_statements import statements
+from utils.shipment_identifiers import shipment_resolver
+from utils.tracking_cache import tracking_cache
+from utils.change_feed import record_change
+from utils import shipment_bulk
+from utils.manifest_import import detect_format, create_job, start_import
+from utils.http_cache import touch_clause, validators, not_modified, with_validators
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from sqlalchemy.exc import IntegrityError
+from utils.auth_utils import require_admin, get_user_id_from_request
+from utils.user_store import get_user
+from datetime import datetime, timedelta, timezone
+import base64
 import uuid
 import json
 import os
@@ -37,6 +54,134 @@ def _debug_log(hypothesis_id, location, message, data=None):
 
 shipment_bp = Blueprint('shipment_bp', __name__)
 
+# Paging for GET /all
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Most shipments accepted by POST /bulk in one request
+MAX_BULK_SHIPMENTS = 1000
+
+# Columns returned by GET /all when no ``fields`` projection is given
+DEFAULT_LIST_COLUMNS = [
+    'id', 'tracking_number', 'sender_name', 'sender_email', 'sender_phone',
+    'sender_address', 'receiver_name', 'receiver_phone', 'receiver_address',
+    'package_type', 'weight', 'shipment_cost', 'status', 'date_registered',
+    'estimated_delivery_date', 'pdf_url'
+]
+# Every column a client may ask for through ``fields``
+LISTABLE_COLUMNS = DEFAULT_LIST_COLUMNS + [
+    'current_location', 'qr_url', 'created_by', 'created_by_email',
+    'last_status_at', 'status_log_count'
+]
+
+def _to_datetime(value):
+    """Coerce a DB value (datetime on PostgreSQL, string on SQLite) to datetime"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+def _parse_date_param(value, end_of_day=False):
+    """Parse a YYYY-MM-DD or ISO query param; date-only upper bounds cover the whole day"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f'Invalid date: {value}')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    elif end_of_day:
+        parsed += timedelta(microseconds=1)
+    return parsed
+
+def _encode_cursor(date_registered, shipment_id):
+    """Opaque keyset cursor for the last row of a page"""
+    date_value = _to_datetime(date_registered)
+    payload = json.dumps([date_value.isoformat() if date_value else None, shipment_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor):
+    """Inverse of _encode_cursor - returns (date_registered, id) or None"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        date_str, shipment_id = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        # None for a page that ended on a shipment without date_registered
+        return (datetime.fromisoformat(date_str) if date_str is not None else None), shipment_id
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def _resolve_cursor_date(shipment_id):
+    """Keyset position for a cursor issued while its row had no date_registered.
+
+    Startup backfills the column (utils/schema_upgrade.py), so the row's
+    current value is used; ValueError if it is still missing.
+    """
+    row = statements.execute(
+        'SELECT date_registered FROM shipments WHERE id = :id', {'id': shipment_id}
+    ).first()
+    if row is None or row[0] is None:
+        raise ValueError('Invalid cursor')
+    return _to_datetime(row[0]), shipment_id
+
+def _shipment_filters(args):
+    """WHERE clauses, params and DateTime bind types for the shipment list filters.
+
+    Shared by the list and bulk receipt export endpoints: status, created_by
+    (creator email), tracking_prefix, date_from and date_to. Raises ValueError
+    for a malformed date.
+    """
+    from sqlalchemy import bindparam, DateTime
+    
+    where_clauses = []
+    params = {}
+    bind_types = []
+    
+    status_filter = args.get('status')
+    if status_filter:
+        where_clauses.append('status = :status')
+        params['status'] = status_filter
+    
+    creator_filter = args.get('created_by')
+    if creator_filter:
+        where_clauses.append('created_by_email = :created_by_email')
+        params['created_by_email'] = creator_filter
+    
+    tracking_prefix = args.get('tracking_prefix')
+    if tracking_prefix:
+        # Tracking numbers are stored upper-case, so match the prefix upper-cased
+        escaped = tracking_prefix.strip().upper().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        where_clauses.append("tracking_number LIKE :tracking_prefix ESCAPE '\\'")
+        params['tracking_prefix'] = f'{escaped}%'
+    
+    date_from = _parse_date_param(args.get('date_from'))
+    date_to = _parse_date_param(args.get('date_to'), end_of_day=True)
+    if date_from:
+        where_clauses.append('date_registered >= :date_from')
+        params['date_from'] = date_from
+        bind_types.append(bindparam('date_from', type_=DateTime))
+    if date_to:
+        where_clauses.append('date_registered < :date_to')
+        params['date_to'] = date_to
+        bind_types.append(bindparam('date_to', type_=DateTime))
+    
+    return where_clauses, params, bind_types
+
+def _serialize_shipment_row(row, fields):
+    """Build the JSON dict for a shipment row, limited to ``fields``"""
+    shipment_dict = {}
+    for field in fields:
+        value = row.get(field)
+        if field in ('date_registered', 'last_status_at'):
+            value = value.isoformat() if isinstance(value, datetime) else (value if value else None)
+        elif field == 'estimated_delivery_date':
+            value = value.strftime('%Y-%m-%d') if isinstance(value, datetime) else (str(value) if value else None)
+        shipment_dict[field] = value
+    return shipment_dict
+
 @shipment_bp.route('', methods=['POST', 'OPTIONS'])  # Accept POST and OPTIONS
 @shipment_bp.route('/', methods=['POST', 'OPTIONS'])  # Accept POST and OPTIONS
 def create_shipment():
@@ -67,15 +212,7 @@ def create_shipment():
         estimated_delivery_date = data.get('estimated_delivery_date')
 
         # Validate required fields (shipment_cost is NOT in this list - it's optional)
-        required_fields = ['sender_name', 'sender_email', 'sender_phone', 'sender_address', 
-                          'receiver_name', 'receiver_phone', 'receiver_address', 'package_type', 
-                          'weight']
-        
-        missing_fields = []
-        for field in required_fields:
-            value = data.get(field)
-            if value is None or (isinstance(value, str) and value.strip() == ''):
-                missing_fields.append(field)
+        missing_fields = shipment_bulk.missing_fields(data)
         
         if missing_fields:
             print(f"❌ Validation failed - Missing required fields: {missing_fields}")
@@ -87,7 +224,7 @@ def create_shipment():
         tracking_number = data.get('tracking_number')
         if not tracking_number:
             # Generate a unique tracking number if not provided
-            tracking_number = f'TRK{str(uuid.uuid4())[:8].upper()}'
+            tracking_number = shipment_bulk.generate_tracking_number()
             print(f"📦 Auto-generated tracking number: {tracking_number}")
         else:
             # Validate custom tracking number format (optional: add format validation)
@@ -99,8 +236,8 @@ def create_shipment():
                 }), 400
             
             # Check if tracking number already exists
-            existing = db.session.execute(
-                text('SELECT tracking_number FROM shipments WHERE tracking_number = :tn'),
+            existing = statements.execute(
+                'SELECT tracking_number FROM shipments WHERE tracking_number = :tn',
                 {'tn': tracking_number}
             ).first()
             if existing:
@@ -112,12 +249,7 @@ def create_shipment():
             print(f"📦 Using custom tracking number: {tracking_number}")
 
         # Convert estimated_delivery_date to datetime if provided
-        est_delivery = None
-        if estimated_delivery_date:
-            try:
-                est_delivery = datetime.strptime(estimated_delivery_date, '%Y-%m-%d')
-            except Exception:
-                est_delivery = None
+        est_delivery = shipment_bulk.parse_estimated_delivery(estimated_delivery_date)
 
         # Get current user info (if logged in)
         created_by = None
@@ -129,32 +261,23 @@ def create_shipment():
         print(f"Session data: {dict(session)}")
         
         if user_id:
-            # Load user data to get email
-            users_file = os.path.join('data', 'users.json')
-            if os.path.exists(users_file):
-                try:
-                    with open(users_file, 'r') as f:
-                        users = json.load(f)
-                        user = users.get(user_id, {})
-                        created_by = user_id
-                        created_by_email = user.get('email', None)
-                        print(f"Found user: {user.get('name', 'Unknown')} ({user.get('email', 'No email')})")
-                except Exception as e:
-                    print(f"Error loading user data: {e}")
-                    pass
+            # Look up the creator's email from the shared user store
+            user = get_user(user_id)
+            if user is not None:
+                created_by = user_id
+                created_by_email = user.get('email', None)
+                print(f"Found user: {user.get('name', 'Unknown')} ({user.get('email', 'No email')})")
         else:
             print("No user_id in session - shipment will be created without creator tracking")
 
         # Always use raw SQL to avoid issues with missing created_by columns
-        from sqlalchemy import inspect, text
+        from sqlalchemy import text
         use_raw_sql = True  # Always use raw SQL to be safe
         db_columns = []
         
         try:
-            # Get actual table columns from database
-            inspector = inspect(db.engine)
-            db_columns = [col['name'] for col in inspector.get_columns('shipments')]
-            print(f"Database columns found: {db_columns}")
+            # Actual table columns, cached per worker by the schema registry
+            db_columns = schema_registry.columns('shipments')
         except Exception as inspect_error:
             print(f"Could not inspect table: {inspect_error}. Will exclude created_by columns.")
             db_columns = []
@@ -162,19 +285,7 @@ def create_shipment():
         # Use raw SQL to insert only existing columns
         # Handle optional shipment_cost - use 0.0 as default if not provided
         # shipment_cost is OPTIONAL and should NOT be in required_fields validation
-        shipment_cost_value = 0.0  # Default value
-        if shipment_cost is not None:
-            if isinstance(shipment_cost, str):
-                if shipment_cost.strip() != '':
-                    try:
-                        shipment_cost_value = float(shipment_cost)
-                    except (ValueError, TypeError):
-                        shipment_cost_value = 0.0
-            else:
-                try:
-                    shipment_cost_value = float(shipment_cost)
-                except (ValueError, TypeError):
-                    shipment_cost_value = 0.0
+        shipment_cost_value = shipment_bulk.parse_shipment_cost(shipment_cost)
         
         print(f"💰 Shipment cost handling: received={shipment_cost}, using={shipment_cost_value}")
         
@@ -192,7 +303,8 @@ def create_shipment():
             'weight': weight,
             'shipment_cost': shipment_cost_value,
             'status': 'Registered',
-            'date_registered': datetime.utcnow()
+            'date_registered': datetime.utcnow(),
+            'updated_at': datetime.utcnow()
         }
         if est_delivery:
             insert_data['estimated_delivery_date'] = est_delivery
@@ -203,7 +315,7 @@ def create_shipment():
             filtered_data = {k: v for k, v in insert_data.items() if k in db_columns}
         else:
             # If we can't inspect, exclude created_by fields explicitly
-            filtered_data = {k: v for k, v in insert_data.items() if k not in ['created_by', 'created_by_email']}
+            filtered_data = {k: v for k, v in insert_data.items() if k not in ['created_by', 'created_by_email', 'updated_at']}
         
         # Build SQL insert statement with proper escaping
         columns_str = ', '.join([f'"{col}"' for col in filtered_data.keys()])
@@ -211,11 +323,12 @@ def create_shipment():
         
         print(f"Inserting with columns: {list(filtered_data.keys())}")
         
-        sql = text(f'INSERT INTO shipments ({columns_str}) VALUES ({placeholders})')
+        sql = f'INSERT INTO shipments ({columns_str}) VALUES ({placeholders})'
         # #region agent log
         _debug_log("D", "routes/shipments.py:162", "Before INSERT execution", {"tracking_number": tracking_number, "columns": list(filtered_data.keys())})
         # #endregion
-        db.session.execute(sql, filtered_data)
+        statements.execute(sql, filtered_data)
+        record_change('shipment', 'created', filtered_data['id'], tracking_number, {'status': 'Registered'})
         # #region agent log
         _debug_log("D", "routes/shipments.py:165", "After INSERT execution, before commit", {"tracking_number": tracking_number})
         # #endregion
@@ -239,8 +352,8 @@ def create_shipment():
         # #region agent log
         _debug_log("B", "routes/shipments.py:181", "Verifying shipment exists after commit", {"tracking_number": tracking_number})
         # #endregion
-        verify = db.session.execute(
-            text('SELECT tracking_number FROM shipments WHERE tracking_number = :tn'),
+        verify = statements.execute(
+            'SELECT tracking_number FROM shipments WHERE tracking_number = :tn',
             {'tn': tracking_number}
         ).first()
         
@@ -259,8 +372,8 @@ def create_shipment():
         print(f"   Database: {db_info}")
         
         # Get the created shipment for PDF generation - use raw query
-        result = db.session.execute(
-            text('SELECT * FROM shipments WHERE tracking_number = :tracking_number'),
+        result = statements.execute(
+            'SELECT * FROM shipments WHERE tracking_number = :tracking_number',
             {'tracking_number': tracking_number}
         ).first()
         
@@ -289,12 +402,21 @@ def create_shipment():
         print(f"   Shipment ID: {shipment.id}")
         print(f"   Status: {shipment.status}")
 
-        # Generate PDF receipt and save the file path
+        # Queue the receipt render instead of drawing it inside the request;
+        # the PDF endpoint serves it (or waits for it) on first download
         try:
-            pdf_path = generate_pdf_receipt(shipment)
-            if pdf_path:
-                shipment.pdf_url = pdf_path
-                db.session.commit()
+            fields = receipt_fields(result)
+            shipment.pdf_url = receipt_storage.location(receipt_renderer.key_for(fields))
+            shipment.qr_url = f'/api/shipments/{tracking_number}/qr'
+            params = {'pdf_url': shipment.pdf_url, 'qr_url': shipment.qr_url, 'id': shipment.id}
+            statements.execute(
+                f'UPDATE shipments SET pdf_url = :pdf_url, qr_url = :qr_url{touch_clause(params)} WHERE id = :id',
+                params
+            )
+            db.session.commit()
+            receipt_renderer.submit(fields)
+        except ReceiptQueueFull:
+            print(f"⚠️ Receipt queue full - {tracking_number} will render on first download")
         except Exception as e:
             print(f"PDF generation failed: {e}")
             # Continue without PDF if generation fails
@@ -318,10 +440,171 @@ def create_shipment():
             'error': f'Failed to create shipment: {error_msg}'
         }), 500
 
+@shipment_bp.route('/bulk', methods=['POST'])
+def create_shipments_bulk():
+    """Register a manifest of shipments in one request.
+
+    Body: a list of shipment objects (the create_shipment fields), or
+    {"shipments": [...]}. The whole list is validated first; any invalid
+    item or taken tracking number rejects the request with per-item errors,
+    so a manifest is never half-imported. Tracking numbers are generated
+    for items without one, rows go in with one multi-row INSERT per
+    200 rows (utils/shipment_bulk.py), and receipts are queued for background rendering.
+    """
+    is_admin_user, user_info = require_admin()
+    if not is_admin_user:
+        return jsonify({'success': False, 'error': 'Admin access required'}), 403
+    
+    data = request.get_json(silent=True)
+    items = data.get('shipments') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'error': 'Provide a non-empty list of shipments'}), 400
+    if len(items) > MAX_BULK_SHIPMENTS:
+        return jsonify({'success': False, 'error': f'At most {MAX_BULK_SHIPMENTS} shipments per request'}), 400
+    
+    try:
+        now = datetime.utcnow()
+        created_by = get_user_id_from_request()
+        created_by_email = user_info.get('email') if user_info else None
+        row_indexes = []  # request index of each entry in rows
+        
+        # Validate everything in one pass
+        errors = []
+        rows = []
+        seen = {}
+        for index, item in enumerate(items):
+            row, error = shipment_bulk.build_shipment_row(item, now, created_by, created_by_email)
+            if row and row['tracking_number'] in seen:
+                error = f"Duplicate of item {seen[row['tracking_number']]}"
+            if error:
+                errors.append({'index': index, 'tracking_number': row['tracking_number'] if row else None, 'error': error})
+                continue
+            if row['tracking_number']:
+                seen[row['tracking_number']] = index
+            rows.append(row)
+            row_indexes.append(index)
+        if errors:
+            return jsonify({'success': False, 'error': f'{len(errors)} invalid shipment(s)', 'errors': errors}), 400
+        
+        # Custom tracking numbers must be free; generated ones are re-drawn until they are
+        taken = shipment_bulk.existing_tracking_numbers(seen)
+        if taken:
+            return jsonify({
+                'success': False,
+                'error': f'{len(taken)} tracking number(s) already exist',
+                'errors': [{'index': seen[tn], 'tracking_number': tn, 'error': 'Tracking number already exists'}
+                           for tn in sorted(taken, key=seen.get)]
+            }), 409
+        shipment_bulk.assign_tracking_numbers(rows)
+        
+        receipts = shipment_bulk.insert_shipments(rows)
+        db.session.commit()
+        print(f"✅ BULK SHIPMENTS CREATED: {len(rows)} by {created_by_email or 'unknown'} at {datetime.utcnow()}")
+        
+        # Queue receipts; whatever doesn't fit renders on first download
+        shipment_bulk.queue_receipts(receipts)
+        
+        return jsonify({
+            'success': True,
+            'message': f'{len(rows)} shipments registered successfully!',
+            'created': len(rows),
+            'shipments': [{'index': index, 'tracking_number': row['tracking_number'], 'pdf_url': row['pdf_url']}
+                          for index, row in zip(row_indexes, rows)]
+        }), 201
+    
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': 'A tracking number was registered concurrently, please retry'}), 409
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error creating shipments in bulk: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': f'Failed to create shipments: {str(e)}'}), 500
+
+@shipment_bp.route('/imports', methods=['POST'])
+def start_manifest_import():
+    """Start a background import of a CSV or NDJSON manifest.
+
+    Send the file as multipart ``file`` or as the raw request body (any
+    other content type, including curl --data-binary's form default); the
+    format comes from ?format=, the filename or the content type. The
+    upload is spooled to disk and parsed incrementally by
+    utils/manifest_import.py. Returns 202 with the job to poll.
+    """
+    is_admin_user, user_info = require_admin()
+    if not is_admin_user:
+        return jsonify({'success': False, 'error': 'Admin access required'}), 403
+    
+    # Only touch request.files/form for multipart uploads: parsing a raw body sent as
+    # application/x-www-form-urlencoded (curl --data-binary's default) would consume it
+    upload = None
+    requested_format = request.args.get('format')
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        requested_format = requested_format or request.form.get('format')
+        if upload is None:
+            return jsonify({'success': False, 'error': 'Multipart upload has no file field'}), 400
+    if upload is not None:
+        filename, content_type, stream = upload.filename, upload.mimetype, upload.stream
+    else:
+        filename, content_type, stream = request.args.get('filename'), request.mimetype, request.stream
+    fmt = detect_format(filename, content_type, requested_format)
+    if not fmt:
+        return jsonify({'success': False, 'error': 'Unknown manifest format - use format=csv or format=ndjson'}), 400
+    
+    import shutil
+    import tempfile
+    fd, path = tempfile.mkstemp(prefix='manifest-', suffix=f'.{fmt}')
+    try:
+        with os.fdopen(fd, 'wb') as spool:
+            shutil.copyfileobj(stream, spool, 64 * 1024)
+        if os.path.getsize(path) == 0:
+            os.remove(path)
+            return jsonify({'success': False, 'error': 'Manifest is empty'}), 400
+        job = create_job(filename or f'upload.{fmt}', fmt, get_user_id_from_request(),
+                         user_info.get('email') if user_info else None)
+        start_import(current_app._get_current_object(), job.id, path)
+    except Exception as e:
+        db.session.rollback()
+        if os.path.exists(path):
+            os.remove(path)
+        print(f"❌ Error starting manifest import: {e}")
+        return jsonify({'success': False, 'error': f'Failed to start import: {str(e)}'}), 500
+    
+    print(f"📦 Manifest import {job.id} queued: {job.source} ({fmt}) by {job.created_by_email or 'unknown'}")
+    return jsonify({
+        'success': True,
+        'job': job.to_dict(),
+        'status_url': f'/api/shipments/imports/{job.id}'
+    }), 202
+
+@shipment_bp.route('/imports/<job_id>', methods=['GET'])
+def get_manifest_import(job_id):
+    """Progress and per-row errors of a manifest import"""
+    is_admin_user, _ = require_admin()
+    if not is_admin_user:
+        return jsonify({'success': False, 'error': 'Admin access required'}), 403
+    
+    job = db.session.get(ImportJob, job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Import job not found'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
 @shipment_bp.route('/all', methods=['GET'])
 def get_all_shipments():
+    """List shipments newest first, one keyset page at a time.
+
+    Query params:
+        limit: page size (default 50, max 500)
+        cursor: opaque value from a previous response's ``next_cursor``
+        status, created_by: exact-match filters (created_by is the creator email)
+        date_from, date_to: inclusive date_registered range (YYYY-MM-DD or ISO)
+        tracking_prefix: tracking number prefix (case-insensitive)
+        fields: comma-separated columns to return (defaults to the table columns)
+    """
     # #region agent log
-    _debug_log("B", "routes/shipments.py:248", "get_all_shipments called", {"method": request.method, "path": request.path})
+    _debug_log("B", "routes/shipments.py:248", "get_all_shipments called", {"method": request.method, "path": request.path, "args": request.args.to_dict()})
     # #endregion
     # Require admin access to view all shipments
     is_admin_user, user_info = require_admin()
@@ -331,89 +614,174 @@ def get_all_shipments():
         # #endregion
         return jsonify({'success': False, 'error': 'Admin access required'}), 403
     
-    # Always use raw SQL to avoid ORM column issues - simplified, no role filtering
-    from sqlalchemy import text
-    from datetime import datetime
+    # Always use raw SQL to avoid ORM column issues
+    from sqlalchemy import bindparam, DateTime
     
+    # Page size
     try:
-        # #region agent log
-        _debug_log("B", "routes/shipments.py:260", "Executing SELECT * FROM shipments query")
-        # Also check count directly
-        count_result = db.session.execute(text('SELECT COUNT(*) FROM shipments'))
-        total_count = count_result.scalar() or 0
-        _debug_log("B", "routes/shipments.py:262", "Direct COUNT query result", {"total_shipments": total_count})
-        # #endregion
-        # Use raw SQL to fetch all shipments
-        result = db.session.execute(text('SELECT * FROM shipments'))
-        # #region agent log
-        # Get column names BEFORE fetchall() - critical fix for SQLAlchemy
-        column_names = list(result.keys()) if hasattr(result, 'keys') else []
-        _debug_log("B", "routes/shipments.py:322", "Got column names before fetchall", {"column_names": column_names, "column_count": len(column_names)})
-        # #endregion
-        shipments_rows = result.fetchall()
-        # #region agent log
-        _debug_log("B", "routes/shipments.py:325", "Query executed", {"rows_count": len(shipments_rows) if shipments_rows else 0, "count_mismatch": total_count != len(shipments_rows) if shipments_rows else False, "has_column_names": len(column_names) > 0})
-        # #endregion
-        
-        # Convert rows to shipment-like dicts
-        shipments = []
-        if shipments_rows:
-            # #region agent log
-            _debug_log("B", "routes/shipments.py:330", "Processing shipment rows", {"total_rows": len(shipments_rows), "column_names": column_names})
-            # #endregion
-            for row in shipments_rows:
-                shipment_dict = {}
-                # Handle both Row objects and tuples
-                if hasattr(row, '_asdict'):
-                    # Row object with _asdict method
-                    shipment_dict = row._asdict()
-                elif hasattr(row, '_mapping'):
-                    # Row object with _mapping
-                    shipment_dict = dict(row._mapping)
-                else:
-                    # Tuple - convert using column names
-                    for i, col_name in enumerate(column_names):
-                        shipment_dict[col_name] = row[i] if i < len(row) else None
-                shipments.append(shipment_dict)
-                # #region agent log
-                _debug_log("B", "routes/shipments.py:281", "Processed shipment row", {"tracking_number": shipment_dict.get('tracking_number'), "id": shipment_dict.get('id')})
-                # #endregion
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    
+    # Column projection - id/date_registered are always selected for the cursor
+    fields_param = request.args.get('fields')
+    if fields_param:
+        fields = [f.strip() for f in fields_param.split(',') if f.strip()]
+        unknown = [f for f in fields if f not in LISTABLE_COLUMNS]
+        if unknown:
+            return jsonify({'success': False, 'error': f'Unknown fields: {", ".join(unknown)}'}), 400
+    else:
+        fields = list(DEFAULT_LIST_COLUMNS)
+    select_columns = list(dict.fromkeys(['id', 'date_registered'] + fields))
+    
+    try:
+        where_clauses, params, bind_types = _shipment_filters(request.args)
+        cursor = _decode_cursor(request.args.get('cursor'))
+        if cursor and cursor[0] is None:
+            cursor = _resolve_cursor_date(cursor[1])
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    params['limit'] = limit + 1
+    
+    # Keyset condition on (date_registered, id), newest first
+    if cursor:
+        where_clauses.append(
+            '(date_registered < :cursor_date OR (date_registered = :cursor_date AND id < :cursor_id))'
+        )
+        params['cursor_date'], params['cursor_id'] = cursor
+        bind_types.append(bindparam('cursor_date', type_=DateTime))
+    
+    columns_str = ', '.join(f'"{col}"' for col in select_columns)
+    where_str = f' WHERE {" AND ".join(where_clauses)}' if where_clauses else ''
+    sql = (
+        f'SELECT {columns_str} FROM shipments{where_str} '
+        f'ORDER BY date_registered DESC, id DESC LIMIT :limit'
+    )
+    
+    try:
+        rows = statements.execute(sql, params, *bind_types).fetchall()
     except Exception as query_error:
         print(f"Query error: {query_error}")
         import traceback
         traceback.print_exc()
         return jsonify({'success': False, 'error': f'Failed to fetch shipments: {str(query_error)}'}), 500
     
-    shipment_list = []
-    for s in shipments:
-        # Always dict from raw SQL
-        date_reg = s.get('date_registered')
-        est_delivery = s.get('estimated_delivery_date')
-        
-        shipment_dict = {
-            'id': s.get('id'),
-            'tracking_number': s.get('tracking_number'),
-            'sender_name': s.get('sender_name'),
-            'sender_email': s.get('sender_email'),
-            'sender_phone': s.get('sender_phone'),
-            'sender_address': s.get('sender_address'),
-            'receiver_name': s.get('receiver_name'),
-            'receiver_phone': s.get('receiver_phone'),
-            'receiver_address': s.get('receiver_address'),
-            'package_type': s.get('package_type'),
-            'weight': s.get('weight'),
-            'shipment_cost': s.get('shipment_cost'),
-            'status': s.get('status'),
-            'date_registered': date_reg.isoformat() if date_reg and isinstance(date_reg, datetime) else (date_reg if date_reg else None),
-            'estimated_delivery_date': est_delivery.strftime('%Y-%m-%d') if est_delivery and isinstance(est_delivery, datetime) else (str(est_delivery) if est_delivery else None),
-            'pdf_url': s.get('pdf_url')
-        }
-        
-        shipment_list.append(shipment_dict)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    shipment_list = [_serialize_shipment_row(dict(row._mapping), fields) for row in rows]
+    
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]._mapping
+        next_cursor = _encode_cursor(last['date_registered'], last['id'])
     # #region agent log
-    _debug_log("B", "routes/shipments.py:304", "Returning shipments list", {"count": len(shipment_list)})
+    _debug_log("B", "routes/shipments.py:304", "Returning shipments page", {"count": len(shipment_list), "has_more": has_more})
     # #endregion
-    return jsonify({'shipments': shipment_list, 'success': True})
+    return jsonify({
+        'shipments': shipment_list,
+        'success': True,
+        'next_cursor': next_cursor,
+        'has_more': has_more
+    })
+
+# Longest a PDF download waits for a queued render before answering 503
+RECEIPT_WAIT_SECONDS = 30
+
+def _with_pdf_cors(response):
+    origin = request.headers.get('Origin')
+    if origin:
+        response.headers.add('Access-Control-Allow-Origin', origin)
+    response.headers.add('Access-Control-Allow-Credentials', 'true')
+    return response
+
+# Most shipments a combined (single PDF) export may contain - it is drawn in one piece
+MAX_COMBINED_RECEIPTS = 2000
+
+# Rows fetched per round trip while streaming an export
+EXPORT_FETCH_SIZE = 500
+
+@shipment_bp.route('/receipts/export', methods=['GET'])
+def export_receipts():
+    """Stream receipts for every shipment matching the list filters.
+
+    Query params:
+        format: zip (one PDF per shipment, default) or pdf (one multi-page PDF)
+        status, created_by, date_from, date_to, tracking_prefix: as for /all
+    """
+    is_admin_user, _ = require_admin()
+    if not is_admin_user:
+        return jsonify({'success': False, 'error': 'Admin access required'}), 403
+    
+    from sqlalchemy import text
+    
+    export_format = request.args.get('format', 'zip').lower()
+    if export_format not in ('zip', 'pdf'):
+        return jsonify({'success': False, 'error': 'format must be zip or pdf'}), 400
+    
+    try:
+        where_clauses, params, bind_types = _shipment_filters(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    where_str = f' WHERE {" AND ".join(where_clauses)}' if where_clauses else ''
+    
+    if export_format == 'pdf':
+        count_sql = text(f'SELECT COUNT(*) FROM shipments{where_str}')
+        if bind_types:
+            count_sql = count_sql.bindparams(*bind_types)
+        total = db.session.execute(count_sql, params).scalar()
+        if total > MAX_COMBINED_RECEIPTS:
+            return jsonify({
+                'success': False,
+                'error': f'{total} shipments match - a combined PDF is limited to {MAX_COMBINED_RECEIPTS}, use format=zip'
+            }), 400
+    
+    columns_str = ', '.join(f'"{col}"' for col in RECEIPT_FIELDS)
+    sql = text(
+        f'SELECT {columns_str} FROM shipments{where_str} ORDER BY date_registered ASC, id ASC'
+    ).execution_options(stream_results=True)
+    if bind_types:
+        sql = sql.bindparams(*bind_types)
+    
+    def receipt_rows():
+        result = db.session.execute(sql, params).yield_per(EXPORT_FETCH_SIZE)
+        for row in result:
+            yield receipt_fields(row)
+    
+    stamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+    if export_format == 'zip':
+        body, mimetype, filename = stream_zip(receipt_rows()), 'application/zip', f'receipts-{stamp}.zip'
+    else:
+        body, mimetype, filename = stream_combined(receipt_rows()), 'application/pdf', f'receipts-{stamp}.pdf'
+    
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers.set('Content-Disposition', 'attachment', filename=filename)
+    return _with_pdf_cors(response)
+
+# QR images encode TRACKING_URL_TEMPLATE, which can change under the same URL, so they
+# are cached briefly and then revalidated; the ETag includes the tracking URL's hash
+QR_CACHE_SECONDS = 3600
+
+@shipment_bp.route('/<identifier>/qr', methods=['GET'])
+def get_shipment_qr(identifier):
+    """Tracking QR code PNG (by tracking number or ID)"""
+    from sqlalchemy import text
+    
+    result = shipment_resolver.find(identifier, ['tracking_number'])
+    if not result:
+        return jsonify({'success': False, 'error': 'Shipment not found'}), 404
+    tracking_num = result._mapping['tracking_number']
+    
+    etag = qr_cache.key_for(tracking_num)
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(qr_cache.get_png(tracking_num))
+        response.mimetype = 'image/png'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={QR_CACHE_SECONDS}'
+    return _with_pdf_cors(response)
 
 # Generate/Download PDF (by tracking number or ID) - MUST be before /<identifier> routes
 @shipment_bp.route('/<identifier>/pdf', methods=['GET', 'OPTIONS'])
@@ -440,10 +808,7 @@ def get_shipment_pdf(identifier):
         from sqlalchemy import text
         
         # Get shipment data (by tracking_number or ID)
-        result = db.session.execute(
-            text('SELECT * FROM shipments WHERE tracking_number = :identifier OR id = :identifier'),
-            {'identifier': identifier}
-        ).first()
+        result = shipment_resolver.find(identifier)
         
         if not result:
             return jsonify({'success': False, 'error': 'Shipment not found'}), 404
@@ -459,62 +824,50 @@ def get_shipment_pdf(identifier):
             for i, col_name in enumerate(column_names):
                 shipment_dict[col_name] = result[i] if i < len(result) else None
         
-        # Create shipment object for PDF generation
-        shipment = Shipment()
-        shipment.id = shipment_dict.get('id')
-        shipment.tracking_number = shipment_dict.get('tracking_number') or identifier
-        shipment.sender_name = shipment_dict.get('sender_name', '')
-        shipment.sender_email = shipment_dict.get('sender_email', '')
-        shipment.sender_phone = shipment_dict.get('sender_phone', '')
-        shipment.sender_address = shipment_dict.get('sender_address', '')
-        shipment.receiver_name = shipment_dict.get('receiver_name', '')
-        shipment.receiver_phone = shipment_dict.get('receiver_phone', '')
-        shipment.receiver_address = shipment_dict.get('receiver_address', '')
-        shipment.package_type = shipment_dict.get('package_type', '')
-        shipment.weight = shipment_dict.get('weight', 0)
-        shipment.shipment_cost = shipment_dict.get('shipment_cost', 0)
-        shipment.status = shipment_dict.get('status', 'Registered')
-        shipment.date_registered = shipment_dict.get('date_registered')
-        shipment.estimated_delivery_date = shipment_dict.get('estimated_delivery_date')
-        
         # Get tracking number or use identifier
         tracking_num = shipment_dict.get('tracking_number') or identifier
+        shipment_dict['tracking_number'] = tracking_num
         
-        # Check if PDF already exists
-        pdf_url = shipment_dict.get('pdf_url')
-        if pdf_url and os.path.exists(pdf_url):
-            from flask import send_file, make_response
-            response = make_response(send_file(pdf_url, mimetype='application/pdf', as_attachment=True, download_name=f'receipt-{tracking_num}.pdf'))
-            # Add CORS headers
-            origin = request.headers.get('Origin')
-            if origin:
-                response.headers.add('Access-Control-Allow-Origin', origin)
-            response.headers.add('Access-Control-Allow-Credentials', 'true')
-            return response
+        # The receipt hash doubles as the ETag - a revalidation never touches the PDF
+        fields = receipt_fields(shipment_dict)
+        digest = receipt_hash(fields)
+        if request.if_none_match.contains(digest):
+            response = make_response('', 304)
+            response.set_etag(digest)
+            return _with_pdf_cors(response)
+        
+        try:
+            receipt_key = receipt_renderer.get(fields, timeout=RECEIPT_WAIT_SECONDS)
+        except (FutureTimeoutError, ReceiptQueueFull):
+            # Render queue full (e.g. after a bulk import) or the render is still running
+            return jsonify({'success': False, 'error': 'Receipt is still being generated, try again shortly'}), 503
         
-        # Generate new PDF
-        pdf_path = generate_pdf_receipt(shipment)
-        if pdf_path and os.path.exists(pdf_path):
+        pdf_location = receipt_storage.location(receipt_key)
+        if shipment_dict.get('pdf_url') != pdf_location:
             # Update PDF URL in database
             try:
-                db.session.execute(
-                    text('UPDATE shipments SET pdf_url = :pdf_url WHERE tracking_number = :identifier OR id = :identifier'),
-                    {'pdf_url': pdf_path, 'identifier': identifier}
+                params = {'pdf_url': pdf_location, 'id': shipment_dict.get('id')}
+                statements.execute(
+                    f'UPDATE shipments SET pdf_url = :pdf_url{touch_clause(params)} WHERE id = :id',
+                    params
                 )
                 db.session.commit()
             except Exception as e:
+                db.session.rollback()
                 print(f"Failed to update PDF URL: {e}")
-            
-            from flask import send_file, make_response
-            response = make_response(send_file(pdf_path, mimetype='application/pdf', as_attachment=True, download_name=f'receipt-{tracking_num}.pdf'))
-            # Add CORS headers
-            origin = request.headers.get('Origin')
-            if origin:
-                response.headers.add('Access-Control-Allow-Origin', origin)
-            response.headers.add('Access-Control-Allow-Credentials', 'true')
-            return response
         
-        return jsonify({'success': False, 'error': 'Failed to generate PDF'}), 500
+        # Stream straight from storage - nothing is re-rendered or loaded whole
+        stored = receipt_storage.open(receipt_key)
+        if stored is None:
+            return jsonify({'success': False, 'error': 'Receipt is still being generated, try again shortly'}), 503
+        size, chunks = stored
+        response = Response(chunks, mimetype='application/pdf', direct_passthrough=True)
+        response.headers['Content-Length'] = str(size)
+        response.headers.set('Content-Disposition', 'attachment', filename=f'receipt-{tracking_num}.pdf')
+        response.set_etag(digest)
+        # Status changes alter the receipt, so clients must revalidate
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return _with_pdf_cors(response)
     except Exception as e:
         print(f"Error generating PDF: {e}")
         import traceback
@@ -695,10 +1048,15 @@ def get_shipment(identifier):
         # #region agent log
         _debug_log("B", "routes/shipments.py:591", "Executing SELECT query for shipment", {"identifier": identifier})
         # #endregion
-        result = db.session.execute(
-            text('SELECT * FROM shipments WHERE tracking_number = :identifier OR id = :identifier'),
-            {'identifier': identifier}
-        ).first()
+        # Revalidation reads only the update marker, never the full row
+        if (request.if_none_match or request.if_modified_since) and schema_registry.has_column('shipments', 'updated_at'):
+            marker = shipment_resolver.find(identifier, ['updated_at'])
+            if marker:
+                etag, last_modified = validators('shipment', marker._mapping['id'], marker._mapping['updated_at'])
+                if not_modified(etag, last_modified):
+                    return with_validators(make_response('', 304), etag, last_modified)
+
+        result = shipment_resolver.find(identifier)
         
         # #region agent log
         _debug_log("B", "routes/shipments.py:597", "Query result", {"found": result is not None, "identifier": identifier})
@@ -720,8 +1078,9 @@ def get_shipment(identifier):
             column_names = result.keys() if hasattr(result, 'keys') else []
             for i, col_name in enumerate(column_names):
                 shipment_dict[col_name] = result[i] if i < len(result) else None
-        
-        return jsonify({'success': True, 'shipment': shipment_dict})
+
+        etag, last_modified = validators('shipment', shipment_dict.get('id'), shipment_dict.get('updated_at'))
+        return with_validators(jsonify({'success': True, 'shipment': shipment_dict}), etag, last_modified)
     except Exception as e:
         print(f"Error fetching shipment: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -760,11 +1119,8 @@ def delete_shipment(identifier):
         from sqlalchemy import text
         from datetime import datetime
         
-        # Try to find by tracking_number first, then by ID
-        result = db.session.execute(
-            text('SELECT id, tracking_number FROM shipments WHERE tracking_number = :identifier OR id = :identifier'),
-            {'identifier': identifier}
-        ).first()
+        # Resolve the tracking number or ID to the shipment row
+        result = shipment_resolver.find(identifier, ['id', 'tracking_number'])
         
         if not result:
             return jsonify({'success': False, 'error': 'Shipment not found'}), 404
@@ -781,8 +1137,8 @@ def delete_shipment(identifier):
         print(f"   Referer: {request.headers.get('Referer', 'unknown')}")
         
         # Count status logs before deletion
-        status_logs_count = db.session.execute(
-            text('SELECT COUNT(*) FROM status_logs WHERE shipment_id = :shipment_id'),
+        status_logs_count = statements.execute(
+            'SELECT COUNT(*) FROM status_logs WHERE shipment_id = :shipment_id',
             {'shipment_id': shipment_id}
         ).scalar() or 0
         
@@ -790,20 +1146,23 @@ def delete_shipment(identifier):
         
         # Delete status logs first to avoid foreign key issues
         if status_logs_count > 0:
-            db.session.execute(
-                text('DELETE FROM status_logs WHERE shipment_id = :shipment_id'),
+            statements.execute(
+                'DELETE FROM status_logs WHERE shipment_id = :shipment_id',
                 {'shipment_id': shipment_id}
             )
             print(f"   Deleted {status_logs_count} status logs")
         
         # Delete the shipment
-        db.session.execute(
-            text('DELETE FROM shipments WHERE tracking_number = :identifier OR id = :identifier'),
-            {'identifier': identifier}
+        statements.execute(
+            'DELETE FROM shipments WHERE id = :shipment_id',
+            {'shipment_id': shipment_id}
         )
+        shipment_resolver.forget(tracking_num)
+        record_change('shipment', 'deleted', shipment_id, tracking_num)
         
         try:
             db.session.commit()
+            tracking_cache.invalidate(tracking_num)
             print(f"✅ DELETION SUCCESSFUL: Shipment {tracking_num} deleted by {admin_email} at {datetime.utcnow()}")
         except Exception as commit_error:
             db.session.rollback()
@@ -862,20 +1221,16 @@ def update_shipment(identifier):
         if not data:
             return jsonify({'success': False, 'error': 'No data provided'}), 400
         
-        from sqlalchemy import text, inspect
+        from sqlalchemy import text
         
         # Check if shipment exists (by tracking_number or ID)
-        result = db.session.execute(
-            text('SELECT * FROM shipments WHERE tracking_number = :identifier OR id = :identifier'),
-            {'identifier': identifier}
-        ).first()
+        result = shipment_resolver.find(identifier, ['id'])
         
         if not result:
             return jsonify({'success': False, 'error': 'Shipment not found'}), 404
         
-        # Get available columns
-        inspector = inspect(db.engine)
-        db_columns = [col['name'] for col in inspector.get_columns('shipments')]
+        # Get available columns (cached - see utils/schema_registry.py)
+        db_columns = schema_registry.columns('shipments')
         
         # Build update query with only allowed fields
         allowed_fields = [
@@ -895,18 +1250,22 @@ def update_shipment(identifier):
         if not update_clauses:
             return jsonify({'success': False, 'error': 'No valid fields to update'}), 400
         
-        # Add identifier to update_data for WHERE clause
-        update_data['identifier'] = identifier
+        # Add the resolved ID to update_data for WHERE clause
+        shipment_id = result._mapping['id']
+        update_data['shipment_id'] = shipment_id
         
         # Build and execute update query
-        update_query = f'UPDATE shipments SET {", ".join(update_clauses)} WHERE tracking_number = :identifier OR id = :identifier'
-        db.session.execute(text(update_query), update_data)
+        update_query = f'UPDATE shipments SET {", ".join(update_clauses)}{touch_clause(update_data)} WHERE id = :shipment_id'
+        statements.execute(update_query, update_data)
+        record_change('shipment', 'updated', shipment_id, result._mapping['tracking_number'],
+                      {field: data[field] for field in allowed_fields if field in update_data})
         db.session.commit()
+        tracking_cache.invalidate(result._mapping['tracking_number'])
         
         # Fetch updated shipment
-        updated_result = db.session.execute(
-            text('SELECT * FROM shipments WHERE tracking_number = :identifier OR id = :identifier'),
-            {'identifier': identifier}
+        updated_result = statements.execute(
+            'SELECT * FROM shipments WHERE id = :shipment_id',
+            {'shipment_id': shipment_id}
         ).first()
         
         if updated_result:
@@ -1,7 +1,11 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, make_response
 from models.shipment import db, Shipment
 from models.status_log import StatusLog
 from utils.auth_utils import require_admin
+from utils.tracking_cache import tracking_cache
+from utils.change_feed import change, record_change, record_changes
+from utils.status_summary import record_status_log
+from utils.http_cache import shipment_marker, validators, not_modified, with_validators
 from datetime import datetime, timezone
 
 status_bp = Blueprint('status_bp', __name__)
@@ -26,6 +30,82 @@ ALLOWED_STATUSES = [
     'Awaiting payment of Duties'
 ]
 
+# Most items accepted by POST /status/batch in one request
+MAX_BATCH_STATUS_UPDATES = 500
+
+def _validate_status_update(status, location):
+    """Error message for an invalid status/location pair, or None"""
+    if not status:
+        return 'Status is required.'
+    if status not in ALLOWED_STATUSES:
+        return f"Invalid status. Must be one of: {', '.join(ALLOWED_STATUSES)}."
+    if not location:
+        return 'Location is required for status updates.'
+    return None
+
+def _parse_timestamp(custom_timestamp):
+    """UTC naive datetime for a custom ISO timestamp, or the current time"""
+    if custom_timestamp:
+        try:
+            print(f"📅 Received custom timestamp: {custom_timestamp}")
+            # Handle ISO format with or without timezone
+            if custom_timestamp.endswith('Z'):
+                custom_timestamp = custom_timestamp[:-1] + '+00:00'
+            
+            # Parse the timestamp
+            timestamp = datetime.fromisoformat(custom_timestamp)
+            print(f"📅 Parsed timestamp (timezone-aware): {timestamp}")
+            
+            # Convert to UTC naive datetime if timezone-aware
+            if timestamp.tzinfo is not None:
+                timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+                print(f"📅 Converted to UTC (naive): {timestamp}")
+            else:
+                print(f"📅 Timestamp is already naive, treating as UTC: {timestamp}")
+        except (ValueError, AttributeError) as e:
+            print(f"❌ Error parsing timestamp: {e}, using current time")
+            timestamp = datetime.utcnow()
+    else:
+        timestamp = datetime.utcnow()
+        print(f"📅 No custom timestamp provided, using current time: {timestamp}")
+    return timestamp
+
+def _validate_batch_item(item):
+    """Error message for a batch item with a missing or mistyped field, or None.
+
+    Tracking number, location, note and coordinates must be strings (the
+    optional ones may be absent), so a bad item is reported on its own
+    instead of failing the IN lookup or the insert for the whole batch.
+    """
+    tracking_number = item.get('tracking_number')
+    if not isinstance(tracking_number, str) or not tracking_number.strip():
+        return 'Tracking number is required and must be a string.'
+    location = item.get('location')
+    if location is not None and not isinstance(location, str):
+        return 'Location must be a string.'
+    for field in ('note', 'coordinates'):
+        if item.get(field) is not None and not isinstance(item[field], str):
+            return f'{field.capitalize()} must be a string.'
+    return _validate_status_update(item.get('status'), location)
+
+def _parse_batch_timestamp(value):
+    """(UTC naive datetime, None) for an optional ISO timestamp, or (None, error message).
+
+    Unlike _parse_timestamp, a malformed value is an error rather than the
+    current time, and nothing is logged per item.
+    """
+    if value is None or value == '':
+        return datetime.utcnow(), None
+    if not isinstance(value, str):
+        return None, 'Timestamp must be an ISO 8601 string.'
+    try:
+        timestamp = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    except ValueError:
+        return None, f'Invalid timestamp: {value}'
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp, None
+
 @status_bp.route('/<tracking_number>/status', methods=['PUT'])
 def update_status(tracking_number):
     try:
@@ -44,24 +124,12 @@ def update_status(tracking_number):
         note = data.get('note')
         custom_timestamp = data.get('timestamp')  # Accept custom timestamp from frontend
 
-        # Validate status
-        if not status:
-            return jsonify({
-                'success': False,
-                'message': 'Status is required.'
-            }), 400
-        
-        if status not in ALLOWED_STATUSES:
-            return jsonify({
-                'success': False,
-                'message': f"Invalid status. Must be one of: {', '.join(ALLOWED_STATUSES)}."
-            }), 400
-
-        # Validate location is provided
-        if not location:
+        # Validate status and location
+        error = _validate_status_update(status, location)
+        if error:
             return jsonify({
                 'success': False,
-                'message': 'Location is required for status updates.'
+                'message': error
             }), 400
 
         # Find the shipment by tracking number
@@ -70,29 +138,7 @@ def update_status(tracking_number):
             return jsonify({'success': False, 'message': 'Shipment not found.'}), 404
 
         # Parse custom timestamp if provided, otherwise use current time
-        if custom_timestamp:
-            try:
-                print(f"📅 Received custom timestamp: {custom_timestamp}")
-                # Handle ISO format with or without timezone
-                if custom_timestamp.endswith('Z'):
-                    custom_timestamp = custom_timestamp[:-1] + '+00:00'
-                
-                # Parse the timestamp
-                timestamp = datetime.fromisoformat(custom_timestamp)
-                print(f"📅 Parsed timestamp (timezone-aware): {timestamp}")
-                
-                # Convert to UTC naive datetime if timezone-aware
-                if timestamp.tzinfo is not None:
-                    timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
-                    print(f"📅 Converted to UTC (naive): {timestamp}")
-                else:
-                    print(f"📅 Timestamp is already naive, treating as UTC: {timestamp}")
-            except (ValueError, AttributeError) as e:
-                print(f"❌ Error parsing timestamp: {e}, using current time")
-                timestamp = datetime.utcnow()
-        else:
-            timestamp = datetime.utcnow()
-            print(f"📅 No custom timestamp provided, using current time: {timestamp}")
+        timestamp = _parse_timestamp(custom_timestamp)
 
         # Add a new status log
         status_log = StatusLog(
@@ -108,8 +154,13 @@ def update_status(tracking_number):
         # Update the shipment's current status and location
         shipment.status = status
         shipment.current_location = location
+        record_status_log(shipment, timestamp)
+        record_change('status_log', 'created', shipment.id, tracking_number, {
+            'status': status, 'location': location, 'timestamp': timestamp.isoformat(), 'note': note
+        })
         
         db.session.commit()
+        tracking_cache.invalidate(tracking_number)
 
         print(f"✅ Status updated successfully: {status} at {location} for shipment {tracking_number}")
         return jsonify({'success': True, 'message': 'Status updated.', 'status': status}), 200
@@ -124,37 +175,159 @@ def update_status(tracking_number):
             'error': f'Failed to update status: {str(e)}'
         }), 500
 
-@status_bp.route('/<tracking_number>/status', methods=['GET'])
-def get_status_history(tracking_number):
-    # Find the shipment by tracking number
+@status_bp.route('/status/batch', methods=['POST'])
+def update_status_batch():
+    """Apply many status updates (e.g. a scanned pallet) in one transaction.
+
+    Body: a list of {tracking_number, status, location, timestamp, note,
+    coordinates}, or {"updates": [...]}. Items are applied in order, so the
+    last update for a shipment sets its status and location. Invalid items
+    (including a malformed timestamp) and unknown tracking numbers are reported per item and skipped; the rest
+    are committed together.
+    """
+    try:
+        is_admin_user, _ = require_admin()
+        if not is_admin_user:
+            return jsonify({'success': False, 'error': 'Admin access required'}), 403
+        
+        data = request.get_json()
+        updates = data.get('updates') if isinstance(data, dict) else data
+        if not isinstance(updates, list) or not updates:
+            return jsonify({'success': False, 'error': 'Provide a non-empty list of status updates'}), 400
+        if len(updates) > MAX_BATCH_STATUS_UPDATES:
+            return jsonify({
+                'success': False,
+                'error': f'At most {MAX_BATCH_STATUS_UPDATES} status updates per batch'
+            }), 400
+
+        results = [None] * len(updates)
+        valid = []
+        for index, item in enumerate(updates):
+            if not isinstance(item, dict):
+                results[index] = {'index': index, 'success': False, 'message': 'Each update must be an object.'}
+                continue
+            tracking_number = item.get('tracking_number')
+            error = _validate_batch_item(item)
+            timestamp = None
+            if not error:
+                timestamp, error = _parse_batch_timestamp(item.get('timestamp'))
+            if error:
+                results[index] = {'index': index, 'tracking_number': tracking_number, 'success': False, 'message': error}
+                continue
+            valid.append((index, item, timestamp))
+
+        # Resolve every shipment with one IN query
+        tracking_numbers = {item['tracking_number'] for _, item, _ in valid}
+        shipments = {
+            shipment.tracking_number: shipment
+            for shipment in Shipment.query.filter(Shipment.tracking_number.in_(tracking_numbers)).all()
+        } if tracking_numbers else {}
+
+        log_rows = []
+        applied = {}  # tracking number -> (shipment, count, newest timestamp)
+        for index, item, timestamp in valid:
+            tracking_number = item['tracking_number']
+            shipment = shipments.get(tracking_number)
+            if shipment is None:
+                results[index] = {'index': index, 'tracking_number': tracking_number, 'success': False,
+                                  'message': 'Shipment not found.'}
+                continue
+            log_rows.append({
+                'shipment_id': shipment.id,
+                'status': item['status'],
+                'timestamp': timestamp,
+                'location': item['location'],
+                'coordinates': item.get('coordinates'),
+                'note': item.get('note')
+            })
+            shipment.status = item['status']
+            shipment.current_location = item['location']
+            _, count, newest = applied.get(tracking_number, (shipment, 0, timestamp))
+            applied[tracking_number] = (shipment, count + 1, max(newest, timestamp))
+            results[index] = {'index': index, 'tracking_number': tracking_number, 'success': True,
+                              'status': item['status']}
+
+        if log_rows:
+            for shipment, count, newest in applied.values():
+                record_status_log(shipment, newest, count)
+            # One executemany insert for every status log in the batch (the
+            # shipment updates above are flushed with it, one UPDATE each)
+            db.session.execute(StatusLog.__table__.insert(), log_rows)
+            tracking_number_by_id = {shipment.id: tracking_number
+                                     for tracking_number, (shipment, _, _) in applied.items()}
+            record_changes([
+                change('status_log', 'created', row['shipment_id'], tracking_number_by_id[row['shipment_id']], {
+                    'status': row['status'], 'location': row['location'],
+                    'timestamp': row['timestamp'].isoformat(), 'note': row['note']
+                })
+                for row in log_rows
+            ])
+            db.session.commit()
+            tracking_cache.invalidate(*applied)
+
+        updated = len(log_rows)
+        print(f"✅ Batch status update: {updated} applied, {len(updates) - updated} rejected, "
+              f"{len(applied)} shipments")
+        return jsonify({
+            'success': updated == len(updates),
+            'updated': updated,
+            'failed': len(updates) - updated,
+            'results': results
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error applying batch status update: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'error': f'Failed to apply status updates: {str(e)}'
+        }), 500
+
+def _load_tracking(tracking_number):
+    """Status history and current_location for a shipment, or None if it doesn't exist"""
     shipment = Shipment.query.filter_by(tracking_number=tracking_number).first()
     if not shipment:
-        return jsonify({'success': False, 'message': 'Shipment not found.'}), 404
+        return None
 
     # Get all status logs for this shipment, ordered by timestamp (oldest first)
     logs = StatusLog.query.filter_by(shipment_id=shipment.id).order_by(StatusLog.timestamp.asc()).all()
     history = []
     for log in logs:
-        timestamp_str = log.timestamp.strftime('%Y-%m-%dT%H:%M:%SZ') if log.timestamp else None
         history.append({
             'status': log.status,
-            'timestamp': timestamp_str,
+            'timestamp': log.timestamp.strftime('%Y-%m-%dT%H:%M:%SZ') if log.timestamp else None,
             'location': log.location if log.location else None,  # Ensure location is included even if None
             'coordinates': log.coordinates,
             'note': log.note
         })
-        if log.timestamp:
-            print(f"📅 Returning timestamp: {timestamp_str} (from stored: {log.timestamp})")
-    
-    print(f"Found {len(history)} status logs for shipment {tracking_number}")
-    print(f"Shipment current_location: {shipment.current_location}")
-    print(f"Last history entry location: {history[-1]['location'] if history else 'No history'}")
-    if history:
-        print(f"Last history entry timestamp: {history[-1]['timestamp']}")
-    
+
+    print(f"Loaded {len(history)} status logs for shipment {tracking_number}")
+    return {'history': history, 'current_location': shipment.current_location}
+
+@status_bp.route('/<tracking_number>/status', methods=['GET'])
+def get_status_history(tracking_number):
+    # One indexed read decides between 304, 404 and serving the history
+    marker = shipment_marker(tracking_number)
+    if marker is None:
+        return jsonify({'success': False, 'message': 'Shipment not found.'}), 404
+    shipment_id, updated_at = marker
+    etag, last_modified = validators('status', shipment_id, updated_at)
+    if not_modified(etag, last_modified):
+        return with_validators(make_response('', 304), etag, last_modified)
+
+    # Served from the tracking cache; the history is only queried on a miss
+    tracking = tracking_cache.get_or_load(
+        tracking_number, lambda: _load_tracking(tracking_number), version=str(updated_at)
+    )
+    if tracking is None:
+        return jsonify({'success': False, 'message': 'Shipment not found.'}), 404
+
     # Also return the shipment's current_location in the response for easier access
-    return jsonify({
+    response = jsonify({
         'success': True, 
-        'history': history,
-        'current_location': shipment.current_location  # Include current_location in response
-    }), 200
\ No newline at end of file
+        'history': tracking['history'],
+        'current_location': tracking['current_location']  # Include current_location in response
+    })
+    return with_validators(response, etag, last_modified), 200
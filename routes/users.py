@@ -5,24 +5,13 @@ import json
 import os
 from datetime import datetime, timedelta
 import jwt
+# ✅ Users are served from a shared in-memory store (load_users/save_users stay importable from here)
+from utils.user_store import user_store, load_users, save_users, get_user, get_user_by_email, DuplicateEmailError
 
 user_bp = Blueprint('user_bp', __name__)
 
-USERS_FILE = os.path.join('data', 'users.json')
 SHIPMENTS_FILE = os.path.join('data', 'shipments.json')
 
-# ✅ Helper: Load users from file
-def load_users():
-    if not os.path.exists(USERS_FILE):
-        return {}
-    with open(USERS_FILE, 'r') as f:
-        return json.load(f)
-
-# ✅ Helper: Save users to file
-def save_users(users):
-    with open(USERS_FILE, 'w') as f:
-        json.dump(users, f, indent=2)
-
 # ✅ Helper: Generate JWT token for mobile compatibility
 def generate_token(user_id, email):
     """Generate JWT token for mobile authentication"""
@@ -90,11 +79,9 @@ def signup():
     if not email or not password or not name:
         return jsonify({'success': False, 'error': 'Email, password, and name are required'}), 400
     
-    # Check if user already exists
-    users = load_users()
-    for user_id, user in users.items():
-        if user.get('email') == email:
-            return jsonify({'success': False, 'error': 'User with this email already exists'}), 409
+    # Check if user already exists (email index lookup)
+    if user_store.email_taken(email):
+        return jsonify({'success': False, 'error': 'User with this email already exists'}), 409
     
     # Create new user
     # SECURITY: All users signing up from the public signup page get 'user' role ONLY
@@ -114,8 +101,11 @@ def signup():
     # This prevents ANY possibility of setting a different role during signup
     new_user['role'] = 'user'
     
-    users[user_id] = new_user
-    save_users(users)
+    # add() re-checks the email under the write lock so concurrent signups can't both win
+    try:
+        user_store.add(new_user)
+    except DuplicateEmailError:
+        return jsonify({'success': False, 'error': 'User with this email already exists'}), 409
     
     # Log in the user automatically (session for desktop)
     session['user_id'] = user_id
@@ -152,29 +142,27 @@ def login():
     email = data.get('email')
     password = data.get('password')
 
-    users = load_users()
-    for user_id, user in users.items():
-        if user.get('email') == email and check_password_hash(user.get('password', ''), password):
-            # Ensure user has a role (default to 'user' for existing users)
-            if 'role' not in user:
-                user['role'] = 'user'
-                users[user_id] = user
-                save_users(users)
-            
-            session['user_id'] = user_id
-            
-            # Generate token for mobile compatibility
-            token = generate_token(user_id, email)
-            
-            # Return user data without password
-            user_response = {k: v for k, v in user.items() if k != 'password'}
-            response_data = {'success': True, 'user': user_response}
-            
-            # Add token if generated successfully
-            if token:
-                response_data['token'] = token
-            
-            return jsonify(response_data)
+    user_id, user = get_user_by_email(email)
+    if user and check_password_hash(user.get('password', ''), password or ''):
+        # Ensure user has a role (default to 'user' for existing users)
+        if 'role' not in user:
+            user['role'] = 'user'
+            user_store.update(lambda users: users[user_id].setdefault('role', 'user') if user_id in users else None)
+        
+        session['user_id'] = user_id
+        
+        # Generate token for mobile compatibility
+        token = generate_token(user_id, email)
+        
+        # Return user data without password
+        user_response = {k: v for k, v in user.items() if k != 'password'}
+        response_data = {'success': True, 'user': user_response}
+        
+        # Add token if generated successfully
+        if token:
+            response_data['token'] = token
+        
+        return jsonify(response_data)
     return jsonify({'success': False, 'error': 'Invalid email or password'}), 401
 
 # ✅ Logout Route (POST)
@@ -194,16 +182,14 @@ def get_profile():
     if not user_id:
         return jsonify({'success': False, 'error': 'Not logged in'}), 401
 
-    users = load_users()
-    user = users.get(user_id)
+    user = get_user(user_id)
     if not user:
         return jsonify({'success': False, 'error': 'User not found'}), 404
 
     # Ensure user has a role (default to 'user' for existing users)
     if 'role' not in user:
         user['role'] = 'user'
-        users[user_id] = user
-        save_users(users)
+        user_store.update(lambda users: users[user_id].setdefault('role', 'user') if user_id in users else None)
 
     # Return user data without password
     user_response = {k: v for k, v in user.items() if k != 'password'}
@@ -238,8 +224,7 @@ def get_recent_shipments():
 def is_admin(user_id):
     if not user_id:
         return False
-    users = load_users()
-    user = users.get(user_id, {})
+    user = get_user(user_id) or {}
     role = user.get('role', '').lower()
     return role in ['admin', 'super admin', 'manager']
 
@@ -320,12 +305,9 @@ def create_admin_user():
         if not email or not password or not name:
             return jsonify({'success': False, 'error': 'Email, password, and name are required'}), 400
         
-        users = load_users()
-        
-        # Check if user already exists
-        for existing_user_id, existing_user in users.items():
-            if existing_user.get('email') == email:
-                return jsonify({'success': False, 'error': 'User with this email already exists'}), 409
+        # Check if user already exists (email index lookup)
+        if user_store.email_taken(email):
+            return jsonify({'success': False, 'error': 'User with this email already exists'}), 409
         
         # Create new admin user
         new_user_id = str(uuid.uuid4())
@@ -339,8 +321,10 @@ def create_admin_user():
             'status': 'Active'
         }
         
-        users[new_user_id] = new_user
-        save_users(users)
+        try:
+            user_store.add(new_user)
+        except DuplicateEmailError:
+            return jsonify({'success': False, 'error': 'User with this email already exists'}), 409
         
         # Return user data without password
         user_response = {k: v for k, v in new_user.items() if k != 'password'}
@@ -363,28 +347,37 @@ def update_admin_user(user_id_to_update):
         return jsonify({'success': False, 'error': 'Unauthorized'}), 401
     
     try:
-        users = load_users()
-        user_to_update = users.get(user_id_to_update)
-        
-        if not user_to_update:
+        if not get_user(user_id_to_update):
             return jsonify({'success': False, 'error': 'User not found'}), 404
         
         data = request.get_json()
         
-        # Update fields if provided
-        if 'name' in data:
-            user_to_update['name'] = data['name']
-        if 'email' in data:
-            user_to_update['email'] = data['email']
-        if 'role' in data:
-            user_to_update['role'] = data['role'].lower()
-        if 'status' in data:
-            user_to_update['status'] = data['status']
-        if 'password' in data and data['password']:
-            user_to_update['password'] = generate_password_hash(data['password'])
+        # Apply the changes under the store's write lock so concurrent edits aren't lost
+        def apply_update(users):
+            user_to_update = users.get(user_id_to_update)
+            if not user_to_update:
+                return None
+            # Update fields if provided
+            if 'name' in data:
+                user_to_update['name'] = data['name']
+            if 'email' in data:
+                if user_store.email_taken(data['email'], exclude_user_id=user_id_to_update):
+                    raise DuplicateEmailError(data['email'])
+                user_to_update['email'] = data['email']
+            if 'role' in data:
+                user_to_update['role'] = data['role'].lower()
+            if 'status' in data:
+                user_to_update['status'] = data['status']
+            if 'password' in data and data['password']:
+                user_to_update['password'] = generate_password_hash(data['password'])
+            return user_to_update
         
-        users[user_id_to_update] = user_to_update
-        save_users(users)
+        try:
+            user_to_update = user_store.update(apply_update)
+        except DuplicateEmailError:
+            return jsonify({'success': False, 'error': 'User with this email already exists'}), 409
+        if not user_to_update:
+            return jsonify({'success': False, 'error': 'User not found'}), 404
         
         # Return user data without password
         user_response = {k: v for k, v in user_to_update.items() if k != 'password'}
@@ -411,14 +404,13 @@ def delete_admin_user(user_id_to_delete):
         if user_id_to_delete == user_id:
             return jsonify({'success': False, 'error': 'Cannot delete your own account'}), 400
         
-        users = load_users()
-        
-        if user_id_to_delete not in users:
+        if not get_user(user_id_to_delete):
             return jsonify({'success': False, 'error': 'User not found'}), 404
         
         # Delete user
-        del users[user_id_to_delete]
-        save_users(users)
+        deleted = user_store.update(lambda users: users.pop(user_id_to_delete, None))
+        if deleted is None:
+            return jsonify({'success': False, 'error': 'User not found'}), 404
         
         return jsonify({
             'success': True,
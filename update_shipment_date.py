@@ -12,6 +12,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from app import app
 from models.shipment import db, Shipment
 from models.status_log import StatusLog
+from utils.status_summary import reconcile_status_summary
 
 def parse_date_string(date_str):
     """
@@ -109,6 +110,7 @@ def update_shipment_date(tracking_number, date_time_str, location, status="Regis
         # Save to database
         try:
             db.session.add(status_log)
+            reconcile_status_summary([shipment.id])  # keep last_status_at / status_log_count in sync
             db.session.commit()
             
             print(f"\n✅ Successfully updated shipment!")
@@ -1,19 +1,10 @@
 """
 Authentication and authorization utilities
 """
-import json
 import os
 import jwt
 from flask import session, request
-
-USERS_FILE = os.path.join('data', 'users.json')
-
-def load_users():
-    """Load users from JSON file"""
-    if not os.path.exists(USERS_FILE):
-        return {}
-    with open(USERS_FILE, 'r') as f:
-        return json.load(f)
+from utils.user_store import load_users, get_user
 
 def verify_token(token):
     """Verify JWT token and return user_id"""
@@ -49,8 +40,7 @@ def get_current_user():
     if not user_id:
         return None
     
-    users = load_users()
-    return users.get(user_id)
+    return get_user(user_id)
 
 def is_admin():
     """Check if current user is admin"""
@@ -0,0 +1,64 @@
+"""
+Change feed (outbox) for shipments and status logs
+
+Every write path records what it changed in change_events, through the same
+db.session and therefore in the same transaction as the change itself: a
+rolled-back request leaves no event behind and a committed one always has
+its event. Clients poll GET /api/changes?after=<seq> (routes/changes.py) and
+resume from the last seq they saw.
+
+seq only grows. On PostgreSQL writers also take a transaction-scoped
+advisory lock before inserting, so events commit in seq order and a reader
+can never see seq N+1 while N is still in flight (and skip N forever).
+SQLite serializes writers on its own.
+"""
+import json
+from datetime import datetime
+
+from sqlalchemy import text
+
+from models.shipment import db
+from models.change_event import ChangeEvent
+from utils.sql_statements import statements
+
+# Default and maximum page size for GET /api/changes
+DEFAULT_CHANGES_LIMIT = 100
+MAX_CHANGES_LIMIT = 1000
+
+# pg_advisory_xact_lock key shared by every change feed writer
+CHANGE_FEED_LOCK = 0x6368616E6765  # 'change'
+
+
+def change(entity, action, shipment_id, tracking_number=None, data=None):
+    """One change_events row; ``data`` is stored as JSON"""
+    return {
+        'entity': entity,
+        'action': action,
+        'shipment_id': shipment_id,
+        'tracking_number': tracking_number,
+        'data': json.dumps(data, default=str) if data is not None else None,
+        'created_at': datetime.utcnow()
+    }
+
+
+def record_changes(changes):
+    """Add ``changes`` (from change()) to the current transaction; the caller commits"""
+    if not changes:
+        return
+    if db.session.get_bind().dialect.name == 'postgresql':
+        db.session.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': CHANGE_FEED_LOCK})
+    db.session.execute(ChangeEvent.__table__.insert(), changes)
+
+
+def record_change(entity, action, shipment_id, tracking_number=None, data=None):
+    record_changes([change(entity, action, shipment_id, tracking_number, data)])
+
+
+def changes_after(after=0, limit=DEFAULT_CHANGES_LIMIT):
+    """Up to ``limit`` events with seq > ``after``, oldest first"""
+    rows = statements.execute(
+        'SELECT seq, entity, action, shipment_id, tracking_number, data, created_at '
+        'FROM change_events WHERE seq > :after ORDER BY seq LIMIT :limit',
+        {'after': after, 'limit': limit}
+    ).all()
+    return [ChangeEvent.row_to_dict(row._mapping) for row in rows]
@@ -0,0 +1,141 @@
+"""
+Local pub/sub for live chat events (feeds GET /api/chat/stream and long-polling)
+
+Events are dicts: {'id', 'type', 'session_id', 'data'}. Types published by
+routes/chat.py: session_created, session_updated, agent_requested,
+agent_assigned, session_ended, session_deleted and message.
+
+Backends (CHAT_EVENTS_BACKEND):
+    memory  - fan-out inside one process (default; fine for a single worker)
+    sqlite  - events are appended to a small SQLite file (CHAT_EVENTS_DB) that
+              every worker tails, so several gunicorn workers share one stream
+
+Both deliver through thread-safe queues, so they work with gthread and with
+gevent (monkey-patched) workers.
+"""
+import itertools
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+class MemoryBroker:
+    """In-process fan-out to subscriber queues and listener callbacks"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._listeners = []
+        self._ids = itertools.count(1)
+
+    def subscribe(self, maxsize=1000):
+        """Return a queue that receives every event published from now on"""
+        subscription = queue.Queue(maxsize=maxsize)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def add_listener(self, callback):
+        """Call ``callback(event)`` for every event delivered to this process"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def publish(self, event_type, session_id, **data):
+        self._dispatch({'id': next(self._ids), 'type': event_type, 'session_id': session_id, 'data': data})
+
+    def _dispatch(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            listeners = list(self._listeners)
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait(event)
+            except queue.Full:
+                # Slow consumer - drop rather than block the publisher
+                pass
+        for callback in listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"⚠️ Chat event listener failed: {e}")
+
+
+class SqliteBroker(MemoryBroker):
+    """Cross-worker fan-out through a shared SQLite file.
+
+    publish() inserts a row; a poller thread in each worker reads rows newer
+    than the last one it saw and dispatches them locally, so every worker's
+    subscribers see every event (including their own) in the same order.
+    """
+
+    def __init__(self, path, poll_interval=0.5, retention_seconds=300):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS chat_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created REAL NOT NULL,
+                    payload TEXT NOT NULL
+                )
+            ''')
+            # Only deliver events published after this worker started
+            self._last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM chat_events').fetchone()[0]
+        self._poller = threading.Thread(target=self._poll, name='chat-events-poller', daemon=True)
+        self._poller.start()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def publish(self, event_type, session_id, **data):
+        payload = json.dumps({'type': event_type, 'session_id': session_id, 'data': data})
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('INSERT INTO chat_events (created, payload) VALUES (?, ?)', (now, payload))
+                conn.execute('DELETE FROM chat_events WHERE created < ?', (now - self.retention_seconds,))
+        finally:
+            conn.close()
+
+    def _poll(self):
+        conn = self._connect()
+        while True:
+            try:
+                rows = conn.execute(
+                    'SELECT id, payload FROM chat_events WHERE id > ? ORDER BY id', (self._last_id,)
+                ).fetchall()
+                for row_id, payload in rows:
+                    self._last_id = row_id
+                    event = json.loads(payload)
+                    event['id'] = row_id
+                    self._dispatch(event)
+            except Exception as e:
+                print(f"⚠️ Chat event poll failed: {e}")
+            time.sleep(self.poll_interval)
+
+
+def _create_broker():
+    """Pick the backend from CHAT_EVENTS_BACKEND (memory | sqlite)"""
+    backend = os.environ.get('CHAT_EVENTS_BACKEND', 'memory').lower()
+    if backend == 'sqlite':
+        path = os.environ.get('CHAT_EVENTS_DB', os.path.join('data', 'chat_events.db'))
+        print(f"✅ Chat events: SQLite fan-out at {path}")
+        return SqliteBroker(path)
+    return MemoryBroker()
+
+
+chat_events = _create_broker()
@@ -0,0 +1,391 @@
+"""
+Append-only, file-backed chat storage (CHAT_STORAGE=file)
+
+For small installs that don't want chat in the database. Layout under data/chat/:
+
+    sessions.jsonl          one line per session change, carrying the message count,
+                            last-message preview and unread count; the latest line
+                            for an id wins and {"id": ..., "deleted": true} is a tombstone
+    messages/<day>.jsonl    one JSON line per message, appended to the UTC day's segment
+    index.jsonl             one line per message: session id, segment, byte offset,
+                            length and sender
+
+Each process keeps the sessions and the per-session offset index in memory
+and tails the two small files for lines other workers appended, so reading a
+session's messages seeks straight to its lines instead of parsing the whole
+history. A background compactor rewrites the files without deleted sessions.
+"""
+from datetime import datetime
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from models.chat_session import LAST_MESSAGE_PREVIEW_LENGTH
+from utils.file_lock import file_lock
+
+CHAT_DIR = os.path.join('data', 'chat')
+
+# Per-session summary kept on each sessions.jsonl line (see ChatSession)
+SUMMARY_FIELDS = ('messageCount', 'lastMessage', 'lastMessageTime', 'lastSender', 'unreadByAgent')
+
+
+class FileChatStore:
+    """Chat storage on append-only JSONL segments with a per-session offset index"""
+
+    def __init__(self, root=CHAT_DIR, compact_interval=3600):
+        self.root = root
+        self.sessions_path = os.path.join(root, 'sessions.jsonl')
+        self.index_path = os.path.join(root, 'index.jsonl')
+        self.segments_dir = os.path.join(root, 'messages')
+        self.lock_path = os.path.join(root, '.lock')
+        self.compact_interval = compact_interval
+        self._thread_lock = threading.RLock()
+        self._compactor = None
+        self._reset()
+
+    def _reset(self):
+        self._sessions = {}
+        self._index = {}       # session_id -> [[segment, offset, length, sender, id, timestamp], ...]
+        self._tombstones = 0   # deleted sessions still taking space on disk
+        self._positions = {}   # path -> (inode, bytes consumed)
+
+    # ---- tailing -------------------------------------------------------
+
+    def _read_new_lines(self, path):
+        """Return records appended to ``path`` since the last call"""
+        inode, offset = self._positions.get(path, (None, 0))
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        # Only consume complete lines; a partially written tail is picked up next time
+        end = data.rfind(b'\n') + 1
+        self._positions[path] = (inode, offset + end)
+        return [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+
+    def _inode(self, path):
+        try:
+            return os.stat(path).st_ino
+        except FileNotFoundError:
+            return None
+
+    def _catch_up(self):
+        """Apply lines appended by any worker since the last call (caller holds a file lock)"""
+        # A compaction replaces the files - start over from the new ones
+        for path in (self.sessions_path, self.index_path):
+            known = self._positions.get(path)
+            if known and known[0] != self._inode(path):
+                self._reset()
+                break
+        for path in (self.sessions_path, self.index_path):
+            if path not in self._positions:
+                self._positions[path] = (self._inode(path), 0)
+
+        for record in self._read_new_lines(self.sessions_path):
+            if record.get('deleted'):
+                if self._sessions.pop(record['id'], None) is not None:
+                    self._tombstones += 1
+                self._index.pop(record['id'], None)
+            else:
+                self._sessions[record['id']] = record
+        for record in self._read_new_lines(self.index_path):
+            if record['s'] in self._sessions:
+                self._index.setdefault(record['s'], []).append(
+                    [record['seg'], record['off'], record['len'], record.get('snd'),
+                     record.get('id'), record.get('ts')]
+                )
+
+    @contextmanager
+    def _locked(self, shared):
+        """Hold the file lock (shared for reads) with in-memory state caught up"""
+        os.makedirs(self.segments_dir, exist_ok=True)
+        with file_lock(self.lock_path, shared=shared), self._thread_lock:
+            self._catch_up()
+            yield
+
+    def _read(self):
+        return self._locked(shared=True)
+
+    def _write(self):
+        return self._locked(shared=False)
+
+    # ---- appending (caller holds the exclusive lock) -----------------------
+
+    def _append_lines(self, path, records):
+        with open(path, 'ab') as f:
+            f.write(b''.join((json.dumps(r) + '\n').encode('utf-8') for r in records))
+
+    def _append_session(self, session_data):
+        self._append_lines(self.sessions_path, [session_data])
+
+    def _append_messages(self, session_id, messages):
+        segment = datetime.utcnow().strftime('%Y-%m-%d')
+        segment_path = os.path.join(self.segments_dir, f'{segment}.jsonl')
+        index_records = []
+        with open(segment_path, 'ab') as f:
+            offset = f.tell()
+            for message in messages:
+                line = (json.dumps(dict(message, session_id=session_id)) + '\n').encode('utf-8')
+                f.write(line)
+                index_records.append({'s': session_id, 'seg': segment, 'off': offset,
+                                      'len': len(line), 'snd': message['sender'],
+                                      'id': message['id'], 'ts': message['timestamp']})
+                offset += len(line)
+        self._append_lines(self.index_path, index_records)
+
+    # ---- store interface -------------------------------------------------
+
+    def create_session(self, email, name):
+        now = datetime.utcnow().isoformat()
+        session_data = {
+            'id': str(uuid.uuid4()),
+            'email': email,
+            'name': name,
+            'status': 'active',
+            'createdAt': now,
+            'updatedAt': now,
+            'assignedAgent': None,
+            'messageCount': 0,
+            'lastMessage': '',
+            'lastMessageTime': '',
+            'lastSender': None,
+            'unreadByAgent': 0
+        }
+        with self._write():
+            self._append_session(session_data)
+            self._catch_up()
+        return dict(session_data)
+
+    def get_session(self, session_id):
+        with self._read():
+            session_data = self._sessions.get(session_id)
+            return dict(session_data) if session_data else None
+
+    def _changed_session(self, session_id, changes, messages=()):
+        session_data = dict(self._sessions[session_id])
+        if 'status' in changes:
+            session_data['status'] = changes['status']
+        if 'assigned_agent' in changes:
+            session_data['assignedAgent'] = changes['assigned_agent']
+        if changes.get('mark_read'):
+            session_data['unreadByAgent'] = 0
+        if messages:
+            self._apply_summary(session_data, messages)
+        # Reading a session isn't activity - don't move it up the agent list
+        if set(changes) != {'mark_read'}:
+            session_data['updatedAt'] = datetime.utcnow().isoformat()
+        return session_data
+
+    def _summary(self, session_data):
+        """Summary fields of a session line, rebuilt from the index for lines
+        written before the fields existed"""
+        if 'messageCount' in session_data:
+            return {key: session_data.get(key) for key in SUMMARY_FIELDS}
+        entries = self._index.get(session_data['id'], [])
+        last_message = self._load_entries(entries[-1:])[0] if entries else None
+        unread = 0
+        for entry in reversed(entries):
+            if entry[3] == 'agent':
+                break
+            if entry[3] == 'user':
+                unread += 1
+        return {
+            'messageCount': len(entries),
+            'lastMessage': last_message['text'][:LAST_MESSAGE_PREVIEW_LENGTH] if last_message else '',
+            'lastMessageTime': last_message['timestamp'] if last_message else '',
+            'lastSender': last_message['sender'] if last_message else None,
+            'unreadByAgent': unread
+        }
+
+    def _apply_summary(self, session_data, messages):
+        """Fold appended messages into the session line's summary fields"""
+        summary = self._summary(session_data)
+        unread = summary['unreadByAgent'] or 0
+        for message in messages:
+            if message['sender'] == 'agent':
+                unread = 0
+            elif message['sender'] == 'user':
+                unread += 1
+        last = messages[-1]
+        session_data.update({
+            'messageCount': (summary['messageCount'] or 0) + len(messages),
+            'lastMessage': last['text'][:LAST_MESSAGE_PREVIEW_LENGTH],
+            'lastMessageTime': last['timestamp'],
+            'lastSender': last['sender'],
+            'unreadByAgent': unread
+        })
+
+    def update_session(self, session_id, **changes):
+        with self._write():
+            if session_id not in self._sessions:
+                return None
+            session_data = self._changed_session(session_id, changes)
+            self._append_session(session_data)
+            self._catch_up()
+        return dict(session_data)
+
+    def append_messages(self, session_id, messages, **session_changes):
+        """Same contract as SqlChatStore.append_messages"""
+        with self._write():
+            if session_id not in self._sessions:
+                return None, None
+            inserted = [{
+                'id': str(uuid.uuid4()),
+                'text': message['text'],
+                'sender': message['sender'],
+                'timestamp': datetime.utcnow().isoformat()
+            } for message in messages]
+            self._append_messages(session_id, inserted)
+            session_data = self._changed_session(session_id, session_changes, inserted)
+            self._append_session(session_data)
+            self._catch_up()
+        return inserted, dict(session_data)
+
+    def _load_entries(self, entries):
+        """Read message lines for index entries, opening each segment once"""
+        messages = []
+        handles = {}
+        try:
+            for segment, offset, length, *_ in entries:
+                f = handles.get(segment)
+                if f is None:
+                    f = handles[segment] = open(os.path.join(self.segments_dir, f'{segment}.jsonl'), 'rb')
+                f.seek(offset)
+                record = json.loads(f.read(length))
+                record.pop('session_id', None)
+                messages.append(record)
+        finally:
+            for f in handles.values():
+                f.close()
+        return messages
+
+    def get_messages(self, session_id, since=None):
+        """Messages in append order, optionally only those after ``since``.
+
+        ``since`` is a message id from this session or an ISO timestamp. The
+        index is scanned backwards, so the cost follows the number of new messages.
+        """
+        with self._read():
+            entries = self._index.get(session_id, [])
+            if since:
+                entries = entries[self._since_position(entries, since):]
+            return self._load_entries(entries)
+
+    def _since_position(self, entries, since):
+        for position in range(len(entries) - 1, -1, -1):
+            if entries[position][4] == since:
+                return position + 1
+        from utils.chat_store import parse_since_timestamp
+        since_time = parse_since_timestamp(since)
+        position = len(entries)
+        while position > 0 and entries[position - 1][5] and datetime.fromisoformat(entries[position - 1][5]) > since_time:
+            position -= 1
+        return position
+
+    def release_connection(self):
+        """Nothing to release - kept for parity with SqlChatStore"""
+
+    def has_agent_messages(self, session_id):
+        with self._read():
+            return any(entry[3] == 'agent' for entry in self._index.get(session_id, []))
+
+    def list_sessions(self, status=None, email_contains=None, limit=None, offset=0):
+        """Same contract as SqlChatStore.list_sessions - reads session lines only"""
+        with self._read():
+            sessions_list = []
+            for session_data in self._sessions.values():
+                if status and session_data.get('status') != status:
+                    continue
+                if email_contains and email_contains.lower() not in (session_data.get('email') or '').lower():
+                    continue
+                session_info = dict(session_data)
+                session_info.update(self._summary(session_data))
+                sessions_list.append(session_info)
+        sessions_list.sort(key=lambda x: (x.get('updatedAt') or '', x['id']), reverse=True)
+        end = None if limit is None else offset + limit
+        return sessions_list[offset:end]
+
+    def delete_session(self, session_id):
+        with self._write():
+            if session_id not in self._sessions:
+                return False
+            self._append_session({'id': session_id, 'deleted': True})
+            self._catch_up()
+        return True
+
+    # ---- compaction ----------------------------------------------------
+
+    def compact(self):
+        """Rewrite segments, index and sessions without deleted sessions.
+
+        Returns the number of message lines dropped, or None if there was
+        nothing to compact.
+        """
+        with self._write():
+            if not self._tombstones:
+                return None
+            live = set(self._sessions)
+            dropped = 0
+            index_records = []
+            for filename in sorted(os.listdir(self.segments_dir)):
+                if not filename.endswith('.jsonl'):
+                    continue
+                segment = filename[:-len('.jsonl')]
+                path = os.path.join(self.segments_dir, filename)
+                kept = []
+                offset = 0
+                with open(path, 'rb') as f:
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            continue
+                        record = json.loads(line)
+                        if record.get('session_id') not in live:
+                            dropped += 1
+                            continue
+                        kept.append(line)
+                        index_records.append({'s': record['session_id'], 'seg': segment, 'off': offset,
+                                              'len': len(line), 'snd': record.get('sender'),
+                                              'id': record.get('id'), 'ts': record.get('timestamp')})
+                        offset += len(line)
+                if kept:
+                    self._replace_file(path, kept)
+                else:
+                    os.remove(path)
+
+            self._replace_file(self.index_path, [(json.dumps(r) + '\n').encode('utf-8') for r in index_records])
+            self._replace_file(self.sessions_path,
+                               [(json.dumps(s) + '\n').encode('utf-8') for s in self._sessions.values()])
+            self._reset()
+            self._catch_up()
+        print(f"🧹 Chat log compacted: dropped {dropped} messages from deleted sessions")
+        return dropped
+
+    def _replace_file(self, path, lines):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def start_compactor(self):
+        """Run compact() every ``compact_interval`` seconds on a daemon thread"""
+        if self._compactor is not None or not self.compact_interval:
+            return
+
+        def run():
+            while True:
+                time.sleep(self.compact_interval)
+                try:
+                    self.compact()
+                except Exception as e:
+                    print(f"⚠️ Chat log compaction failed: {e}")
+
+        self._compactor = threading.Thread(target=run, name='chat-log-compactor', daemon=True)
+        self._compactor.start()
+
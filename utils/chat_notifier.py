@@ -0,0 +1,50 @@
+"""
+In-process wake-ups for chat long-polling
+
+GET /sessions/<id>/messages?wait=N blocks on this notifier until a message
+is appended to that session, or until N seconds pass. routes/chat.py signals
+it from 'message' events on utils/chat_events, so with the sqlite events
+backend appends from other gunicorn workers wake waiters too; otherwise they
+are picked up when the wait times out and the request re-reads the store.
+"""
+import threading
+import time
+
+
+class ChatNotifier:
+    """Per-session version counters behind a single condition variable"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._versions = {}
+
+    def version(self, session_id):
+        """Current version for a session; pass it to wait() to avoid missed wake-ups"""
+        with self._condition:
+            return self._versions.get(session_id, 0)
+
+    def notify(self, session_id):
+        """Signal that ``session_id`` has new messages"""
+        with self._condition:
+            self._versions[session_id] = self._versions.get(session_id, 0) + 1
+            self._condition.notify_all()
+
+    def forget(self, session_id):
+        """Drop the counter for a deleted session"""
+        with self._condition:
+            self._versions.pop(session_id, None)
+            self._condition.notify_all()
+
+    def wait(self, session_id, version, timeout):
+        """Block until the session moves past ``version``; True if it did"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._versions.get(session_id, 0) == version:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+
+chat_notifier = ChatNotifier()
@@ -0,0 +1,216 @@
+"""
+Chat session/message storage used by routes/chat.py
+
+By default sessions and messages are rows in chat_sessions / chat_messages,
+so sending a message is a single-row INSERT (plus a touch of the session row)
+instead of rewriting the whole history. Set CHAT_STORAGE=file to use the
+append-only log in utils/chat_file_store.py instead (no database needed).
+"""
+from datetime import datetime, timezone
+import os
+import uuid
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from models.shipment import db
+from models.chat_session import ChatSession, LAST_MESSAGE_PREVIEW_LENGTH
+from models.chat_message import ChatMessage
+
+# Attempts at claiming the next seq numbers when a concurrent append to the
+# same session took them first
+APPEND_ATTEMPTS = 5
+
+
+def parse_since_timestamp(value):
+    """Parse an ISO ``since`` cursor into a naive UTC datetime (ValueError if invalid)"""
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (ValueError, AttributeError):
+        raise ValueError(f'Invalid since cursor: {value}')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class SqlChatStore:
+    """Chat storage backed by the chat_sessions / chat_messages tables"""
+
+    def create_session(self, email, name):
+        now = datetime.utcnow()
+        chat_session = ChatSession(
+            id=str(uuid.uuid4()),
+            email=email,
+            name=name,
+            status='active',
+            created_at=now,
+            updated_at=now,
+            assigned_agent=None
+        )
+        db.session.add(chat_session)
+        db.session.commit()
+        return chat_session.to_dict()
+
+    def get_session(self, session_id):
+        chat_session = db.session.get(ChatSession, session_id)
+        return chat_session.to_dict() if chat_session else None
+
+    def update_session(self, session_id, **changes):
+        """Apply ``status`` / ``assigned_agent`` changes and bump updatedAt"""
+        chat_session = db.session.get(ChatSession, session_id)
+        if not chat_session:
+            return None
+        self._apply_session_changes(chat_session, changes)
+        db.session.commit()
+        return chat_session.to_dict()
+
+    def _apply_session_changes(self, chat_session, changes):
+        if 'status' in changes:
+            chat_session.status = changes['status']
+        if 'assigned_agent' in changes:
+            chat_session.assigned_agent = changes['assigned_agent']
+        if changes.get('mark_read'):
+            chat_session.unread_by_agent = 0
+        # Reading a session isn't activity - don't move it up the agent list
+        if set(changes) != {'mark_read'}:
+            chat_session.updated_at = datetime.utcnow()
+
+    def _apply_summary(self, chat_session, rows):
+        """Fold newly inserted rows into the session's summary columns.
+
+        Counters are updated as SQL expressions (``x = x + n``) so concurrent
+        appends to the same session from other workers aren't lost.
+        """
+        if not rows:
+            return
+        last = rows[-1]
+        chat_session.message_count = ChatSession.message_count + len(rows)
+        chat_session.last_message_at = last.timestamp
+        chat_session.last_sender = last.sender
+        chat_session.last_message_preview = last.text[:LAST_MESSAGE_PREVIEW_LENGTH]
+        agent_positions = [i for i, row in enumerate(rows) if row.sender == 'agent']
+        if agent_positions:
+            chat_session.unread_by_agent = sum(
+                1 for row in rows[agent_positions[-1] + 1:] if row.sender == 'user'
+            )
+        else:
+            chat_session.unread_by_agent = ChatSession.unread_by_agent + sum(
+                1 for row in rows if row.sender == 'user'
+            )
+
+    def append_messages(self, session_id, messages, **session_changes):
+        """Insert ``messages`` ({'text', 'sender'} dicts) for a session in one transaction.
+
+        ``session_changes`` are applied to the session row in the same commit.
+        Returns (inserted message dicts, updated session dict), or (None, None)
+        if the session doesn't exist.
+        """
+        for attempt in range(APPEND_ATTEMPTS):
+            chat_session = db.session.get(ChatSession, session_id)
+            if not chat_session:
+                return None, None
+            inserted = self._add_messages(session_id, messages)
+            self._apply_summary(chat_session, inserted)
+            self._apply_session_changes(chat_session, session_changes)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Another worker committed the same seq numbers first; take the next ones
+                db.session.rollback()
+                if attempt == APPEND_ATTEMPTS - 1:
+                    raise
+                continue
+            return [row.to_dict() for row in inserted], chat_session.to_dict()
+
+    def _add_messages(self, session_id, messages):
+        next_seq = (db.session.query(func.coalesce(func.max(ChatMessage.seq), 0))
+                    .filter(ChatMessage.session_id == session_id)
+                    .scalar()) + 1
+        inserted = []
+        for offset, message in enumerate(messages):
+            row = ChatMessage(
+                id=str(uuid.uuid4()),
+                session_id=session_id,
+                text=message['text'],
+                sender=message['sender'],
+                timestamp=datetime.utcnow(),
+                seq=next_seq + offset
+            )
+            db.session.add(row)
+            inserted.append(row)
+        return inserted
+
+    def get_messages(self, session_id, since=None):
+        """Messages in append order, optionally only those after ``since``.
+
+        ``since`` is a message id from this session or an ISO timestamp. A
+        message id is resolved to its seq, so a message that committed after
+        the client's last read is still returned even if its timestamp is
+        older, and messages sharing a timestamp are never dropped.
+        """
+        query = ChatMessage.query.filter_by(session_id=session_id)
+        if since:
+            query = query.filter(self._since_filter(session_id, since))
+        rows = query.order_by(ChatMessage.seq.asc(), ChatMessage.timestamp.asc(), ChatMessage.id.asc()).all()
+        return [row.to_dict() for row in rows]
+
+    def _since_filter(self, session_id, since):
+        row = (db.session.query(ChatMessage.seq, ChatMessage.timestamp)
+               .filter_by(session_id=session_id, id=since)
+               .first())
+        if row and row.seq is not None:
+            return ChatMessage.seq > row.seq
+        if row:
+            return ChatMessage.timestamp > row.timestamp
+        return ChatMessage.timestamp > parse_since_timestamp(since)
+
+    def release_connection(self):
+        """End the read transaction so a long-poll doesn't pin a pooled connection"""
+        db.session.rollback()
+
+    def has_agent_messages(self, session_id):
+        return db.session.query(
+            ChatMessage.query.filter_by(session_id=session_id, sender='agent').exists()
+        ).scalar()
+
+    def list_sessions(self, status=None, email_contains=None, limit=None, offset=0):
+        """Sessions, newest activity first, with their summary fields.
+
+        Only chat_sessions is read - counts and the last-message preview are
+        kept on the session row by append_messages.
+        """
+        query = ChatSession.query
+        if status:
+            query = query.filter(ChatSession.status == status)
+        if email_contains:
+            query = query.filter(ChatSession.email.ilike(f'%{email_contains}%'))
+        query = query.order_by(ChatSession.updated_at.desc(), ChatSession.id.desc())
+        if offset:
+            query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        return [chat_session.to_dict() for chat_session in query.all()]
+
+    def delete_session(self, session_id):
+        chat_session = db.session.get(ChatSession, session_id)
+        if not chat_session:
+            return False
+        ChatMessage.query.filter_by(session_id=session_id).delete(synchronize_session=False)
+        db.session.delete(chat_session)
+        db.session.commit()
+        return True
+
+
+def _create_chat_store():
+    """Pick the backend from CHAT_STORAGE (sql | file)"""
+    backend = os.environ.get('CHAT_STORAGE', 'sql').lower()
+    if backend == 'file':
+        from utils.chat_file_store import FileChatStore
+        store = FileChatStore(compact_interval=int(os.environ.get('CHAT_COMPACT_INTERVAL', '3600')))
+        store.start_compactor()
+        print("✅ Chat storage: append-only files in data/chat")
+        return store
+    return SqlChatStore()
+
+
+chat_store = _create_chat_store()
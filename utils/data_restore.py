@@ -0,0 +1,324 @@
+"""
+Set-based restore of a data export (data_export/shipments.*, status_logs.*)
+
+Shared by restore_data.py and import_to_render.py. Instead of one lookup per
+shipment and one existence query per status log, the export is loaded into
+temporary staging tables - COPY on PostgreSQL, executemany elsewhere - and
+merged with a handful of statements:
+
+    shipments    INSERT ... SELECT ... ON CONFLICT DO NOTHING (tracking_number
+                 and id are unique, so existing shipments are skipped), or
+                 with ``update_existing`` ON CONFLICT (tracking_number) DO
+                 UPDATE, so an incremental export (export_local_data.py
+                 --since) also brings edits to shipments already present
+    status_logs  joined to shipments on tracking_number for shipment_id,
+                 skipping logs already present (same shipment, status and
+                 timestamp) and repeats within the export
+
+Everything runs in one transaction, then the status summary is reconciled
+(utils/status_summary.py). restore_export() returns counts and per-phase
+timings so runs can be compared. Deletions are never propagated: a shipment
+deleted at the source stays in the target until removed by hand.
+"""
+import gzip
+import io
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import text
+
+from models.shipment import db
+from utils.schema_registry import schema_registry
+from utils.shipment_bulk import REQUIRED_SHIPMENT_FIELDS
+from utils.status_summary import reconcile_status_summary
+
+# Rows per COPY buffer / executemany batch
+STAGING_BATCH = 10000
+
+SHIPMENT_COLUMNS = ['id', 'tracking_number', 'sender_name', 'sender_email', 'sender_phone', 'sender_address',
+                    'receiver_name', 'receiver_phone', 'receiver_address', 'package_type', 'weight',
+                    'shipment_cost', 'date_registered', 'estimated_delivery_date', 'status',
+                    'current_location', 'pdf_url', 'qr_url', 'created_by', 'created_by_email', 'updated_at']
+STATUS_LOG_COLUMNS = ['id', 'status', 'timestamp', 'location', 'coordinates', 'note']
+
+# Export files find_export() looks for (export_local_data.py writes NDJSON)
+EXPORT_EXTENSIONS = ('.ndjson.gz', '.ndjson', '.json')
+
+SHIPMENT_STAGING = 'restore_shipments'
+STATUS_LOG_STAGING = 'restore_status_logs'
+
+
+def _parse_datetime(value, local=False):
+    """ISO timestamp from an export as a naive datetime, None if missing or malformed.
+
+    Shipment dates drop their offset; status log timestamps (``local``) are
+    converted to server local time first, as the original importers did.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo:
+        if local:
+            parsed = parsed.astimezone(datetime.now().astimezone().tzinfo)
+        parsed = parsed.replace(tzinfo=None)
+    return parsed
+
+
+def find_export(export_dir, name):
+    """Newest ``name`` export in ``export_dir`` (NDJSON, gzipped NDJSON or JSON), or None"""
+    paths = [os.path.join(export_dir, name + extension) for extension in EXPORT_EXTENSIONS]
+    paths = [path for path in paths if os.path.exists(path)]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def load_export(path):
+    """Records from an export file: NDJSON (optionally .gz) streamed line by line, else a JSON array"""
+    opener = gzip.open if path.endswith('.gz') else open
+    if not path.endswith(('.ndjson', '.ndjson.gz', '.jsonl', '.jsonl.gz')):
+        with opener(path, 'rt', encoding='utf-8') as f:
+            yield from json.load(f)
+        return
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def shipment_rows(records, now):
+    """Staging rows for the exported shipments; returns (rows, invalid count)"""
+    rows = []
+    invalid = 0
+    for data in records:
+        if not isinstance(data, dict) or not data.get('tracking_number') or any(
+                data.get(field) is None for field in REQUIRED_SHIPMENT_FIELDS):
+            invalid += 1
+            continue
+        rows.append({
+            'id': data.get('id') or str(uuid.uuid4()),
+            'tracking_number': data['tracking_number'],
+            'sender_name': data['sender_name'],
+            'sender_email': data['sender_email'],
+            'sender_phone': data['sender_phone'],
+            'sender_address': data['sender_address'],
+            'receiver_name': data['receiver_name'],
+            'receiver_phone': data['receiver_phone'],
+            'receiver_address': data['receiver_address'],
+            'package_type': data['package_type'],
+            'weight': data['weight'],
+            'shipment_cost': data.get('shipment_cost') if data.get('shipment_cost') is not None else 0.0,
+            'date_registered': _parse_datetime(data.get('date_registered')) or now,
+            'estimated_delivery_date': _parse_datetime(data.get('estimated_delivery_date')),
+            'status': data.get('status') or 'Registered',
+            'current_location': data.get('current_location'),
+            'pdf_url': data.get('pdf_url'),
+            'qr_url': data.get('qr_url'),
+            'created_by': data.get('created_by'),
+            'created_by_email': data.get('created_by_email'),
+            'updated_at': now
+        })
+    return rows, invalid
+
+
+def status_log_rows(records, now):
+    """Staging rows for the exported status logs; returns (rows, invalid count)"""
+    rows = []
+    invalid = 0
+    for data in records:
+        if not isinstance(data, dict) or not data.get('tracking_number') or not data.get('status'):
+            invalid += 1
+            continue
+        rows.append({
+            'id': str(uuid.uuid4()),
+            'tracking_number': data['tracking_number'],
+            'status': data['status'],
+            'timestamp': _parse_datetime(data.get('timestamp'), local=True) or now,
+            'location': data.get('location'),
+            'coordinates': data.get('coordinates'),
+            'note': data.get('note'),
+            'seq': len(rows)
+        })
+    return rows, invalid
+
+
+def _copy_value(value):
+    """One field in COPY CSV format: unquoted empty is NULL, everything else quoted"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        value = value.isoformat(sep=' ')
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _stage(connection, table, columns, rows):
+    """Load ``rows`` into the staging ``table`` in batches"""
+    columns_str = ', '.join(f'"{col}"' for col in columns)
+    if connection.dialect.name == 'postgresql':
+        cursor = connection.connection.cursor()
+        try:
+            for start in range(0, len(rows), STAGING_BATCH):
+                buffer = io.StringIO()
+                for row in rows[start:start + STAGING_BATCH]:
+                    buffer.write(','.join(_copy_value(row[col]) for col in columns))
+                    buffer.write('\n')
+                buffer.seek(0)
+                cursor.copy_expert(f'COPY {table} ({columns_str}) FROM STDIN WITH (FORMAT csv)', buffer)
+        finally:
+            cursor.close()
+        return
+    statement = text(f'INSERT INTO {table} ({columns_str}) VALUES ({", ".join(f":{col}" for col in columns)})')
+    for start in range(0, len(rows), STAGING_BATCH):
+        connection.execute(statement, [{col: row[col] for col in columns} for row in rows[start:start + STAGING_BATCH]])
+
+
+def _drop_staging(connection):
+    for table in (SHIPMENT_STAGING, STATUS_LOG_STAGING):
+        connection.execute(text(f'DROP TABLE IF EXISTS {table}'))
+
+
+def restore_export(shipments_path, logs_path=None, replace=False, update_existing=False):
+    """Merge an export into the database; returns a report dict.
+
+    ``replace`` deletes every shipment and status log first (same
+    transaction). ``update_existing`` overwrites shipments that are already
+    present with their exported values instead of skipping them. Needs an
+    app context; commits on success and rolls back on error.
+    """
+    timings = {}
+    report = {'timings': timings}
+    started = phase_started = time.perf_counter()
+
+    def lap(name):
+        nonlocal phase_started
+        now = time.perf_counter()
+        timings[name] = now - phase_started
+        phase_started = now
+
+    now = datetime.utcnow()
+    shipments, report['shipments_invalid'] = shipment_rows(load_export(shipments_path), now)
+    # One row per tracking number (the first), so an upsert never touches a row twice
+    unique = {}
+    for row in shipments:
+        unique.setdefault(row['tracking_number'], row)
+    report['shipments_duplicate'] = len(shipments) - len(unique)
+    shipments = list(unique.values())
+    logs, report['logs_invalid'] = status_log_rows(load_export(logs_path), now) if logs_path else ([], 0)
+    report['shipments_in_export'] = len(shipments) + report['shipments_duplicate'] + report['shipments_invalid']
+    report['logs_in_export'] = len(logs) + report['logs_invalid']
+    lap('parse')
+
+    db_columns = schema_registry.columns('shipments')
+    shipment_columns = [col for col in SHIPMENT_COLUMNS if col in db_columns]
+    log_columns = [col for col in STATUS_LOG_COLUMNS if col in schema_registry.columns('status_logs')]
+    columns_str = ', '.join(f'"{col}"' for col in shipment_columns)
+    log_columns_str = ', '.join(f'"{col}"' for col in log_columns)
+
+    connection = db.session.connection()
+    try:
+        if replace:
+            report['logs_deleted'] = connection.execute(text('DELETE FROM status_logs')).rowcount
+            report['shipments_deleted'] = connection.execute(text('DELETE FROM shipments')).rowcount
+            lap('clear')
+
+        # Staging tables take their column types from the live tables
+        _drop_staging(connection)
+        connection.execute(text(
+            f'CREATE TEMPORARY TABLE {SHIPMENT_STAGING} AS SELECT {columns_str} FROM shipments WHERE 1 = 0'
+        ))
+        connection.execute(text(
+            f'CREATE TEMPORARY TABLE {STATUS_LOG_STAGING} AS '
+            f'SELECT {", ".join(f"l.{col}" for col in log_columns)}, s.tracking_number, 0 AS seq '
+            f'FROM status_logs l JOIN shipments s ON s.id = l.shipment_id WHERE 1 = 0'
+        ))
+        _stage(connection, SHIPMENT_STAGING, shipment_columns, shipments)
+        _stage(connection, STATUS_LOG_STAGING, log_columns + ['tracking_number', 'seq'], logs)
+        connection.execute(text(f'CREATE INDEX ix_{STATUS_LOG_STAGING}_key ON {STATUS_LOG_STAGING} '
+                                f'(tracking_number, status, timestamp, seq)'))
+        lap('stage')
+
+        present = connection.execute(text(
+            f'SELECT COUNT(*) FROM {SHIPMENT_STAGING} r JOIN shipments s ON s.tracking_number = r.tracking_number'
+        )).scalar()
+        if update_existing:
+            # Only rows whose exported values differ are written (and get a new updated_at)
+            distinct = 'IS DISTINCT FROM' if connection.dialect.name == 'postgresql' else 'IS NOT'
+            updated_columns = [col for col in shipment_columns if col not in ('id', 'tracking_number', 'updated_at')]
+            assignments = ', '.join(f'"{col}" = excluded."{col}"' for col in updated_columns)
+            if 'updated_at' in shipment_columns:
+                assignments += ', "updated_at" = excluded."updated_at"'
+            changed = ' OR '.join(f'shipments."{col}" {distinct} excluded."{col}"' for col in updated_columns)
+            conflict = f'ON CONFLICT (tracking_number) DO UPDATE SET {assignments} WHERE {changed}'
+        else:
+            conflict = 'ON CONFLICT DO NOTHING'
+        # WHERE true keeps SQLite from reading ON CONFLICT as a join constraint
+        written = connection.execute(text(f"""
+            INSERT INTO shipments ({columns_str})
+            SELECT {columns_str} FROM {SHIPMENT_STAGING} WHERE true
+            {conflict}
+        """)).rowcount
+        report['shipments_present'] = present
+        report['update_existing'] = update_existing
+        report['shipments_imported'] = len(shipments) - present if update_existing else written
+        report['shipments_updated'] = written - report['shipments_imported'] if update_existing else 0
+        report['shipments_skipped'] = len(shipments) + report['shipments_duplicate'] \
+            - report['shipments_imported'] - report['shipments_updated']
+        lap('merge_shipments')
+
+        # Repeats within the export: keep the first occurrence
+        report['logs_duplicate'] = connection.execute(text(f"""
+            DELETE FROM {STATUS_LOG_STAGING} WHERE EXISTS (
+                SELECT 1 FROM {STATUS_LOG_STAGING} earlier
+                WHERE earlier.tracking_number = {STATUS_LOG_STAGING}.tracking_number
+                  AND earlier.status = {STATUS_LOG_STAGING}.status
+                  AND earlier.timestamp = {STATUS_LOG_STAGING}.timestamp
+                  AND earlier.seq < {STATUS_LOG_STAGING}.seq
+            )
+        """)).rowcount
+        report['logs_imported'] = connection.execute(text(f"""
+            INSERT INTO status_logs ({log_columns_str}, shipment_id)
+            SELECT {", ".join(f"r.{col}" for col in log_columns)}, s.id
+            FROM {STATUS_LOG_STAGING} r
+            JOIN shipments s ON s.tracking_number = r.tracking_number
+            WHERE NOT EXISTS (
+                SELECT 1 FROM status_logs l
+                WHERE l.shipment_id = s.id AND l.timestamp = r.timestamp AND l.status = r.status
+            )
+            ON CONFLICT DO NOTHING
+        """)).rowcount
+        report['logs_skipped'] = len(logs) - report['logs_imported']
+        lap('merge_status_logs')
+
+        _drop_staging(connection)
+        report['summaries_reconciled'] = reconcile_status_summary() if report['logs_imported'] else 0
+        lap('reconcile')
+
+        db.session.commit()
+        lap('commit')
+    except Exception:
+        db.session.rollback()
+        raise
+    report['total'] = time.perf_counter() - started
+    return report
+
+
+def print_report(report):
+    """Counts and per-phase timings, in the scripts' output style"""
+    updated = f"{report['shipments_updated']} updated, " if report['shipments_updated'] else ''
+    print(f"   ✅ Shipments: {report['shipments_imported']} imported, {updated}{report['shipments_skipped']} skipped "
+          f"(unchanged, already present or repeated), {report['shipments_invalid']} invalid "
+          f"of {report['shipments_in_export']}")
+    print(f"   ✅ Status logs: {report['logs_imported']} imported, {report['logs_skipped']} skipped "
+          f"(duplicate or shipment not found), {report['logs_invalid']} invalid of {report['logs_in_export']}")
+    if report['shipments_present'] and not report['update_existing']:
+        print(f"   ⚠️  {report['shipments_present']} shipments already present were left unchanged - "
+              f"restore with --update-existing (import_to_render.py: 'update') to apply their edits")
+    if 'shipments_deleted' in report:
+        print(f"   🗑️  Replaced {report['shipments_deleted']} shipments and {report['logs_deleted']} status logs")
+    print(f"   ⏱️  Restore took {report['total']:.2f}s")
+    for phase, seconds in report['timings'].items():
+        print(f"      {phase:<18} {seconds:8.3f}s")
@@ -0,0 +1,42 @@
+"""
+Cross-process file locks for the JSON/JSONL stores in data/
+
+Gunicorn runs several worker processes, so in-process locks alone don't stop
+two workers from writing the same file. These helpers take an flock on a
+sidecar lock file; on platforms without fcntl (Windows dev machines) they
+fall back to a per-path in-process lock.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines - fall back to in-process locking only
+    fcntl = None
+
+_fallback_locks = {}
+_fallback_guard = threading.Lock()
+
+
+def _fallback_lock(lock_path):
+    with _fallback_guard:
+        return _fallback_locks.setdefault(os.path.abspath(lock_path), threading.RLock())
+
+
+@contextmanager
+def file_lock(lock_path, shared=False):
+    """Hold an exclusive (or shared) lock on ``lock_path`` for the duration of the block"""
+    if fcntl is None:
+        with _fallback_lock(lock_path):
+            yield
+        return
+    lock_dir = os.path.dirname(lock_path)
+    if lock_dir:
+        os.makedirs(lock_dir, exist_ok=True)
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,81 @@
+"""
+Conditional GET for the tracking and shipment detail endpoints
+
+Validators come from shipments.updated_at, which is bumped by every write to
+the shipment row and, through the before_flush hook in models/status_log.py,
+by every status log change. Checking them is a single read through the
+tracking_number (or primary key) index, so a 304 never loads or serializes
+the status history.
+"""
+import hashlib
+from datetime import datetime
+
+from flask import request
+
+from utils.schema_registry import schema_registry
+from utils.sql_statements import statements
+
+
+def touch_clause(params):
+    """``, updated_at = :updated_at`` for a raw UPDATE of shipments (adding the value to
+    ``params``), or '' while the column hasn't been migrated in yet"""
+    if not schema_registry.has_column('shipments', 'updated_at'):
+        return ''
+    params['updated_at'] = datetime.utcnow()
+    return ', updated_at = :updated_at'
+
+
+def shipment_marker(tracking_number):
+    """(id, updated_at) of the shipment, or None if it doesn't exist.
+
+    updated_at is None while the column hasn't been migrated in yet.
+    """
+    if not schema_registry.has_column('shipments', 'updated_at'):
+        row = statements.execute(
+            'SELECT id FROM shipments WHERE tracking_number = :tracking_number', {'tracking_number': tracking_number}
+        ).first()
+        return (row[0], None) if row else None
+    row = statements.execute(
+        'SELECT id, updated_at FROM shipments WHERE tracking_number = :tracking_number', {'tracking_number': tracking_number}
+    ).first()
+    return (row[0], row[1]) if row else None
+
+
+def _as_datetime(value):
+    # SQLite hands raw-SQL timestamps back as strings
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return value
+
+
+def validators(representation, shipment_id, updated_at):
+    """(etag, last_modified) for one representation of a shipment, or (None, None)"""
+    last_modified = _as_datetime(updated_at)
+    if last_modified is None:
+        return None, None
+    etag = hashlib.sha1(f'{representation}:{shipment_id}:{last_modified.isoformat()}'.encode()).hexdigest()[:20]
+    return etag, last_modified
+
+
+def not_modified(etag, last_modified):
+    """True if the request's If-None-Match / If-Modified-Since still match"""
+    if etag is None:
+        return False
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since is not None:
+        # HTTP dates have one-second resolution
+        return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def with_validators(response, etag, last_modified):
+    """Attach ETag / Last-Modified and make clients revalidate before reuse"""
+    if etag is not None:
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
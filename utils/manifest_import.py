@@ -0,0 +1,237 @@
+"""
+Streaming shipment manifest import (CSV or NDJSON)
+
+The manifest is read one record at a time and registered in chunks of
+BULK_INSERT_CHUNK rows (utils/shipment_bulk.py): custom tracking numbers are
+checked with one IN lookup per chunk, the rest are generated, and each chunk
+is one multi-row INSERT committed together with the job's progress. Invalid
+rows are skipped and recorded on the job (first MAX_JOB_ERRORS kept), so
+one bad line never sinks a whole manifest.
+
+Used by POST /api/shipments/imports (background thread, poll
+GET /api/shipments/imports/<job_id>) and by import_manifest.py (CLI).
+CSV columns / NDJSON keys are the create_shipment fields.
+"""
+import csv
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from models.shipment import db
+from models.import_job import ImportJob
+from utils import shipment_bulk
+
+MANIFEST_FORMATS = ('csv', 'ndjson')
+MAX_JOB_ERRORS = 500
+# Retries of a chunk whose INSERT hit a tracking number registered concurrently
+INSERT_ATTEMPTS = 3
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('MANIFEST_IMPORT_WORKERS', '1')), thread_name_prefix='manifest-import'
+)
+
+
+def detect_format(filename=None, content_type=None, requested=None):
+    """'csv' or 'ndjson' from an explicit choice, the file extension or the content type"""
+    if requested:
+        requested = requested.lower()
+        return requested if requested in MANIFEST_FORMATS else None
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    content_type = (content_type or '').lower()
+    if 'csv' in content_type:
+        return 'csv'
+    if 'ndjson' in content_type or 'jsonl' in content_type:
+        return 'ndjson'
+    return None
+
+
+def iter_manifest(stream, fmt):
+    """Yield (line number, record dict or None, error or None) from a binary stream"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            record = {(key or '').strip(): value.strip() if isinstance(value, str) else value
+                      for key, value in record.items() if key}
+            if not any(record.values()):
+                continue
+            yield reader.line_num, record, None
+        return
+    for line_number, line in enumerate(text, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, 'Each line must be a JSON object'
+            continue
+        yield line_number, record, None
+
+
+class _ImportRun:
+    """State of one import while it streams through a manifest"""
+
+    def __init__(self, job):
+        self.job = job
+        # Counted here and copied onto the job by save(), so a rolled-back
+        # chunk doesn't lose the progress recorded before it
+        self.processed = self.imported = self.failed = 0
+        self.errors = []
+        self.chunk = []  # (line number, row)
+        self.chunk_numbers = set()  # custom tracking numbers in self.chunk
+
+    def fail_row(self, line_number, tracking_number, error):
+        self.failed += 1
+        if len(self.errors) < MAX_JOB_ERRORS:
+            self.errors.append({'line': line_number, 'tracking_number': tracking_number, 'error': error})
+
+    def add(self, line_number, row):
+        tracking_number = row['tracking_number']
+        if tracking_number in self.chunk_numbers:
+            self.fail_row(line_number, tracking_number, 'Duplicate tracking number in manifest')
+            return
+        if tracking_number:
+            self.chunk_numbers.add(tracking_number)
+        self.chunk.append((line_number, row))
+        if len(self.chunk) >= shipment_bulk.BULK_INSERT_CHUNK:
+            self.flush()
+
+    def flush(self):
+        """Insert the buffered rows and commit them with the job's progress"""
+        chunk, self.chunk = self.chunk, []
+        # Earlier chunks are already committed, so this also catches repeats across the file
+        taken = shipment_bulk.existing_tracking_numbers(self.chunk_numbers)
+        self.chunk_numbers = set()
+        rows = []
+        for line_number, row in chunk:
+            if row['tracking_number'] in taken:
+                self.fail_row(line_number, row['tracking_number'], 'Tracking number already exists')
+            else:
+                rows.append((line_number, row))
+        receipts = []
+        if rows:
+            receipts = self._insert(rows)
+            self.imported += len(rows)
+            try:
+                self.save()
+            except Exception:
+                self.imported -= len(rows)
+                raise
+        else:
+            self.save()
+        shipment_bulk.queue_receipts(receipts)
+        print(f"   Import {self.job.id}: {self.imported} imported, {self.failed} failed of {self.processed} rows")
+
+    def _insert(self, rows):
+        """INSERT ``rows``, failing only those whose tracking number was taken concurrently.
+
+        Removes the failed entries from ``rows``; returns the receipts to queue.
+        """
+        # Generated numbers can be re-drawn on collision; manifest-supplied ones can't
+        custom = {line_number for line_number, row in rows if row['tracking_number']}
+        for attempt in range(INSERT_ATTEMPTS):
+            shipment_bulk.assign_tracking_numbers([row for _, row in rows])
+            try:
+                return shipment_bulk.insert_shipments([row for _, row in rows])
+            except IntegrityError:
+                db.session.rollback()
+            # Another writer registered some of these numbers since the chunk was checked
+            taken = shipment_bulk.existing_tracking_numbers(row['tracking_number'] for _, row in rows)
+            if not taken or attempt == INSERT_ATTEMPTS - 1:
+                break
+            kept = []
+            for line_number, row in rows:
+                if row['tracking_number'] not in taken:
+                    kept.append((line_number, row))
+                elif line_number in custom:
+                    self.fail_row(line_number, row['tracking_number'], 'Tracking number was registered concurrently')
+                else:
+                    row['tracking_number'] = None
+                    kept.append((line_number, row))
+            rows[:] = kept
+            if not rows:
+                return []
+        # Still failing with no tracking number to blame - record the chunk, keep going
+        for line_number, row in rows:
+            self.fail_row(line_number, row['tracking_number'], 'Chunk could not be inserted')
+        rows.clear()
+        return []
+
+    def save(self, **fields):
+        """Commit the pending chunk together with the job's counters (and ``fields``)"""
+        self.job.rows_processed = self.processed
+        self.job.rows_imported = self.imported
+        self.job.rows_failed = self.failed
+        self.job.errors = json.dumps(self.errors)
+        for name, value in fields.items():
+            setattr(self.job, name, value)
+        db.session.commit()
+
+
+def run_import(job_id, path, delete_file=False):
+    """Stream the manifest at ``path`` into shipments, recording progress on the job.
+
+    Needs an app context. Returns the finished ImportJob.
+    """
+    job = db.session.get(ImportJob, job_id)
+    job.status = 'running'
+    job.started_at = datetime.utcnow()
+    db.session.commit()
+    run = _ImportRun(job)
+    try:
+        with open(path, 'rb') as stream:
+            now = datetime.utcnow()
+            for line_number, record, error in iter_manifest(stream, job.format):
+                run.processed += 1
+                if error is None:
+                    row, error = shipment_bulk.build_shipment_row(record, now, job.created_by, job.created_by_email)
+                if error:
+                    run.fail_row(line_number, (record or {}).get('tracking_number'), error)
+                    continue
+                run.add(line_number, row)
+        run.flush()
+        run.save(status='completed', finished_at=datetime.utcnow())
+        print(f"✅ Manifest import {job.id} completed: {run.imported} imported, {run.failed} failed")
+    except Exception as e:
+        db.session.rollback()
+        run.save(status='failed', message=str(e), finished_at=datetime.utcnow())
+        print(f"❌ Manifest import {job_id} failed: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        if delete_file:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return job
+
+
+def create_job(source, fmt, created_by=None, created_by_email=None):
+    job = ImportJob(source=source, format=fmt, created_by=created_by, created_by_email=created_by_email)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def start_import(app, job_id, path):
+    """Run the import on the background pool; the spooled file is removed afterwards"""
+    def work():
+        with app.app_context():
+            try:
+                run_import(job_id, path, delete_file=True)
+            finally:
+                db.session.remove()
+    return _executor.submit(work)
@@ -1,6 +1,29 @@
 from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
+from datetime import datetime
+import qrcode
+import hashlib
+import io
+import json
 import os
+import re
+import tempfile
+
+PDF_DIR = os.path.join('static', 'pdfs')
+
+# Bump when the layout changes so every cached receipt is re-rendered
+RECEIPT_LAYOUT_VERSION = 2
+
+# Page the receipt QR code points to
+TRACKING_URL_TEMPLATE = os.environ.get('TRACKING_URL_TEMPLATE', 'https://dmllogistics.com/track?tracking={tracking_number}')
+
+# Shipment fields drawn on the receipt - the receipt hash covers exactly these
+RECEIPT_FIELDS = (
+    'tracking_number', 'sender_name', 'sender_email', 'sender_phone', 'sender_address',
+    'receiver_name', 'receiver_phone', 'receiver_address', 'package_type', 'weight',
+    'shipment_cost', 'status', 'estimated_delivery_date', 'date_registered'
+)
 
 def wrap_text(text, max_chars=43):
     """Wrap text to multiple lines if longer than max_chars"""
@@ -33,88 +56,167 @@ def wrap_text(text, max_chars=43):
     
     return lines if lines else [text]
 
-def generate_pdf_receipt(shipment):
-    """Generate PDF receipt for a shipment object"""
-    try:
-        # Create static/pdfs directory if it doesn't exist
-        pdf_dir = os.path.join('static', 'pdfs')
-        if not os.path.exists(pdf_dir):
-            os.makedirs(pdf_dir)
-        
-        # Generate filename
-        filename = f"{shipment.tracking_number}.pdf"
-        file_path = os.path.join(pdf_dir, filename)
-        
-        # Create PDF
-        c = canvas.Canvas(file_path, pagesize=letter)
-        c.setFont("Helvetica", 12)
-
-        # Title
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(100, 800, "SHIPMENT RECEIPT")
-        c.setFont("Helvetica", 12)
-
-        # Tracking Number
-        c.drawString(100, 780, f"Tracking Number: {shipment.tracking_number}")
-
-        # Sender Info
-        y_pos = 760
-        c.drawString(100, y_pos, f"Sender Name: {shipment.sender_name}")
-        y_pos -= 15
-        c.drawString(100, y_pos, f"Sender Email: {shipment.sender_email}")
-        y_pos -= 15
-        c.drawString(100, y_pos, f"Sender Phone: {shipment.sender_phone}")
-        y_pos -= 15
-        
-        # Wrap sender address
-        sender_address_lines = wrap_text(str(shipment.sender_address))
-        c.drawString(100, y_pos, "Sender Address:")
-        y_pos -= 15
-        for line in sender_address_lines:
-            c.drawString(120, y_pos, line)
-            y_pos -= 15
+def _format_date(value, fmt):
+    """Format a datetime; raw SQL on SQLite hands back ISO strings instead"""
+    if not value:
+        return ''
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return value
+    return value.strftime(fmt)
 
-        # Receiver Info
-        y_pos -= 10  # Add spacing
-        c.drawString(100, y_pos, f"Receiver Name: {shipment.receiver_name}")
-        y_pos -= 15
-        c.drawString(100, y_pos, f"Receiver Phone: {shipment.receiver_phone}")
-        y_pos -= 15
-        
-        # Wrap receiver address
-        receiver_address_lines = wrap_text(str(shipment.receiver_address))
-        c.drawString(100, y_pos, "Receiver Address:")
-        y_pos -= 15
-        for line in receiver_address_lines:
-            c.drawString(120, y_pos, line)
-            y_pos -= 15
+def receipt_fields(shipment):
+    """Plain-string snapshot of what the receipt shows.
 
-        # Package Info (adjust Y position based on address wrapping)
-        y_pos -= 10  # Add spacing
-        c.drawString(100, y_pos, f"Package Type: {shipment.package_type}")
-        y_pos -= 15
-        c.drawString(100, y_pos, f"Weight: {shipment.weight} kg")
+    Accepts a Shipment, a result row or a dict, so callers don't need to build
+    a model object just to render.
+    """
+    if isinstance(shipment, dict):
+        get = shipment.get
+    elif hasattr(shipment, '_mapping'):
+        get = shipment._mapping.get
+    else:
+        get = lambda name: getattr(shipment, name, None)
+    fields = {}
+    for name in RECEIPT_FIELDS:
+        value = get(name)
+        if name == 'estimated_delivery_date':
+            fields[name] = _format_date(value, '%Y-%m-%d')
+        elif name == 'date_registered':
+            fields[name] = _format_date(value, '%Y-%m-%d %H:%M:%S')
+        else:
+            fields[name] = '' if value is None else str(value)
+    fields['status'] = fields['status'] or 'Registered'
+    # Part of the hash, so changing TRACKING_URL_TEMPLATE re-renders receipts
+    fields['tracking_url'] = tracking_url(fields['tracking_number'])
+    return fields
+
+def tracking_url(tracking_number):
+    return TRACKING_URL_TEMPLATE.format(tracking_number=tracking_number)
+
+def render_qr_png(url):
+    """PNG bytes of a QR code for ``url``"""
+    buffer = io.BytesIO()
+    qrcode.make(url, box_size=8, border=2).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def receipt_hash(fields):
+    """Content hash of a receipt - changes only when a rendered field does"""
+    payload = json.dumps({'layout': RECEIPT_LAYOUT_VERSION, 'fields': fields}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _safe_tracking(fields):
+    return re.sub(r'[^A-Za-z0-9_-]', '_', fields['tracking_number']) or 'receipt'
+
+def receipt_filename(fields, digest=None):
+    """``<tracking>-<hash prefix>.pdf`` (tracking number made filesystem-safe)"""
+    digest = digest or receipt_hash(fields)
+    return f"{_safe_tracking(fields)}-{digest[:16]}.pdf"
+
+def qr_filename(fields):
+    """``<tracking>_qr-<url hash>.png`` - stored next to the receipt"""
+    url_digest = hashlib.sha256(fields['tracking_url'].encode('utf-8')).hexdigest()
+    return f"{_safe_tracking(fields)}_qr-{url_digest[:8]}.png"
+
+def receipt_download_name(fields):
+    """``receipt-<tracking>.pdf`` - the name users see"""
+    return f"receipt-{_safe_tracking(fields)}.pdf"
+
+def draw_receipt(c, fields, qr_png=None):
+    """Draw one receipt page onto canvas ``c``.
+
+    ``qr_png`` is the tracking QR code (see utils/qr_cache.py); it is
+    generated here when the caller has no cached copy.
+    """
+    c.setFont("Helvetica", 12)
+
+    # Tracking QR code, top right
+    qr_png = qr_png or render_qr_png(fields['tracking_url'])
+    c.drawImage(ImageReader(io.BytesIO(qr_png)), 440, 640, width=120, height=120)
+    c.setFont("Helvetica", 9)
+    c.drawCentredString(500, 630, "Scan to track")
+    c.setFont("Helvetica", 12)
+
+    # Title
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(100, 800, "SHIPMENT RECEIPT")
+    c.setFont("Helvetica", 12)
+
+    # Tracking Number
+    c.drawString(100, 780, f"Tracking Number: {fields['tracking_number']}")
+
+    # Sender Info
+    y_pos = 760
+    c.drawString(100, y_pos, f"Sender Name: {fields['sender_name']}")
+    y_pos -= 15
+    c.drawString(100, y_pos, f"Sender Email: {fields['sender_email']}")
+    y_pos -= 15
+    c.drawString(100, y_pos, f"Sender Phone: {fields['sender_phone']}")
+    y_pos -= 15
+
+    # Wrap sender address
+    sender_address_lines = wrap_text(fields['sender_address'])
+    c.drawString(100, y_pos, "Sender Address:")
+    y_pos -= 15
+    for line in sender_address_lines:
+        c.drawString(120, y_pos, line)
         y_pos -= 15
-        c.drawString(100, y_pos, f"Shipment Cost: ${shipment.shipment_cost}")
 
-        # Status
+    # Receiver Info
+    y_pos -= 10  # Add spacing
+    c.drawString(100, y_pos, f"Receiver Name: {fields['receiver_name']}")
+    y_pos -= 15
+    c.drawString(100, y_pos, f"Receiver Phone: {fields['receiver_phone']}")
+    y_pos -= 15
+
+    # Wrap receiver address
+    receiver_address_lines = wrap_text(fields['receiver_address'])
+    c.drawString(100, y_pos, "Receiver Address:")
+    y_pos -= 15
+    for line in receiver_address_lines:
+        c.drawString(120, y_pos, line)
         y_pos -= 15
-        c.drawString(100, y_pos, f"Current Status: {shipment.status}")
-        if shipment.estimated_delivery_date:
-            y_pos -= 15
-            c.drawString(100, y_pos, f"Estimated Delivery: {shipment.estimated_delivery_date.strftime('%Y-%m-%d')}")
 
-        # Date
+    # Package Info (adjust Y position based on address wrapping)
+    y_pos -= 10  # Add spacing
+    c.drawString(100, y_pos, f"Package Type: {fields['package_type']}")
+    y_pos -= 15
+    c.drawString(100, y_pos, f"Weight: {fields['weight']} kg")
+    y_pos -= 15
+    c.drawString(100, y_pos, f"Shipment Cost: ${fields['shipment_cost']}")
+
+    # Status
+    y_pos -= 15
+    c.drawString(100, y_pos, f"Current Status: {fields['status']}")
+    if fields['estimated_delivery_date']:
         y_pos -= 15
-        if shipment.date_registered:
-            c.drawString(100, y_pos, f"Date Created: {shipment.date_registered.strftime('%Y-%m-%d %H:%M:%S')}")
-
-        c.save()
-        
-        # Return the relative path for storage in database
-        return f"static/pdfs/{filename}"
-        
-    except Exception as e:
-        print(f"Error generating PDF: {e}")
-        # Return a default path or None if PDF generation fails
-        return None
+        c.drawString(100, y_pos, f"Estimated Delivery: {fields['estimated_delivery_date']}")
+
+    # Date
+    y_pos -= 15
+    if fields['date_registered']:
+        c.drawString(100, y_pos, f"Date Created: {fields['date_registered']}")
+
+def render_receipt(fields, qr_png=None):
+    """Render a receipt to PDF bytes"""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    draw_receipt(c, fields, qr_png)
+    c.save()
+    return buffer.getvalue()
+
+def write_receipt_file(file_path, pdf_bytes):
+    """Write via a temp file + rename so readers never see a half-written PDF"""
+    directory = os.path.dirname(file_path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.receipt-', suffix='.pdf', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, file_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,56 @@
+"""
+Tracking QR codes, generated once per tracking number
+
+PNGs are kept in an in-process LRU (QR_CACHE_SIZE entries, default 512) and
+persisted in the receipt storage next to the receipt, so a restarted worker
+reads them back instead of re-encoding. Used when rendering receipts and by
+GET /api/shipments/<identifier>/qr.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from utils.pdf_generator import qr_filename, render_qr_png, tracking_url
+from utils.receipt_storage import receipt_storage
+
+
+class QrCodeCache:
+    """LRU of tracking URL -> PNG bytes in front of ``storage``"""
+
+    def __init__(self, storage, max_entries=512):
+        self.storage = storage
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def key_for(self, tracking_number):
+        return qr_filename({'tracking_number': tracking_number, 'tracking_url': tracking_url(tracking_number)})
+
+    def _remember(self, url, png):
+        with self._lock:
+            self._entries[url] = png
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_png(self, tracking_number):
+        """PNG bytes for a tracking number's QR code"""
+        url = tracking_url(tracking_number)
+        with self._lock:
+            png = self._entries.get(url)
+            if png is not None:
+                self._entries.move_to_end(url)
+                return png
+
+        key = self.key_for(tracking_number)
+        stored = self.storage.open(key)
+        if stored is not None:
+            png = b''.join(stored[1])
+        else:
+            png = render_qr_png(url)
+            self.storage.put(key, png, tracking_number)
+        self._remember(url, png)
+        return png
+
+
+qr_cache = QrCodeCache(receipt_storage, max_entries=int(os.environ.get('QR_CACHE_SIZE', '512')))
@@ -0,0 +1,135 @@
+"""
+Bulk receipt export (GET /api/shipments/receipts/export)
+
+Receipts are rendered on a process pool and streamed out as batches finish,
+so memory is bounded by the batches in flight, not by the size of the export:
+
+    stream_zip(fields_iter)       a ZIP with one receipt-<tracking>.pdf per shipment
+    stream_combined(fields_iter)  one multi-page PDF, drawn by a pool process into
+                                  a temp file and streamed back in chunks
+
+RECEIPT_EXPORT_PROCESSES (default: CPU count, at most 4) sizes the pool.
+"""
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from utils.pdf_generator import draw_receipt, render_receipt, receipt_download_name
+
+# Receipts per pool task - large enough to amortise pickling, small enough to stream steadily
+BATCH_SIZE = 25
+CHUNK_SIZE = 64 * 1024
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Process pool shared by all exports in this worker, created on first use"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None:
+            _pool_workers = int(os.environ.get('RECEIPT_EXPORT_PROCESSES', '0')) or min(os.cpu_count() or 1, 4)
+            # spawn, not fork: forking a threaded gunicorn worker can copy held locks into the child
+            _pool = ProcessPoolExecutor(max_workers=_pool_workers,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool, _pool_workers
+
+
+def render_batch(fields_batch):
+    """Pool task: render each receipt to PDF bytes"""
+    return [render_receipt(fields) for fields in fields_batch]
+
+
+def render_document(fields_list, path):
+    """Pool task: draw every receipt as a page of one PDF at ``path``"""
+    c = canvas.Canvas(path, pagesize=letter)
+    for fields in fields_list:
+        draw_receipt(c, fields)
+        c.showPage()
+    c.save()
+    return path
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable file that collects bytes until drained.
+
+    zipfile writes data descriptors instead of seeking back when the target
+    can't seek, which is what lets the archive be streamed.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(fields_iter):
+    """Yield a ZIP archive of receipts chunk by chunk"""
+    pool, workers = _get_pool()
+    max_in_flight = workers * 2
+    sink = _ChunkSink()
+    in_flight = deque()
+
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        def write_oldest():
+            batch, future = in_flight.popleft()
+            for fields, pdf_bytes in zip(batch, future.result()):
+                archive.writestr(receipt_download_name(fields), pdf_bytes)
+            return sink.drain()
+
+        for batch in _batches(fields_iter, BATCH_SIZE):
+            in_flight.append((batch, pool.submit(render_batch, batch)))
+            if len(in_flight) >= max_in_flight:
+                yield write_oldest()
+        while in_flight:
+            yield write_oldest()
+    # Central directory, written when the archive closes
+    yield sink.drain()
+
+
+def stream_combined(fields_iter):
+    """Yield one multi-page PDF of receipts chunk by chunk"""
+    pool, _ = _get_pool()
+    fd, path = tempfile.mkstemp(prefix='receipts-', suffix='.pdf')
+    os.close(fd)
+    try:
+        pool.submit(render_document, list(fields_iter), path).result()
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
@@ -0,0 +1,107 @@
+"""
+Background PDF receipt rendering with a content-addressed cache
+
+Receipts are stored under the key <tracking>-<hash>.pdf in the configured
+receipt storage (utils/receipt_storage.py), where the hash covers every field
+drawn on the page (see utils/pdf_generator.py). A receipt is only rendered
+again when one of those fields changes, and renders run on a small bounded
+thread pool instead of inside the request:
+
+    create_shipment  -> submit()  queues the render and returns immediately
+    GET .../pdf      -> get()     returns the stored key, or waits for the render
+
+RECEIPT_RENDER_WORKERS (default 2) caps concurrent renders and
+RECEIPT_RENDER_QUEUE (default 64) caps how many may be waiting.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from flask import current_app, has_app_context
+
+from utils.pdf_generator import receipt_hash, receipt_filename, render_receipt
+from utils.receipt_storage import receipt_storage
+from utils.qr_cache import qr_cache
+
+
+class ReceiptQueueFull(RuntimeError):
+    """Raised when the render queue is at capacity"""
+
+
+class ReceiptRenderer:
+    """Bounded render pool that writes receipts into ``storage``"""
+
+    def __init__(self, storage, max_workers=2, max_pending=64):
+        self.storage = storage
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='receipt-render')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending = {}  # receipt hash -> Future, so one receipt is never rendered twice at once
+
+    def key_for(self, fields, digest=None):
+        return receipt_filename(fields, digest)
+
+    def _render(self, app, fields, digest):
+        try:
+            # Storage backends may need the app (e.g. db.engine for RECEIPT_STORAGE=db)
+            with app.app_context() if app else nullcontext():
+                key = self.key_for(fields, digest)
+                if not self.storage.exists(key):
+                    qr_png = qr_cache.get_png(fields['tracking_number'])
+                    self.storage.put(key, render_receipt(fields, qr_png), fields['tracking_number'])
+                    self.storage.delete_stale(fields['tracking_number'], key)
+                return key
+        finally:
+            with self._lock:
+                self._pending.pop(digest, None)
+            self._slots.release()
+
+    def submit(self, fields, block=False, timeout=None):
+        """Queue a render of ``fields`` unless that version is cached or already queued.
+
+        Returns a Future resolving to the storage key, or None if the receipt
+        is already stored. Raises ReceiptQueueFull when the queue is at
+        capacity and ``block`` is False, or a slot didn't free up within
+        ``timeout`` seconds (None waits indefinitely).
+        """
+        digest = receipt_hash(fields)
+        with self._lock:
+            future = self._pending.get(digest)
+        if future is not None:
+            return future
+        if self.storage.exists(self.key_for(fields, digest)):
+            return None
+        acquired = self._slots.acquire(timeout=timeout) if block else self._slots.acquire(blocking=False)
+        if not acquired:
+            raise ReceiptQueueFull('Receipt render queue is full')
+        with self._lock:
+            future = self._pending.get(digest)
+            if future is not None:
+                self._slots.release()
+                return future
+            app = current_app._get_current_object() if has_app_context() else None
+            future = self._executor.submit(self._render, app, fields, digest)
+            self._pending[digest] = future
+        return future
+
+    def get(self, fields, timeout=30):
+        """Return the storage key of the current receipt, rendering it if needed.
+
+        ``timeout`` covers waiting for a queue slot and for the render together.
+        Raises ReceiptQueueFull if no slot frees up in time and
+        concurrent.futures.TimeoutError if the render doesn't finish in time.
+        """
+        deadline = time.monotonic() + timeout
+        future = self.submit(fields, block=True, timeout=timeout)
+        if future is None:
+            return self.key_for(fields)
+        return future.result(timeout=max(0, deadline - time.monotonic()))
+
+
+receipt_renderer = ReceiptRenderer(
+    receipt_storage,
+    max_workers=int(os.environ.get('RECEIPT_RENDER_WORKERS', '2')),
+    max_pending=int(os.environ.get('RECEIPT_RENDER_QUEUE', '64'))
+)
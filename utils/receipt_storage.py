@@ -0,0 +1,217 @@
+"""
+Where rendered PDF receipts live (RECEIPT_STORAGE)
+
+    local  - files under static/pdfs (default; lost on every Render deploy)
+    db     - rows in receipt_blobs with size and sha256 checksum, so receipts
+             survive redeploys without re-rendering
+    s3     - an S3-compatible bucket (RECEIPT_S3_BUCKET, optional
+             RECEIPT_S3_ENDPOINT for MinIO or another local stand-in);
+             needs boto3
+
+Receipts are addressed by key (``<tracking>-<hash prefix>.pdf``, see
+utils/pdf_generator.py). Every backend streams a receipt back as
+(size, iterator of byte chunks) so downloads never load or re-render the
+whole file in the request.
+"""
+import glob
+import hashlib
+import mimetypes
+import os
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from models.shipment import db
+from utils.pdf_generator import PDF_DIR, write_receipt_file
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _is_version_of(key, keep_key):
+    """True if ``key`` is another hash of the same tracking number as ``keep_key``"""
+    prefix = keep_key.rsplit('-', 1)[0]
+    return key != keep_key and re.fullmatch(re.escape(prefix) + r'-[0-9a-f]{16}\.pdf', key) is not None
+
+
+class LocalReceiptStorage:
+    """Receipts as files in a directory"""
+
+    def __init__(self, root=PDF_DIR):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def location(self, key):
+        return f"{self.root.replace(os.sep, '/')}/{key}"
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def put(self, key, data, tracking_number):
+        write_receipt_file(self._path(key), data)
+
+    def open(self, key):
+        """Return (size, chunk iterator), or None if the receipt isn't stored"""
+        path = self._path(key)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        size = os.fstat(f.fileno()).st_size
+
+        def chunks():
+            with f:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+
+        return size, chunks()
+
+    def delete_stale(self, tracking_number, keep_key):
+        """Remove older renders of the same receipt"""
+        prefix = keep_key.rsplit('-', 1)[0]
+        for path in glob.glob(os.path.join(glob.escape(self.root), f'{glob.escape(prefix)}-*.pdf')):
+            if _is_version_of(os.path.basename(path), keep_key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+class DatabaseReceiptStorage:
+    """Receipts as rows in receipt_blobs.
+
+    Uses engine connections rather than db.session so renders on the worker
+    pool never share a transaction with the request that queued them.
+    """
+
+    def location(self, key):
+        return f"db://receipt_blobs/{key}"
+
+    def exists(self, key):
+        with db.engine.connect() as conn:
+            return conn.execute(
+                text('SELECT 1 FROM receipt_blobs WHERE key = :key'), {'key': key}
+            ).first() is not None
+
+    def put(self, key, data, tracking_number):
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(
+                    text('''INSERT INTO receipt_blobs (key, tracking_number, content, size, checksum, created_at)
+                            VALUES (:key, :tracking_number, :content, :size, :checksum, CURRENT_TIMESTAMP)'''),
+                    {'key': key, 'tracking_number': tracking_number, 'content': data,
+                     'size': len(data), 'checksum': hashlib.sha256(data).hexdigest()}
+                )
+        except IntegrityError:
+            # Another worker stored the same render first - keys are content hashes
+            pass
+
+    def open(self, key):
+        """Return (size, chunk iterator), or None if the receipt isn't stored.
+
+        Chunks are read with SUBSTR (PostgreSQL bytea and SQLite BLOB both
+        support it), so the blob is never held in memory as a whole.
+        """
+        engine = db.engine
+        with engine.connect() as conn:
+            row = conn.execute(text('SELECT size FROM receipt_blobs WHERE key = :key'), {'key': key}).first()
+        if not row:
+            return None
+        size = row[0]
+
+        def chunks():
+            with engine.connect() as conn:
+                for start in range(1, size + 1, CHUNK_SIZE):
+                    yield bytes(conn.execute(
+                        text('SELECT SUBSTR(content, :start, :length) FROM receipt_blobs WHERE key = :key'),
+                        {'start': start, 'length': CHUNK_SIZE, 'key': key}
+                    ).scalar() or b'')
+
+        return size, chunks()
+
+    def delete_stale(self, tracking_number, keep_key):
+        """Remove older receipt PDFs for the tracking number (QR codes are kept)"""
+        with db.engine.begin() as conn:
+            conn.execute(
+                text("DELETE FROM receipt_blobs WHERE tracking_number = :tracking_number "
+                     "AND key != :key AND key LIKE '%.pdf'"),
+                {'tracking_number': tracking_number, 'key': keep_key}
+            )
+
+
+class S3ReceiptStorage:
+    """Receipts as objects in an S3-compatible bucket"""
+
+    def __init__(self, bucket, prefix='receipts/', endpoint_url=None):
+        import boto3  # Optional dependency - only needed for RECEIPT_STORAGE=s3
+        from botocore.exceptions import ClientError
+        self._client = boto3.client('s3', endpoint_url=endpoint_url)
+        self._client_error = ClientError
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def location(self, key):
+        return f"s3://{self.bucket}/{self.prefix}{key}"
+
+    def _head(self, key):
+        try:
+            return self._client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except self._client_error as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def exists(self, key):
+        return self._head(key) is not None
+
+    def put(self, key, data, tracking_number):
+        # Receipts (.pdf) and their QR codes (.png, utils/qr_cache.py) share the bucket
+        content_type = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+        self._client.put_object(
+            Bucket=self.bucket, Key=self.prefix + key, Body=data, ContentType=content_type,
+            Metadata={'tracking-number': tracking_number, 'sha256': hashlib.sha256(data).hexdigest()}
+        )
+
+    def open(self, key):
+        """Return (size, chunk iterator), or None if the receipt isn't stored"""
+        try:
+            obj = self._client.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        except self._client_error as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return obj['ContentLength'], obj['Body'].iter_chunks(CHUNK_SIZE)
+
+    def delete_stale(self, tracking_number, keep_key):
+        prefix = keep_key.rsplit('-', 1)[0]
+        listing = self._client.list_objects_v2(Bucket=self.bucket, Prefix=f'{self.prefix}{prefix}-')
+        for obj in listing.get('Contents', []):
+            if _is_version_of(obj['Key'][len(self.prefix):], keep_key):
+                self._client.delete_object(Bucket=self.bucket, Key=obj['Key'])
+
+
+def _create_receipt_storage():
+    """Pick the backend from RECEIPT_STORAGE (local | db | s3)"""
+    backend = os.environ.get('RECEIPT_STORAGE', 'local').lower()
+    if backend == 'db':
+        print("✅ Receipt storage: database (receipt_blobs)")
+        return DatabaseReceiptStorage()
+    if backend == 's3':
+        bucket = os.environ.get('RECEIPT_S3_BUCKET')
+        if not bucket:
+            raise RuntimeError('RECEIPT_STORAGE=s3 requires RECEIPT_S3_BUCKET')
+        print(f"✅ Receipt storage: S3 bucket {bucket}")
+        return S3ReceiptStorage(
+            bucket,
+            prefix=os.environ.get('RECEIPT_S3_PREFIX', 'receipts/'),
+            endpoint_url=os.environ.get('RECEIPT_S3_ENDPOINT') or None
+        )
+    return LocalReceiptStorage()
+
+
+receipt_storage = _create_receipt_storage()
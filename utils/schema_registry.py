@@ -0,0 +1,83 @@
+"""
+Cached column lists for the tables written with raw SQL
+
+create_shipment / update_shipment only insert or update columns that exist
+in the deployed database (older databases may miss created_by,
+current_location, ...). Instead of inspecting the catalog on every request,
+the column lists of shipments and status_logs are loaded once and reused.
+
+Migration scripts call mark_schema_changed() after altering a table. That
+touches data/schema.version; every worker compares the marker's mtime on
+access (one stat, like utils/user_store.py) and reloads when it changed.
+"""
+import os
+import threading
+
+from sqlalchemy import inspect
+
+from models.shipment import db
+
+SCHEMA_MARKER = os.path.join('data', 'schema.version')
+REGISTERED_TABLES = ('shipments', 'status_logs')
+
+
+class SchemaRegistry:
+    """Column names per table, loaded from the live database once"""
+
+    def __init__(self, tables=REGISTERED_TABLES, marker_path=SCHEMA_MARKER):
+        self.tables = tables
+        self.marker_path = marker_path
+        self._lock = threading.Lock()
+        self._columns = {}
+        self._marker = None
+
+    def _marker_signature(self):
+        try:
+            return os.stat(self.marker_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self):
+        """(Re)load every registered table's columns (needs an app context)"""
+        with self._lock:
+            marker = self._marker_signature()
+            inspector = inspect(db.engine)
+            existing = set(inspector.get_table_names())
+            self._columns = {
+                table: tuple(col['name'] for col in inspector.get_columns(table)) if table in existing else ()
+                for table in self.tables
+            }
+            self._marker = marker
+        print(f"✅ Schema registry loaded: {', '.join(f'{t} ({len(c)} columns)' for t, c in self._columns.items())}")
+
+    def columns(self, table):
+        """Column names of ``table`` in table order"""
+        if not self._columns or self._marker_signature() != self._marker:
+            self.load()
+        return self._columns.get(table, ())
+
+    def generation(self):
+        """Changes whenever a migration marks the schema changed"""
+        if self._marker_signature() != self._marker:
+            self.load()
+        return self._marker
+
+    def has_column(self, table, column):
+        return column in self.columns(table)
+
+    def invalidate(self):
+        """Forget the cached columns in this process; the next access reloads"""
+        with self._lock:
+            self._columns = {}
+
+
+schema_registry = SchemaRegistry()
+
+
+def mark_schema_changed():
+    """Called by migration scripts: invalidate here and signal other workers"""
+    os.makedirs(os.path.dirname(SCHEMA_MARKER), exist_ok=True)
+    with open(SCHEMA_MARKER, 'a'):
+        pass
+    os.utime(SCHEMA_MARKER, None)
+    schema_registry.invalidate()
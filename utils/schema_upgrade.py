@@ -0,0 +1,158 @@
+"""
+Startup upgrade for columns the models map but older databases lack
+
+db.create_all() only creates missing tables, never missing columns, and every
+ORM load of Shipment (status routes, the status log flush hook, the restore
+scripts) or ChatMessage selects all mapped columns. A database that predates a
+column would fail those queries with "no such column", so app.py calls
+add_missing_columns() right after create_all(): each missing column is added
+and backfilled once, the same way its migration script does it.
+"""
+from datetime import datetime
+
+from sqlalchemy import DateTime, bindparam, inspect, text
+
+from models.shipment import db
+from utils.schema_registry import mark_schema_changed, schema_registry
+from utils.status_summary import reconcile_status_summary
+
+# Timestamps written here bind :now (datetime.utcnow(), like the ORM) rather than
+# using CURRENT_TIMESTAMP: SQLite stores that in a different text format, which
+# breaks comparisons such as the keyset paging and export --since, and on
+# PostgreSQL it follows the session TimeZone instead of being UTC.
+UPDATED_AT_BACKFILL_SQL = """
+    UPDATE shipments SET updated_at = COALESCE(
+        (SELECT MAX(l.timestamp) FROM status_logs l WHERE l.shipment_id = shipments.id),
+        date_registered,
+        :now
+    )
+    WHERE updated_at IS NULL
+"""
+
+
+def _execute_with_now(sql):
+    """Run ``sql`` with :now bound to the current UTC time; returns the rowcount"""
+    statement = text(sql).bindparams(bindparam('now', type_=DateTime))
+    return db.session.execute(statement, {'now': datetime.utcnow()}).rowcount
+
+
+def backfill_updated_at():
+    """Fill updated_at where it is NULL; returns the number of shipments updated.
+
+    Also run by migrations/add_shipment_updated_at.py. The caller commits.
+    """
+    return _execute_with_now(UPDATED_AT_BACKFILL_SQL)
+
+
+def _backfill_status_summary():
+    # Same pass as migrations/add_shipment_status_summary.py; reads the new columns
+    schema_registry.invalidate()
+    reconcile_status_summary()
+
+
+# GET /api/shipments/all pages on (date_registered, id); rows from before the
+# column had a default would otherwise never appear on any page
+DATE_REGISTERED_BACKFILL_SQL = """
+    UPDATE shipments SET date_registered = COALESCE(
+        (SELECT MIN(l.timestamp) FROM status_logs l WHERE l.shipment_id = shipments.id),
+        :now
+    )
+    WHERE date_registered IS NULL
+"""
+
+
+# Number existing messages 1, 2, ... per session in the order they were read before
+CHAT_SEQ_BACKFILL_SQL = """
+    UPDATE chat_messages SET seq = numbered.seq
+    FROM (
+        SELECT id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY timestamp, id) AS seq
+        FROM chat_messages
+    ) AS numbered
+    WHERE chat_messages.id = numbered.id AND chat_messages.seq IS NULL
+"""
+
+
+def _backfill_chat_seq():
+    db.session.execute(text(CHAT_SEQ_BACKFILL_SQL))
+    # Created here, not by create_all(), because the table already existed
+    db.session.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS ix_chat_messages_session_seq ON chat_messages (session_id, seq)'
+    ))
+
+
+# column -> (DDL type, backfill run once after the missing columns are added)
+SHIPMENT_COLUMNS = {
+    'updated_at': ('TIMESTAMP NULL', backfill_updated_at),
+    'last_status_at': ('TIMESTAMP NULL', _backfill_status_summary),
+    'status_log_count': ('INTEGER NOT NULL DEFAULT 0', _backfill_status_summary),
+}
+
+CHAT_MESSAGE_COLUMNS = {
+    'seq': ('INTEGER NULL', _backfill_chat_seq),
+}
+
+TABLE_COLUMNS = {
+    'shipments': SHIPMENT_COLUMNS,
+    'chat_messages': CHAT_MESSAGE_COLUMNS,
+}
+
+
+def _add_column(table, name, ddl):
+    """ALTER TABLE ADD COLUMN; False if another worker added it first"""
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {name} {ddl}'))
+        return True
+    try:
+        db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+        return True
+    except Exception as e:
+        if 'duplicate column' not in str(e).lower():
+            raise
+        db.session.rollback()
+        return False
+
+
+def add_missing_columns():
+    """Add and backfill mapped columns the database lacks; returns their table.column names.
+
+    Needs an app context.
+    """
+    inspector = inspect(db.engine)
+    tables = inspector.get_table_names()
+    added = []
+    for table, columns in TABLE_COLUMNS.items():
+        if table not in tables:
+            continue
+        existing = {col['name'] for col in inspector.get_columns(table)}
+        added_here = []
+        for name, (ddl, _) in columns.items():
+            if name in existing:
+                continue
+            print(f"🔄 Adding missing column {table}.{name}...")
+            if _add_column(table, name, ddl):
+                db.session.commit()
+                added_here.append(name)
+        # Each backfill once, after every column it may read exists
+        for backfill in dict.fromkeys(columns[name][1] for name in added_here):
+            backfill()
+            db.session.commit()
+        added.extend(f'{table}.{name}' for name in added_here)
+    if added:
+        mark_schema_changed()
+        print(f"✅ Added and backfilled columns: {', '.join(added)}")
+    return added
+
+
+def backfill_date_registered():
+    """Give shipments without a date_registered one; returns how many were updated.
+
+    Uses the ix_shipments_date_registered index, so it is cheap to run at
+    every startup. Needs an app context.
+    """
+    if 'shipments' not in inspect(db.engine).get_table_names():
+        return 0
+    updated = _execute_with_now(DATE_REGISTERED_BACKFILL_SQL)
+    db.session.commit()
+    if updated:
+        print(f"✅ Backfilled date_registered on {updated} shipments")
+    return updated
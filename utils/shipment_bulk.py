@@ -0,0 +1,189 @@
+"""
+Building blocks for registering many shipments at once
+
+Shared by POST /api/shipments/bulk (routes/shipments.py) and the manifest
+importer (utils/manifest_import.py): per-item validation, collision-free
+tracking number generation, multi-row INSERTs and receipt queueing.
+"""
+import uuid
+from datetime import datetime
+
+from sqlalchemy import bindparam
+
+from utils.change_feed import change, record_changes
+from utils.pdf_generator import receipt_fields
+from utils.receipt_renderer import receipt_renderer, ReceiptQueueFull
+from utils.receipt_storage import receipt_storage
+from utils.schema_registry import schema_registry
+from utils.sql_statements import statements
+
+# Rows per multi-row INSERT and per tracking number IN lookup
+BULK_INSERT_CHUNK = 200
+
+# Required on every new shipment (shipment_cost is optional and defaults to 0.0)
+REQUIRED_SHIPMENT_FIELDS = ['sender_name', 'sender_email', 'sender_phone', 'sender_address',
+                            'receiver_name', 'receiver_phone', 'receiver_address', 'package_type',
+                            'weight']
+
+
+def missing_fields(data):
+    """Required fields that are absent or blank in ``data``"""
+    missing = []
+    for field in REQUIRED_SHIPMENT_FIELDS:
+        value = data.get(field)
+        if value is None or (isinstance(value, str) and value.strip() == ''):
+            missing.append(field)
+    return missing
+
+
+def parse_shipment_cost(shipment_cost):
+    """Optional shipment_cost as a float, 0.0 when missing or malformed"""
+    if shipment_cost is None or (isinstance(shipment_cost, str) and shipment_cost.strip() == ''):
+        return 0.0
+    try:
+        return float(shipment_cost)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def parse_estimated_delivery(estimated_delivery_date):
+    """YYYY-MM-DD estimated delivery date as a datetime, or None"""
+    if not estimated_delivery_date:
+        return None
+    try:
+        return datetime.strptime(estimated_delivery_date, '%Y-%m-%d')
+    except Exception:
+        return None
+
+
+def generate_tracking_number():
+    return f'TRK{str(uuid.uuid4())[:8].upper()}'
+
+
+def normalize_tracking_number(tracking_number):
+    """Custom tracking numbers are stored stripped and upper-cased; None if blank"""
+    return str(tracking_number or '').strip().upper() or None
+
+
+def existing_tracking_numbers(tracking_numbers):
+    """The subset of ``tracking_numbers`` already in shipments, one IN query per chunk"""
+    tracking_numbers = list(tracking_numbers)
+    existing = set()
+    for start in range(0, len(tracking_numbers), BULK_INSERT_CHUNK):
+        rows = statements.execute(
+            'SELECT tracking_number FROM shipments WHERE tracking_number IN :tracking_numbers',
+            {'tracking_numbers': tracking_numbers[start:start + BULK_INSERT_CHUNK]},
+            bindparam('tracking_numbers', expanding=True)
+        ).all()
+        existing.update(row[0] for row in rows)
+    return existing
+
+
+def build_shipment_row(item, now, created_by=None, created_by_email=None):
+    """(row, None) for a valid shipment dict, or (None, error message).
+
+    The row's tracking_number is None when the item didn't bring one; see
+    assign_tracking_numbers().
+    """
+    if not isinstance(item, dict):
+        return None, 'Each shipment must be an object'
+    missing = missing_fields(item)
+    if missing:
+        return None, f'Missing required fields: {", ".join(missing)}'
+    try:
+        weight = float(item['weight'])
+    except (ValueError, TypeError):
+        return None, 'weight must be a number'
+    return {
+        'id': str(uuid.uuid4()),
+        'tracking_number': normalize_tracking_number(item.get('tracking_number')),
+        'sender_name': item['sender_name'],
+        'sender_email': item['sender_email'],
+        'sender_phone': item['sender_phone'],
+        'sender_address': item['sender_address'],
+        'receiver_name': item['receiver_name'],
+        'receiver_phone': item['receiver_phone'],
+        'receiver_address': item['receiver_address'],
+        'package_type': item['package_type'],
+        'weight': weight,
+        'shipment_cost': parse_shipment_cost(item.get('shipment_cost')),
+        'estimated_delivery_date': parse_estimated_delivery(item.get('estimated_delivery_date')),
+        'status': 'Registered',
+        'date_registered': now,
+        'updated_at': now,
+        'created_by': created_by,
+        'created_by_email': created_by_email
+    }, None
+
+
+def assign_tracking_numbers(rows, reserved=()):
+    """Give every row without a tracking number a generated one that is free.
+
+    Candidates are checked against the table in bulk and re-drawn on
+    collision; ``reserved`` are numbers already claimed by other rows.
+    """
+    used = set(reserved) | {row['tracking_number'] for row in rows if row['tracking_number']}
+    pending = [row for row in rows if not row['tracking_number']]
+    while pending:
+        candidates = {}
+        for row in pending:
+            tracking_number = generate_tracking_number()
+            if tracking_number not in used and tracking_number not in candidates:
+                candidates[tracking_number] = row
+        collisions = existing_tracking_numbers(candidates)
+        for tracking_number, row in candidates.items():
+            if tracking_number not in collisions:
+                row['tracking_number'] = tracking_number
+                used.add(tracking_number)
+        pending = [row for row in pending if not row['tracking_number']]
+
+
+def insert_shipments(rows):
+    """INSERT ``rows`` (from build_shipment_row, tracking numbers assigned) in chunks.
+
+    pdf_url and qr_url are filled in first, since receipt keys only depend
+    on the row. A change feed event is recorded per row (utils/change_feed.py).
+    Returns the receipt fields to queue once the caller commits.
+    """
+    if not rows:
+        return []
+    receipts = []
+    for row in rows:
+        fields = receipt_fields(row)
+        receipts.append(fields)
+        row['pdf_url'] = receipt_storage.location(receipt_renderer.key_for(fields))
+        row['qr_url'] = f"/api/shipments/{row['tracking_number']}/qr"
+
+    db_columns = schema_registry.columns('shipments')
+    columns = [col for col in rows[0] if col in db_columns]
+    columns_str = ', '.join(f'"{col}"' for col in columns)
+    for start in range(0, len(rows), BULK_INSERT_CHUNK):
+        chunk = rows[start:start + BULK_INSERT_CHUNK]
+        params = {}
+        values = []
+        for n, row in enumerate(chunk):
+            values.append('(' + ', '.join(f':{col}_{n}' for col in columns) + ')')
+            params.update({f'{col}_{n}': row[col] for col in columns})
+        statements.execute(f'INSERT INTO shipments ({columns_str}) VALUES {", ".join(values)}', params)
+    record_changes([change('shipment', 'created', row['id'], row['tracking_number'], {'status': row['status']})
+                    for row in rows])
+    return receipts
+
+
+def queue_receipts(receipts):
+    """Queue receipt renders without blocking; returns how many were queued.
+
+    Whatever doesn't fit in the render queue renders on first download.
+    """
+    queued = 0
+    for fields in receipts:
+        try:
+            receipt_renderer.submit(fields)
+            queued += 1
+        except ReceiptQueueFull:
+            break
+        except Exception as e:
+            print(f"PDF queueing failed for {fields['tracking_number']}: {e}")
+    if queued < len(receipts):
+        print(f"⚠️ Receipt queue full - {len(receipts) - queued} receipts will render on first download")
+    return queued
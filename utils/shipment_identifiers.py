@@ -0,0 +1,86 @@
+"""
+Resolve the ``<identifier>`` in shipment URLs (tracking number or id)
+
+Routes used to match ``WHERE tracking_number = :identifier OR id = :identifier``,
+which PostgreSQL may answer with a scan instead of either index. The
+resolver classifies the identifier instead: UUID-shaped values are looked up
+by primary key (falling back to tracking number, since custom tracking
+numbers are free-form), everything else by the unique tracking_number index.
+Tracking numbers already seen are mapped to their id in a small LRU
+(SHIPMENT_ID_CACHE_SIZE, default 1024), so repeat requests go straight to
+the primary key.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from utils.sql_statements import statements
+
+UUID_RE = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+
+
+class ShipmentResolver:
+    """Single-index shipment lookups with a tracking_number -> id LRU"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._ids = OrderedDict()
+
+    def _cached_id(self, tracking_number):
+        with self._lock:
+            shipment_id = self._ids.get(tracking_number)
+            if shipment_id is not None:
+                self._ids.move_to_end(tracking_number)
+            return shipment_id
+
+    def remember(self, tracking_number, shipment_id):
+        if not tracking_number or not shipment_id:
+            return
+        with self._lock:
+            self._ids[tracking_number] = shipment_id
+            self._ids.move_to_end(tracking_number)
+            while len(self._ids) > self.max_entries:
+                self._ids.popitem(last=False)
+
+    def forget(self, tracking_number):
+        with self._lock:
+            self._ids.pop(tracking_number, None)
+
+    def _select(self, column, value, columns):
+        return statements.execute(
+            f'SELECT {columns} FROM shipments WHERE {column} = :value', {'value': value}
+        ).first()
+
+    def find(self, identifier, columns=None):
+        """The shipment row for a tracking number or id, or None.
+
+        ``columns`` is a list of column names (default: all); id and
+        tracking_number are always included.
+        """
+        if not identifier:
+            return None
+        if columns:
+            columns = ', '.join(f'"{col}"' for col in dict.fromkeys(['id', 'tracking_number'] + list(columns)))
+        else:
+            columns = '*'
+
+        cached_id = self._cached_id(identifier)
+        if cached_id is not None:
+            row = self._select('id', cached_id, columns)
+            if row is not None:
+                return row
+            # Deleted since it was cached
+            self.forget(identifier)
+
+        lookup_columns = ('id', 'tracking_number') if UUID_RE.match(identifier) else ('tracking_number',)
+        for column in lookup_columns:
+            row = self._select(column, identifier, columns)
+            if row is not None:
+                self.remember(row._mapping['tracking_number'], row._mapping['id'])
+                return row
+        return None
+
+
+shipment_resolver = ShipmentResolver(max_entries=int(os.environ.get('SHIPMENT_ID_CACHE_SIZE', '1024')))
@@ -0,0 +1,123 @@
+"""
+Reusable raw-SQL statements for the shipment hot paths
+
+routes/shipments.py builds its SQL as strings (column lists depend on the
+deployed schema, filters on the query string). Wrapping each string in
+text() on every call re-parses it and re-creates its bind parameters; this
+cache keeps one TextClause per distinct statement, so each shape is parsed
+once per process and SQLAlchemy's compiled cache is hit from then on.
+
+With SQL_PREPARED_STATEMENTS=1 on PostgreSQL (psycopg2), statements are
+also PREPAREd once per pooled connection and run with EXECUTE, so the server
+skips parse/plan as well. Prepared names include the schema generation
+(utils/schema_registry.py) so a migration never runs against a stale plan.
+
+stats() reports hits/misses and is included in GET /api/diagnose.
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+from models.shipment import db
+from utils.schema_registry import schema_registry
+
+# Same rule SQLAlchemy uses for :name binds in text() (skips ::casts)
+_BIND_RE = re.compile(r'(?<![:\w\\]):(\w+)(?!:)')
+
+
+class StatementCache:
+    """LRU of SQL string -> TextClause, plus optional PostgreSQL PREPARE"""
+
+    def __init__(self, max_entries=512, prepare=False):
+        self.max_entries = max_entries
+        self.prepare = prepare
+        self._lock = threading.Lock()
+        self._statements = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.prepared = 0
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def text(self, sql, *bind_types):
+        """The cached TextClause for ``sql`` (with typed ``bind_types``)"""
+        key = (sql, tuple((b.key, repr(b.type)) for b in bind_types))
+        with self._lock:
+            statement = self._statements.get(key)
+            if statement is not None:
+                self._statements.move_to_end(key)
+                self.hits += 1
+                return statement
+            self.misses += 1
+        statement = text(sql)
+        if bind_types:
+            statement = statement.bindparams(*bind_types)
+        with self._lock:
+            self._statements[key] = statement
+            while len(self._statements) > self.max_entries:
+                self._statements.popitem(last=False)
+        return statement
+
+    def execute(self, sql, params=None, *bind_types):
+        """Run ``sql`` on db.session, reusing its cached (or prepared) form"""
+        params = params or {}
+        # Expanding IN lists change shape per call, so they never get PREPAREd
+        if self.prepare and '%' not in sql and not any(b.expanding for b in bind_types):
+            result = self._execute_prepared(sql, params)
+            if result is not None:
+                return result
+        return db.session.execute(self.text(sql, *bind_types), params)
+
+    def _execute_prepared(self, sql, params):
+        connection = db.session.connection()
+        if connection.dialect.name != 'postgresql' or connection.dialect.driver != 'psycopg2':
+            return None
+        # .info lives as long as the pooled DBAPI connection, like the server-side statements
+        prepared = connection.connection.info.setdefault('prepared_statements', {})
+        generation = schema_registry.generation()
+        names = list(dict.fromkeys(_BIND_RE.findall(sql)))
+        statement_name = prepared.get((sql, generation))
+        self._count(statement_name is not None)
+        if statement_name is None:
+            digest = hashlib.sha1(f'{generation}:{sql}'.encode('utf-8')).hexdigest()[:16]
+            statement_name = f'stmt_{digest}'
+            positional = _BIND_RE.sub(lambda m: f'${names.index(m.group(1)) + 1}', sql)
+            try:
+                with connection.begin_nested():
+                    connection.exec_driver_sql(f'PREPARE {statement_name} AS {positional}')
+            except Exception as e:
+                # e.g. behind a transaction-pooling proxy - fall back to plain statements
+                print(f"⚠️ PREPARE failed, disabling prepared statements: {e}")
+                self.prepare = False
+                return None
+            prepared[(sql, generation)] = statement_name
+            with self._lock:
+                self.prepared += 1
+        args = ', '.join(f'%({name})s' for name in names)
+        return connection.exec_driver_sql(
+            f'EXECUTE {statement_name}({args})' if names else f'EXECUTE {statement_name}', params
+        )
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'statements': len(self._statements),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else None,
+                'prepared': self.prepared,
+                'prepared_enabled': self.prepare
+            }
+
+
+statements = StatementCache(prepare=os.environ.get('SQL_PREPARED_STATEMENTS', '').lower() in ('1', 'true', 'yes'))
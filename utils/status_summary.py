@@ -0,0 +1,85 @@
+"""
+Denormalized status summary on shipments: last_status_at and status_log_count
+
+    last_status_at    - newest status_logs.timestamp for the shipment
+    status_log_count  - number of status_logs rows for the shipment
+
+update_status (routes/status.py) maintains both in the same transaction as
+the status log it writes. reconcile_status_summary() recomputes them from
+status_logs in set-based UPDATEs, for the whole table (reconcile_status_summary.py,
+migrations/add_shipment_status_summary.py) or for the shipments a
+maintenance script just touched.
+"""
+from datetime import datetime
+
+from sqlalchemy import DateTime, bindparam, case, text
+
+from models.shipment import db, Shipment
+from utils.schema_registry import schema_registry
+
+
+def record_status_log(shipment, timestamp, count=1):
+    """Count ``count`` new status logs (newest at ``timestamp``) against ``shipment``.
+
+    Applied atomically at flush; call once per shipment per flush.
+    """
+    shipment.status_log_count = Shipment.status_log_count + count
+    shipment.last_status_at = case(
+        (Shipment.last_status_at.is_(None) | (Shipment.last_status_at < timestamp), timestamp),
+        else_=Shipment.last_status_at
+    )
+
+
+def reconcile_status_summary(shipment_ids=None):
+    """Recompute the summary from status_logs; returns the number of shipments changed.
+
+    ``shipment_ids`` limits the pass to those shipments (default: all). Only
+    rows whose values actually differ are written. The caller commits.
+    """
+    is_postgres = db.engine.dialect.name == 'postgresql'
+    distinct = 'IS DISTINCT FROM' if is_postgres else 'IS NOT'
+    params = {}
+    touch = ''
+    if schema_registry.has_column('shipments', 'updated_at'):
+        # Bound like the ORM's utcnow() default - CURRENT_TIMESTAMP is stored in a
+        # different text format on SQLite and follows the session TimeZone on PostgreSQL
+        touch = ', updated_at = :now'
+        params['now'] = datetime.utcnow()
+    log_filter = shipment_filter = ''
+    if shipment_ids is not None:
+        params['shipment_ids'] = list(shipment_ids)
+        if not params['shipment_ids']:
+            return 0
+        log_filter = 'WHERE shipment_id IN :shipment_ids'
+        shipment_filter = 'AND shipments.id IN :shipment_ids'
+
+    def execute(sql):
+        statement = text(sql)
+        if 'shipment_ids' in params:
+            statement = statement.bindparams(bindparam('shipment_ids', expanding=True))
+        if touch:
+            statement = statement.bindparams(bindparam('now', type_=DateTime))
+        return db.session.execute(statement, params).rowcount
+
+    # Shipments with status logs: one aggregate pass joined back by id
+    changed = execute(f"""
+        UPDATE shipments SET
+            status_log_count = summary.log_count,
+            last_status_at = summary.last_at{touch}
+        FROM (
+            SELECT shipment_id, COUNT(*) AS log_count, MAX(timestamp) AS last_at
+            FROM status_logs {log_filter}
+            GROUP BY shipment_id
+        ) AS summary
+        WHERE shipments.id = summary.shipment_id
+          AND (shipments.status_log_count {distinct} summary.log_count
+               OR shipments.last_status_at {distinct} summary.last_at)
+    """)
+    # Shipments whose status logs are all gone
+    changed += execute(f"""
+        UPDATE shipments SET status_log_count = 0, last_status_at = NULL{touch}
+        WHERE (status_log_count != 0 OR last_status_at IS NOT NULL)
+          AND NOT EXISTS (SELECT 1 FROM status_logs l WHERE l.shipment_id = shipments.id)
+          {shipment_filter}
+    """)
+    return changed
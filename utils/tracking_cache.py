@@ -0,0 +1,196 @@
+"""
+Read-through cache for the public tracking lookup (GET /api/shipments/<tracking>/status)
+
+Entries are keyed by tracking number and hold the response body - the
+serialized status history plus current_location. update_status,
+update_shipment and delete_shipment invalidate the entry after they commit;
+the TTL (TRACKING_CACHE_TTL seconds, default 60) is the safety net for
+writes that bypass the routes (migrations, restore scripts).
+
+Backends (TRACKING_CACHE_BACKEND):
+    memory  - LRU inside one process (default; TRACKING_CACHE_SIZE entries)
+    sqlite  - a small SQLite file (TRACKING_CACHE_DB) shared by every worker
+              on the host, so an invalidation in one worker is seen by all
+    redis   - a Redis server (TRACKING_CACHE_REDIS_URL); needs the redis package
+    off     - no caching
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryBackend:
+    """In-process LRU with per-entry expiry"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SqliteBackend:
+    """Entries as JSON rows in a SQLite file shared by the workers on one host"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS tracking_cache (
+                    key TEXT PRIMARY KEY,
+                    expires REAL NOT NULL,
+                    payload TEXT NOT NULL
+                )
+            ''')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _run(self, sql, params):
+        conn = self._connect()
+        try:
+            with conn:
+                return conn.execute(sql, params).fetchone()
+        finally:
+            conn.close()
+
+    def get(self, key):
+        row = self._run('SELECT payload FROM tracking_cache WHERE key = ? AND expires > ?', (key, time.time()))
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl):
+        self._run(
+            'INSERT OR REPLACE INTO tracking_cache (key, expires, payload) VALUES (?, ?, ?)',
+            (key, time.time() + ttl, json.dumps(value))
+        )
+
+    def delete(self, key):
+        self._run('DELETE FROM tracking_cache WHERE key = ?', (key,))
+
+
+class RedisBackend:
+    """Entries as JSON strings in Redis, expired by Redis itself"""
+
+    def __init__(self, url, prefix='tracking:'):
+        import redis  # Optional dependency - only needed for TRACKING_CACHE_BACKEND=redis
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        payload = self._client.get(self.prefix + key)
+        return json.loads(payload) if payload else None
+
+    def set(self, key, value, ttl):
+        self._client.set(self.prefix + key, json.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+
+class TrackingCache:
+    """Read-through cache in front of one of the backends above.
+
+    Backend errors are logged and treated as misses, so a broken shared
+    cache degrades to querying the database rather than failing lookups.
+    """
+
+    def __init__(self, backend, ttl=60):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, tracking_number, loader, version=None):
+        """Return the cached entry, or ``loader()`` (cached unless it returns None).
+
+        ``version`` (e.g. the shipment's updated_at) is stored with the entry;
+        an entry cached under a different version counts as a miss, so a
+        load that raced with a write can't outlive the write.
+        """
+        if self.backend is None:
+            return loader()
+        try:
+            entry = self.backend.get(tracking_number)
+        except Exception as e:
+            print(f"⚠️ Tracking cache read failed: {e}")
+            entry = None
+        if entry is not None and entry.get('version') == version:
+            self.hits += 1
+            return entry['data']
+        self.misses += 1
+        value = loader()
+        if value is not None:
+            try:
+                self.backend.set(tracking_number, {'version': version, 'data': value}, self.ttl)
+            except Exception as e:
+                print(f"⚠️ Tracking cache write failed: {e}")
+        return value
+
+    def invalidate(self, *tracking_numbers):
+        if self.backend is None:
+            return
+        for tracking_number in tracking_numbers:
+            if not tracking_number:
+                continue
+            try:
+                self.backend.delete(tracking_number)
+            except Exception as e:
+                print(f"⚠️ Tracking cache invalidation failed for {tracking_number}: {e}")
+
+    def stats(self):
+        return {
+            'backend': type(self.backend).__name__ if self.backend else None,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+def _create_tracking_cache():
+    """Pick the backend from TRACKING_CACHE_BACKEND (memory | sqlite | redis | off)"""
+    backend = os.environ.get('TRACKING_CACHE_BACKEND', 'memory').lower()
+    ttl = float(os.environ.get('TRACKING_CACHE_TTL', '60'))
+    if backend == 'off':
+        return TrackingCache(None, ttl)
+    if backend == 'sqlite':
+        path = os.environ.get('TRACKING_CACHE_DB', os.path.join('data', 'tracking_cache.db'))
+        print(f"✅ Tracking cache: SQLite at {path}")
+        return TrackingCache(SqliteBackend(path), ttl)
+    if backend == 'redis':
+        url = os.environ.get('TRACKING_CACHE_REDIS_URL')
+        if not url:
+            raise RuntimeError('TRACKING_CACHE_BACKEND=redis requires TRACKING_CACHE_REDIS_URL')
+        print("✅ Tracking cache: Redis")
+        return TrackingCache(RedisBackend(url), ttl)
+    return TrackingCache(MemoryBackend(int(os.environ.get('TRACKING_CACHE_SIZE', '1024'))), ttl)
+
+
+tracking_cache = _create_tracking_cache()
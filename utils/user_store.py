@@ -0,0 +1,194 @@
+"""
+Shared in-memory user store backed by data/users.json
+
+The parsed file is kept per process and only re-read when the file's
+mtime, inode or size changes. Writes go through a temp file + rename and
+hold an exclusive lock on data/users.json.lock so gunicorn workers don't
+overwrite each other.
+"""
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from utils.file_lock import file_lock
+
+USERS_FILE = os.path.join('data', 'users.json')
+LOCK_FILE = USERS_FILE + '.lock'
+
+
+class DuplicateEmailError(ValueError):
+    """Raised when adding a user whose email is already registered"""
+
+
+def normalize_email(email):
+    """Key used by the email index"""
+    return (email or '').strip().lower()
+
+
+class UserStore:
+    """Snapshot of users.json indexed by id and by lowercased email"""
+
+    def __init__(self, path=USERS_FILE, lock_path=LOCK_FILE):
+        self.path = path
+        self.lock_path = lock_path
+        self._thread_lock = threading.RLock()
+        self._signature = None
+        self._users = {}
+        self._by_email = {}
+
+    # ---- reading -------------------------------------------------------
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    def _set_snapshot(self, users, signature):
+        self._users = users
+        self._by_email = {
+            normalize_email(user.get('email')): user_id
+            for user_id, user in users.items()
+            if user.get('email')
+        }
+        self._signature = signature
+
+    def _refresh(self, force=False):
+        """Re-read the file if it changed since the last snapshot"""
+        signature = self._file_signature()
+        if signature == self._signature and not force:
+            return
+        with self._thread_lock:
+            signature = self._file_signature()
+            if signature == self._signature and not force:
+                return
+            if signature is None:
+                self._set_snapshot({}, None)
+                return
+            try:
+                with open(self.path, 'r') as f:
+                    users = json.load(f)
+            except (json.JSONDecodeError, FileNotFoundError) as e:
+                # Keep serving the previous snapshot if the file is mid-write or corrupt
+                print(f"⚠️ Could not reload {self.path}: {e}")
+                return
+            self._set_snapshot(users, signature)
+
+    def get(self, user_id):
+        """Return a copy of one user, or None"""
+        if not user_id:
+            return None
+        self._refresh()
+        user = self._users.get(user_id)
+        return dict(user) if user is not None else None
+
+    def get_by_email(self, email):
+        """Return (user_id, user copy) for an email (case-insensitive), or (None, None)"""
+        if not email:
+            return None, None
+        self._refresh()
+        user_id = self._by_email.get(normalize_email(email))
+        if user_id is None or user_id not in self._users:
+            return None, None
+        return user_id, dict(self._users[user_id])
+
+    def all(self):
+        """Return a copy of the whole {user_id: user} dict"""
+        self._refresh()
+        return {user_id: dict(user) for user_id, user in self._users.items()}
+
+    def count(self):
+        self._refresh()
+        return len(self._users)
+
+    # ---- writing -------------------------------------------------------
+
+    @contextmanager
+    def _write_lock(self):
+        """Exclusive lock shared by threads in this process and by other workers"""
+        with self._thread_lock, file_lock(self.lock_path):
+            yield
+
+    def _write(self, users):
+        """Atomically replace the users file (caller holds the write lock)"""
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.users-', suffix='.json', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(users, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._set_snapshot(users, self._file_signature())
+
+    def save(self, users):
+        """Replace all users with ``users``"""
+        with self._write_lock():
+            self._write({user_id: dict(user) for user_id, user in users.items()})
+
+    def update(self, mutate):
+        """Read-modify-write under the lock.
+
+        ``mutate`` receives a fresh copy of the users dict, changes it in place
+        and may return a value, which is passed back to the caller.
+        """
+        with self._write_lock():
+            # Force a re-read so changes from other workers aren't lost
+            self._refresh(force=True)
+            users = {user_id: dict(user) for user_id, user in self._users.items()}
+            result = mutate(users)
+            self._write(users)
+            return result
+
+    def add(self, user):
+        """Insert a new user keyed by ``user['id']``.
+
+        The email check runs against the freshly reloaded index while the
+        write lock is held, so two concurrent signups for the same address
+        can't both succeed. Raises DuplicateEmailError on conflict.
+        """
+        email_key = normalize_email(user.get('email'))
+
+        def insert(users):
+            if email_key and self._by_email.get(email_key) in users:
+                raise DuplicateEmailError(f"User with email {user.get('email')} already exists")
+            users[user['id']] = dict(user)
+            return dict(user)
+
+        return self.update(insert)
+
+    def email_taken(self, email, exclude_user_id=None):
+        """True if another user already has ``email``"""
+        user_id, _ = self.get_by_email(email)
+        return user_id is not None and user_id != exclude_user_id
+
+
+user_store = UserStore()
+
+
+def load_users():
+    """Return a copy of all users (kept for existing callers)"""
+    return user_store.all()
+
+
+def save_users(users):
+    """Atomically write all users (kept for existing callers)"""
+    user_store.save(users)
+
+
+def get_user(user_id):
+    """Return a copy of one user by id, or None"""
+    return user_store.get(user_id)
+
+
+def get_user_by_email(email):
+    """Return (user_id, user) for an email, or (None, None)"""
+    return user_store.get_by_email(email)